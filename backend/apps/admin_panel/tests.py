@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.project.models import Project, ProjectUser
+from common.query_stats import (
+    QueryStats,
+    fingerprint,
+    finish_task_query_stats,
+    record_query_stats,
+    start_task_query_stats,
+)
+
+User = get_user_model()
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    QUERY_STATS_ENABLED=True,
+)
+class QueryStatsViewTests(TestCase):
+    """Tests for the aggregated query statistics of the admin panel"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email="admin@test.com", name="Admin", password="TestPassword123_"
+        )
+        self.admin.role = "admin"
+        self.admin.save()
+        self.url = reverse("query_stats")
+
+    def test_requests_are_aggregated_per_endpoint(self):
+        """API requests show up under their route with averaged numbers"""
+        user = User.objects.create_user(
+            email="owner@test.com", name="Owner", password="TestPassword123_"
+        )
+        project = Project.objects.create(name="Test Project")
+        ProjectUser.objects.create(
+            project=project, user=user, role=ProjectUser.PROJECT_USER_ROLE_OWNER
+        )
+        user.currently_selected_project = project
+        user.save()
+
+        client = APIClient()
+        client.force_authenticate(user=user)
+        client.get(reverse("product_list_create"))
+        client.get(reverse("product_list_create"))
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = {row["name"]: row for row in response.data}
+        product_list = stats["GET /products/"]
+        self.assertEqual(product_list["calls"], 2)
+        self.assertGreater(product_list["avg_queries"], 0)
+        self.assertIsNotNone(product_list["slowest_sql"])
+
+    @override_settings(QUERY_STATS_ENABLED=False)
+    def test_requests_are_not_tracked_when_disabled(self):
+        self.client.force_authenticate(user=self.admin)
+        self.client.get(reverse("product_list_create"))
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data, [])
+
+    def test_task_stats_and_reset(self):
+        """Recorded task statistics are listed until they are reset"""
+        task = "task apps.sources.tasks.task_fetch_youtube_stats"
+        stats = QueryStats()
+        stats.count = 3
+        stats.fingerprints.update(["SELECT ? FROM product"] * 3)
+        record_query_stats(task, stats)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url)
+        stats = {row["name"]: row for row in response.data}
+        self.assertEqual(stats[task]["duplicates"], {"SELECT ? FROM product": 3})
+
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        names = [row["name"] for row in self.client.get(self.url).data]
+        self.assertNotIn(task, names)
+
+    def test_source_tasks_are_tracked(self):
+        """The Celery hooks record the queries of the source sync tasks only"""
+        tracked = SimpleNamespace(name="apps.sources.tasks.task_fetch_youtube_stats")
+        untracked = SimpleNamespace(name="apps.product.tasks.task_refresh")
+        for task_id, task in (("1", tracked), ("2", untracked)):
+            start_task_query_stats(task_id=task_id, task=task)
+            Project.objects.count()
+            finish_task_query_stats(task_id=task_id, task=task)
+
+        self.client.force_authenticate(user=self.admin)
+        stats = {row["name"]: row for row in self.client.get(self.url).data}
+
+        self.assertEqual(stats[f"task {tracked.name}"]["queries"], 1)
+        self.assertNotIn(f"task {untracked.name}", stats)
+
+    def test_only_admins_can_see_query_stats(self):
+        user = User.objects.create_user(
+            email="user@test.com", name="User", password="TestPassword123_"
+        )
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_fingerprint_normalizes_parameters(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "product" WHERE id IN (%s, %s, %s) LIMIT 21'),
+            fingerprint('SELECT * FROM "product"  WHERE id IN (%s) LIMIT 1'),
+        )
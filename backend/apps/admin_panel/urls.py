@@ -8,4 +8,5 @@ urlpatterns = [
     path("users/stats/", views.users_stats, name="users_stats"),
     path("projects/stats/", views.projects_stats, name="projects_stats"),
     path("sources/stats/", views.sources_stats, name="sources_stats"),
+    path("query-stats/", views.query_stats, name="query_stats"),
 ]
@@ -9,6 +9,7 @@ from rest_framework.response import Response
 
 from apps.project.models import Project
 from apps.sources.models import Source
+from common.query_stats import get_query_stats_report, reset_query_stats
 
 User = get_user_model()
 
@@ -206,3 +207,23 @@ def sources_stats(request):
     }
 
     return Response(stats)
+
+
+@api_view(["GET", "DELETE"])
+@permission_classes([permissions.IsAuthenticated])
+def query_stats(request):
+    """
+    Get query counts and database time aggregated per API endpoint and task,
+    or reset them
+    """
+    if not hasattr(request.user, "role") or request.user.role != "admin":
+        return Response(
+            {"error": "You do not have permission to perform this action."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    if request.method == "DELETE":
+        reset_query_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    return Response(get_query_stats_report())
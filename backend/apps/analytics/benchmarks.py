@@ -0,0 +1,257 @@
+"""
+Benchmarks of the analytics code paths over a project's data, typically one
+created by the seed_synthetic_tenants management command.
+
+Every case is run `repeat` times as the project owner and as one of its
+producers, recording wall-clock timings and the number of database queries.
+Each run happens in a transaction that is rolled back, so side effects like
+generated reports and notifications are not kept. The results are plain dicts
+meant to be written as JSON and compared between releases with
+compare_benchmark_results.
+"""
+
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.analytics.utils import calculate_analytics, calculate_analytics_per_source
+from apps.product.models import (
+    Product,
+    ProductDailyRollup,
+    ProductImpressions,
+    ProductSale,
+)
+from apps.product.views import (
+    getTopPerformingContentByImpressions,
+    getTopPerformingContentBySales,
+)
+from apps.project.models import Project, ProjectUser
+from apps.report.models import Report, ReportTemplates
+from apps.report.views.report import ReportsView
+
+# Days covered by the analytics requests of each granularity, ending on the last
+# day with data; None covers the project's whole history.
+GRANULARITY_DAYS = {
+    "yearly": None,
+    "monthly": 365,
+    "daily": 30,
+    "hourly": 1,
+}
+
+REPORT_DAYS = 365
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def measure(function: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """Time `repeat` calls of function and count the queries of the first one."""
+    timings = []
+    queries = None
+
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            try:
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    function()
+                    timings.append((time.perf_counter() - started) * 1000)
+                    raise _Rollback
+            except _Rollback:
+                pass
+        if queries is None:
+            queries = len(context.captured_queries)
+
+    return {
+        "queries": queries,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def describe_dataset(project: Project) -> Dict[str, Any]:
+    rollups = ProductDailyRollup.objects.filter(product__project=project)
+    bounds = rollups.aggregate(first=Min("period_start"), last=Max("period_start"))
+    return {
+        "project_id": project.id,
+        "name": project.name,
+        "products": Product.objects.filter(project=project).count(),
+        "sources": project.sources.count(),
+        "producers": project.project_users.filter(
+            role=ProjectUser.PROJECT_USER_ROLE_PRODUCER
+        ).count(),
+        "product_sales": ProductSale.objects.filter(product__project=project).count(),
+        "product_impressions": ProductImpressions.objects.filter(
+            product__project=project
+        ).count(),
+        "daily_rollups": rollups.count(),
+        "first_day": bounds["first"],
+        "last_day": bounds["last"],
+    }
+
+
+def analytics_filters(period_start: date, period_end: date) -> Dict[str, datetime]:
+    # Same bounds as AnalyticsView
+    return {
+        "period_start__gte": timezone.make_aware(
+            datetime.combine(period_start, datetime.min.time())
+        ),
+        "period_end__lte": timezone.make_aware(
+            datetime.combine(period_end, datetime.max.time())
+        ),
+    }
+
+
+def build_cases(
+    project: Project, project_user: ProjectUser, first_day: date, last_day: date
+) -> Dict[str, Callable[[], Any]]:
+    user = project_user.user
+    factory = APIRequestFactory()
+    cases = {}
+
+    for granularity, days in GRANULARITY_DAYS.items():
+        period_start = first_day if days is None else last_day - timedelta(days - 1)
+        filters = analytics_filters(period_start, last_day)
+        cases[f"analytics_{granularity}"] = partial(
+            calculate_analytics,
+            project.id,
+            filters,
+            period_start,
+            last_day,
+            None,
+            granularity,
+            user,
+        )
+
+    cases["analytics_per_source"] = partial(
+        calculate_analytics_per_source,
+        project.id,
+        ProductDailyRollup.objects.filter(product__project=project),
+    )
+
+    def top_content(view):
+        request = factory.get("/products/top-performing/")
+        force_authenticate(request, user=user)
+        return view(request)
+
+    cases["top_content_by_impressions"] = partial(
+        top_content, getTopPerformingContentByImpressions
+    )
+    cases["top_content_by_sales"] = partial(top_content, getTopPerformingContentBySales)
+
+    template = ReportTemplates.objects.filter(project=project, is_deleted=False).first()
+    if template:
+
+        def generate_report():
+            report_start = max(first_day, last_day - timedelta(REPORT_DAYS - 1))
+            request = factory.post(
+                f"/reports/?period_start={report_start}&period_end={last_day}"
+                f"&template={template.id}"
+            )
+            force_authenticate(request, user=user)
+            response = ReportsView.as_view()(request)
+            # The database rows are rolled back, the PDF has to go explicitly
+            for report in Report.objects.filter(id=response.data.get("id")):
+                report.file.delete(save=False)
+            return response
+
+        cases["report_generation"] = generate_report
+
+    return cases
+
+
+def run_benchmarks(
+    projects: List[Project], repeat: int = 5, use_cache: bool = False
+) -> Dict[str, Any]:
+    """
+    Benchmark the analytics of the given projects.
+
+    Analytics caching is disabled unless use_cache is set, so that the timings
+    reflect the queries rather than cache hits.
+    """
+    datasets = []
+    results = []
+
+    with override_settings(**({} if use_cache else {"CACHES": NO_CACHE})):
+        for project in projects:
+            dataset = describe_dataset(project)
+            datasets.append(dataset)
+            if not dataset["last_day"]:
+                continue
+
+            members = [
+                project.project_users.filter(role=role).select_related("user").first()
+                for role in (
+                    ProjectUser.PROJECT_USER_ROLE_OWNER,
+                    ProjectUser.PROJECT_USER_ROLE_PRODUCER,
+                )
+            ]
+            for project_user in filter(None, members):
+                # Views act on the user's currently selected project
+                project_user.user.currently_selected_project = project
+                cases = build_cases(
+                    project, project_user, dataset["first_day"], dataset["last_day"]
+                )
+                for name, function in cases.items():
+                    results.append(
+                        {
+                            "project": project.name,
+                            "case": name,
+                            "role": project_user.role,
+                            **measure(function, repeat),
+                        }
+                    )
+
+    return {
+        "generated_at": timezone.now(),
+        "database": connection.vendor,
+        "repeat": repeat,
+        "cache": use_cache,
+        "datasets": datasets,
+        "results": results,
+    }
+
+
+def compare_benchmark_results(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25
+) -> List[str]:
+    """
+    Return the regressions of results against a baseline run: cases whose median
+    time grew by more than `tolerance` (a fraction) or that run more queries.
+    """
+    baseline_cases = {
+        (row["project"], row["case"], row["role"]): row for row in baseline["results"]
+    }
+    regressions = []
+
+    for row in results["results"]:
+        previous: Optional[Dict[str, Any]] = baseline_cases.get(
+            (row["project"], row["case"], row["role"])
+        )
+        if previous is None:
+            continue
+
+        label = f"{row['project']} / {row['case']} ({row['role']})"
+        if row["queries"] > previous["queries"]:
+            regressions.append(
+                f"{label}: {previous['queries']} -> {row['queries']} queries"
+            )
+        if row["median_ms"] > previous["median_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{label}: median {previous['median_ms']} -> {row['median_ms']} ms"
+            )
+
+    return regressions
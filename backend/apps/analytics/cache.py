@@ -0,0 +1,161 @@
+import hashlib
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from apps.project.models import Project, ProjectDataChange
+
+ANALYTICS_CACHE_PREFIX = "analytics"
+
+
+def get_project_data_version(project_id: int) -> int:
+    version = (
+        Project.objects.filter(id=project_id)
+        .values_list("data_version", flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def get_project_data_watermark(project_id: int) -> Tuple[int, Optional[datetime]]:
+    """The project's data version and the time it was last bumped."""
+    watermark = (
+        Project.objects.filter(id=project_id)
+        .values_list("data_version", "data_updated_at")
+        .first()
+    )
+    return watermark or (0, None)
+
+
+def bump_project_data_version(*project_ids: int) -> datetime:
+    """
+    Invalidate every cached analytics response of the given projects.
+
+    The data version is part of each cache key, so after the bump older entries
+    are never read again and simply expire. Returns the new watermark.
+    """
+    changed_at = timezone.now()
+    Project.objects.filter(id__in=project_ids).update(
+        data_version=F("data_version") + 1, data_updated_at=changed_at
+    )
+    return changed_at
+
+
+def bump_product_data_version(
+    product_ids: Iterable[int],
+    period_start: Optional[date] = None,
+    period_end: Optional[date] = None,
+) -> None:
+    """
+    Invalidate the cached analytics of the projects owning these products, whose
+    series changed between period_start and period_end.
+    """
+    project_ids = list(
+        Project.objects.filter(product__id__in=list(product_ids))
+        .values_list("id", flat=True)
+        .distinct()
+    )
+    if project_ids:
+        record_project_data_change(
+            project_ids,
+            bump_project_data_version(*project_ids),
+            period_start,
+            period_end,
+        )
+
+
+def record_project_data_change(
+    project_ids: Iterable[int],
+    changed_at: datetime,
+    period_start: Optional[date] = None,
+    period_end: Optional[date] = None,
+) -> None:
+    """
+    Record which days of the projects' analytics series changed, for `since`
+    requests, dropping records older than the delta retention.
+    """
+    project_ids = list(project_ids)
+    ProjectDataChange.objects.bulk_create(
+        ProjectDataChange(
+            project_id=project_id,
+            period_start=period_start,
+            period_end=period_end,
+            changed_at=changed_at,
+        )
+        for project_id in project_ids
+    )
+    ProjectDataChange.objects.filter(
+        project_id__in=project_ids,
+        changed_at__lt=changed_at - settings.ANALYTICS_DELTA_RETENTION,
+    ).delete()
+
+
+def get_changed_periods(
+    project_id: int, since: datetime
+) -> Optional[List[Tuple[Optional[date], Optional[date]]]]:
+    """
+    The (period_start, period_end) windows of the project's series that changed
+    after `since`, or None when that is no longer known.
+    """
+    if since < timezone.now() - settings.ANALYTICS_DELTA_RETENTION:
+        return None
+    return list(
+        ProjectDataChange.objects.filter(
+            project_id=project_id, changed_at__gt=since
+        ).values_list("period_start", "period_end")
+    )
+
+
+def build_analytics_etag(cache_key: str, user_id: Optional[int]) -> str:
+    """
+    Strong ETag of an analytics response: its cache key, which covers the data
+    version, visibility and parameters, plus the user for the user earnings.
+    """
+    digest = hashlib.sha256(f"{cache_key}:{user_id}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def build_analytics_cache_key(
+    project_id: int,
+    visibility_token: Optional[str],
+    data_version: Optional[int] = None,
+    **params: Any,
+) -> str:
+    """
+    Build the cache key of an analytics response.
+
+    visibility_token is the caller's ProductVisibility.cache_token: None for
+    members who see the whole project (owners), who therefore share entries,
+    while every producer gets their own. The project's current data version is
+    looked up unless given.
+    """
+    payload = json.dumps(
+        {"visibility": visibility_token, **params},
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    if data_version is None:
+        data_version = get_project_data_version(project_id)
+    return f"{ANALYTICS_CACHE_PREFIX}:{project_id}:{data_version}:{digest}"
+
+
+def get_cached_analytics(cache_key: str) -> Optional[Dict[str, Any]]:
+    try:
+        return cache.get(cache_key)
+    except Exception as e:
+        # An unavailable cache must only cost a recomputation
+        print(f"Analytics cache read failed: {e}")
+        return None
+
+
+def set_cached_analytics(cache_key: str, data: Dict[str, Any]) -> None:
+    try:
+        cache.set(cache_key, data, settings.ANALYTICS_CACHE_TIMEOUT)
+    except Exception as e:
+        print(f"Analytics cache write failed: {e}")
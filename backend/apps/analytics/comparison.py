@@ -0,0 +1,117 @@
+"""
+Period-over-period comparison of analytics.
+
+The previous period is the range moved back by its own length in buckets of
+the response granularity (days, months or years), the year-ago period the
+range moved back by twelve months. Comparison buckets line up by position with
+the buckets of the current series.
+
+The current and every compared period are aggregated in a single grouped
+query over the widened range, with one conditional sum per period and metric
+rather than a GROUP BY on a period label: for ranges over a year the previous
+and year-ago periods overlap, and their shared rows count in both.
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from django.db.models import Q, QuerySet, Sum
+from django.db.models.functions import Round
+
+from apps.analytics.series import SERIES_METRICS, month_number, month_start
+
+COMPARISON_MODES = ("previous", "year")
+
+# Rollup field summed for every SERIES_METRICS metric
+METRIC_FIELDS = dict(
+    zip(
+        SERIES_METRICS,
+        (
+            "impressions",
+            "sales_count",
+            "rentals_count",
+            "royalty_revenue",
+            "impression_revenue",
+        ),
+    )
+)
+
+
+def shift_months(day: date, months: int) -> date:
+    """The day `months` months away, clamped to the end of shorter months."""
+    number = month_number(day) + months
+    last_day = month_start(number + 1) - timedelta(days=1)
+    return month_start(number).replace(day=min(day.day, last_day.day))
+
+
+def comparison_shift(
+    mode: str, granularity: str, period_start: date, period_end: date
+) -> Callable[[date], date]:
+    """Maps a day of the current period onto the compared period."""
+    if mode == "year":
+        return lambda day: shift_months(day, -12)
+    if granularity == "yearly":
+        years = period_end.year - period_start.year + 1
+        return lambda day: shift_months(day, -12 * years)
+    if granularity == "monthly":
+        months = month_number(period_end) - month_number(period_start) + 1
+        return lambda day: shift_months(day, -months)
+    days = period_end.toordinal() - period_start.toordinal() + 1
+    return lambda day: day - timedelta(days=days)
+
+
+def aggregate_period_buckets(
+    rollups_qs: QuerySet,
+    trunc: Callable,
+    periods: Dict[str, Tuple[date, date]],
+) -> Dict[str, List[Tuple]]:
+    """
+    (bucket, *metrics) rows of every period, metrics in SERIES_METRICS order,
+    from one GROUP BY query over the union of the periods.
+    """
+    scopes = {
+        name: Q(period_start__gte=start, period_end__lte=end)
+        for name, (start, end) in periods.items()
+    }
+    aggregates = {}
+    for name, scope in scopes.items():
+        for metric, field in METRIC_FIELDS.items():
+            aggregates[f"{name}_{metric}"] = Sum(field, filter=scope)
+        aggregates[f"{name}_impression_revenue"] = Round(
+            aggregates[f"{name}_impression_revenue"], 6
+        )
+
+    rows = list(
+        rollups_qs.filter(reduce(or_, scopes.values()))
+        .annotate(bucket=trunc("period_start"))
+        .values("bucket")
+        .annotate(**aggregates)
+        .values_list("bucket", *aggregates)
+        .order_by()
+    )
+
+    # Every period owns a consecutive slice of the aggregated values
+    width = len(SERIES_METRICS)
+    return {
+        name: [
+            (bucket, *(value or 0 for value in values[i * width : (i + 1) * width]))
+            for bucket, *values in rows
+        ]
+        for i, name in enumerate(scopes)
+    }
+
+
+def calculate_delta(
+    current: Union[int, Decimal], previous: Union[int, Decimal]
+) -> Dict[str, Optional[Union[int, float]]]:
+    """Absolute change, and relative change in percent unless from zero."""
+    change = current - previous
+    return {
+        "change": float(change) if isinstance(change, Decimal) else change,
+        "percent": round(float(change) / float(previous) * 100, 2)
+        if previous
+        else None,
+    }
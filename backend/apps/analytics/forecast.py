@@ -0,0 +1,225 @@
+"""
+Monthly revenue forecasts per product.
+
+The monthly royalty and impression revenue of every product of a project is
+loaded from the daily rollups with one grouped query into (products, months)
+NumPy arrays, and Holt's linear trend method is fitted to all products at
+once: the smoothing recursion steps through the months, each step updating
+every product and every candidate pair of smoothing factors together, and
+each product keeps the pair with the smallest one-step-ahead error.
+
+Fitting happens in the nightly task_refresh_revenue_forecasts only. The
+result is stored per project with the data version it was fitted for, and
+requests read it back without fitting anything.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from apps.analytics.cache import get_project_data_version
+from apps.analytics.series import bucket_labels, month_number, month_start
+from apps.product.models import Product, ProductDailyRollup, RevenueForecast
+from apps.project.models import Project
+
+FORECAST_HISTORY_MONTHS = 24
+FORECAST_HORIZON_MONTHS = 12
+FORECAST_METRICS = ("royalty_revenue", "impression_revenue")
+
+# Candidate level and trend smoothing factors
+FORECAST_ALPHAS = np.array([0.2, 0.4, 0.6, 0.8])
+FORECAST_BETAS = np.array([0.05, 0.2, 0.4])
+
+
+def load_monthly_revenue(
+    project_id: int, first_month: int, months: int
+) -> Tuple[List[int], Dict[str, np.ndarray]]:
+    """
+    The ids of the project's products and, per FORECAST_METRICS, a (products,
+    months) array of their revenue from month number first_month on.
+    """
+    product_ids = list(
+        Product.objects.filter(project_id=project_id)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    rows = list(
+        ProductDailyRollup.objects.filter(
+            product__project_id=project_id,
+            period_start__gte=month_start(first_month),
+            period_start__lt=month_start(first_month + months),
+        )
+        .annotate(month=TruncMonth("period_start"))
+        .values("product_id", "month")
+        .annotate(
+            royalty_revenue_sum=Sum("royalty_revenue"),
+            impression_revenue_sum=Sum("impression_revenue"),
+        )
+        .values_list(
+            "product_id", "month", "royalty_revenue_sum", "impression_revenue_sum"
+        )
+        .order_by()
+    )
+
+    series = {
+        metric: np.zeros((len(product_ids), months)) for metric in FORECAST_METRICS
+    }
+    if rows:
+        product_index = {
+            product_id: index for index, product_id in enumerate(product_ids)
+        }
+        product_ids_column, month_column, *metric_columns = zip(*rows)
+        row_index = np.array([product_index[pid] for pid in product_ids_column])
+        month_index = np.array(
+            [month_number(month) - first_month for month in month_column]
+        )
+        for metric, values in zip(FORECAST_METRICS, metric_columns):
+            series[metric][row_index, month_index] = np.array(values, dtype=float)
+    return product_ids, series
+
+
+def holt_forecast(series: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Forecast the next `horizon` values of every row of a (products, months)
+    array with Holt's linear trend method, never below zero.
+
+    A product's fit starts at its first non-zero month, so months before a
+    launch do not drag its trend down.
+    """
+    products, months = series.shape
+    shape = (len(FORECAST_ALPHAS), len(FORECAST_BETAS), products)
+    alpha = FORECAST_ALPHAS[:, None, None]
+    beta = FORECAST_BETAS[None, :, None]
+    level = np.zeros(shape)
+    trend = np.zeros(shape)
+    errors = np.zeros(shape)
+
+    started = np.maximum.accumulate(series != 0, axis=1)
+    for month in range(months):
+        value = series[:, month]
+        first = started[:, month] & ~(started[:, month - 1] if month else False)
+        fitting = started[:, month] & ~first
+
+        predicted = level + trend
+        new_level = alpha * value + (1 - alpha) * predicted
+        new_trend = beta * (new_level - level) + (1 - beta) * trend
+        errors += np.where(fitting, (value - predicted) ** 2, 0)
+        level = np.where(fitting, new_level, np.where(first, value, 0))
+        trend = np.where(fitting, new_trend, 0)
+
+    best = errors.reshape(-1, products).argmin(axis=0)
+    rows = np.arange(products)
+    level = level.reshape(-1, products)[best, rows]
+    trend = trend.reshape(-1, products)[best, rows]
+    steps = np.arange(1, horizon + 1)
+    return np.clip(level[:, None] + trend[:, None] * steps, 0, None)
+
+
+def fit_project_forecast(project_id: int, first_month: int) -> Dict[str, Dict]:
+    """
+    Forecast every product of the project for FORECAST_HORIZON_MONTHS months
+    from month number first_month, from the FORECAST_HISTORY_MONTHS before it.
+    """
+    product_ids, series = load_monthly_revenue(
+        project_id, first_month - FORECAST_HISTORY_MONTHS, FORECAST_HISTORY_MONTHS
+    )
+    forecasts = {
+        metric: holt_forecast(values, FORECAST_HORIZON_MONTHS).round(2)
+        for metric, values in series.items()
+    }
+    return {
+        str(product_id): {
+            metric: forecasts[metric][index].tolist() for metric in FORECAST_METRICS
+        }
+        for index, product_id in enumerate(product_ids)
+    }
+
+
+def refresh_revenue_forecasts(
+    project_ids: Optional[Iterable[int]] = None, today: Optional[date] = None
+) -> int:
+    """
+    Refit the forecasts of the projects (all by default) whose data changed
+    since their last fit or that start before this month. Returns how many
+    were refitted.
+    """
+    this_month = month_number(today or date.today())
+    projects = Project.objects.filter(product__isnull=False).distinct()
+    if project_ids is not None:
+        projects = projects.filter(id__in=list(project_ids))
+    fitted = {
+        forecast.project_id: forecast
+        for forecast in RevenueForecast.objects.filter(project__in=projects)
+    }
+
+    refreshed = 0
+    for project_id, data_version in projects.values_list("id", "data_version"):
+        forecast = fitted.get(project_id)
+        if (
+            forecast
+            and forecast.data_version == data_version
+            and month_number(forecast.first_month) == this_month
+        ):
+            continue
+        RevenueForecast.objects.update_or_create(
+            project_id=project_id,
+            defaults={
+                "data_version": data_version,
+                "first_month": month_start(this_month),
+                "products": fit_project_forecast(project_id, this_month),
+            },
+        )
+        refreshed += 1
+    return refreshed
+
+
+def get_revenue_forecast(
+    project_id: int,
+    months: int,
+    visibility,
+    product_id: Optional[int] = None,
+) -> Optional[Dict]:
+    """
+    The stored forecast of the visible products, or only of product_id, and
+    their sum, for the next `months` months. `stale` tells whether the data
+    changed since it was fitted. None until a forecast has been fitted.
+    """
+    forecast = RevenueForecast.objects.filter(project_id=project_id).first()
+    if forecast is None:
+        return None
+
+    products = visibility.products()
+    if product_id:
+        products = products.filter(id=product_id)
+    product_forecasts = []
+    for visible_id, title in products.order_by("id").values_list("id", "title"):
+        fitted = forecast.products.get(str(visible_id))
+        if fitted:
+            product_forecasts.append(
+                {
+                    "product_id": visible_id,
+                    "title": title,
+                    **{metric: fitted[metric][:months] for metric in FORECAST_METRICS},
+                }
+            )
+
+    total = {}
+    for metric in FORECAST_METRICS:
+        values = np.zeros(months)
+        for row in product_forecasts:
+            values[: len(row[metric])] += row[metric]
+        total[metric] = values.round(2).tolist()
+
+    first_month = month_number(forecast.first_month)
+    return {
+        "months": bucket_labels(
+            "monthly", [month_start(first_month + month) for month in range(months)]
+        ),
+        "total": total,
+        "products": product_forecasts,
+        "generated_at": forecast.generated_at,
+        "stale": forecast.data_version != get_project_data_version(project_id),
+    }
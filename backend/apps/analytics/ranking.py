@@ -0,0 +1,143 @@
+"""
+Top-K product rankings from the daily rollups.
+
+A ranking is one grouped query over the rollups of the requested range,
+returning flat rows rather than products with their nested facts. Rankings
+are cached like analytics responses, per project data version, visible
+product set and parameters, so every ingest (which bumps the data version
+through refresh_daily_rollups) invalidates them.
+"""
+
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from django.db.models import DecimalField, F, Q, QuerySet, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+from apps.analytics.cache import (
+    build_analytics_cache_key,
+    get_cached_analytics,
+    set_cached_analytics,
+)
+from apps.analytics.comparison import comparison_shift
+from apps.product.models import ProductDailyRollup
+
+RANKING_METRICS = ("impressions", "royalty_revenue", "impression_revenue", "growth")
+
+REVENUE_FIELD = DecimalField(max_digits=40, decimal_places=18)
+
+
+def revenue_sum(scope: Optional[Q] = None) -> Coalesce:
+    return Coalesce(
+        Sum(F("royalty_revenue") + F("impression_revenue"), filter=scope),
+        Value(Decimal("0")),
+        output_field=REVENUE_FIELD,
+    )
+
+
+def get_ranking_queryset(
+    project_id: int,
+    metric: str,
+    period_start: Optional[date] = None,
+    period_end: Optional[date] = None,
+    visible_products: Optional[QuerySet] = None,
+) -> QuerySet:
+    """
+    Per-product totals over the period, best first, excluding products with
+    nothing to rank by. Growth is the revenue gained over the period of the
+    same length before, which it needs both period bounds for.
+    """
+    rollups_qs = ProductDailyRollup.objects.filter(product__project_id=project_id)
+    if visible_products is not None:
+        rollups_qs = rollups_qs.filter(product_id__in=visible_products)
+
+    current = None
+    if period_start and period_end:
+        current = Q(period_start__gte=period_start, period_end__lte=period_end)
+
+    aggregates = {
+        "impressions_sum": Coalesce(Sum("impressions", filter=current), 0),
+        "royalty_revenue_sum": Coalesce(
+            Sum("royalty_revenue", filter=current), Value(Decimal("0"))
+        ),
+        "impression_revenue_sum": Round(
+            Coalesce(Sum("impression_revenue", filter=current), Value(Decimal("0"))),
+            6,
+        ),
+    }
+    if metric == "growth":
+        shift = comparison_shift("previous", "daily", period_start, period_end)
+        previous = Q(
+            period_start__gte=shift(period_start), period_end__lte=shift(period_end)
+        )
+        rollups_qs = rollups_qs.filter(current | previous)
+        aggregates["previous_revenue"] = revenue_sum(previous)
+        aggregates["growth"] = revenue_sum(current) - revenue_sum(previous)
+        ranked_by = "growth"
+    else:
+        if current:
+            rollups_qs = rollups_qs.filter(current)
+        ranked_by = f"{metric}_sum"
+
+    return (
+        rollups_qs.values("product_id", "product__title")
+        .annotate(**aggregates)
+        .filter(**{f"{ranked_by}__gt": 0})
+        .order_by(f"-{ranked_by}", "product_id")
+    )
+
+
+def rank_products(
+    project_id: int,
+    metric: str,
+    period_start: Optional[date] = None,
+    period_end: Optional[date] = None,
+    limit: int = 10,
+    visibility=None,
+) -> List[Dict[str, Any]]:
+    """
+    The `limit` best products by one of RANKING_METRICS among those visible
+    through the ProductVisibility, as lightweight rows.
+    """
+    visibility_token = visibility.cache_token if visibility else None
+    cache_key = build_analytics_cache_key(
+        project_id,
+        visibility_token,
+        ranking=metric,
+        period_start=period_start,
+        period_end=period_end,
+        limit=limit,
+    )
+    cached = get_cached_analytics(cache_key)
+    if cached is not None:
+        return cached["results"]
+
+    rows = get_ranking_queryset(
+        project_id,
+        metric,
+        period_start,
+        period_end,
+        visibility.product_ids if visibility else None,
+    )[:limit]
+    results = [
+        {
+            "rank": rank,
+            "product_id": row["product_id"],
+            "title": row["product__title"],
+            "impressions": row["impressions_sum"],
+            "royalty_revenue": float(row["royalty_revenue_sum"]),
+            "impression_revenue": float(row["impression_revenue_sum"]),
+            **(
+                {
+                    "previous_revenue": float(row["previous_revenue"]),
+                    "growth": float(row["growth"]),
+                }
+                if metric == "growth"
+                else {}
+            ),
+        }
+        for rank, row in enumerate(rows, start=1)
+    ]
+    set_cached_analytics(cache_key, {"results": results})
+    return results
@@ -0,0 +1,101 @@
+"""
+Execution of the independent sections of an analytics response.
+
+The time series, totals, per-source breakdown, product count and user earnings
+each run their own queries and none needs another's result. With
+ANALYTICS_PARALLEL_SECTIONS they are run on a bounded thread pool, so the
+response takes about as long as its slowest section rather than the sum of all.
+
+Django keeps one connection per thread, so every worker queries over its own
+connection. Workers release it after each section like a request would, which
+closes it unless CONN_MAX_AGE keeps it open. The pool size therefore also bounds
+the extra connections an analytics request can hold. The statements of the
+workers count towards the query statistics tracking the caller.
+
+Sections run by a section, like the analytics of the dashboard, run on that
+section's worker one after the other: a worker waiting on tasks queued behind
+it in the same pool could otherwise take every worker and never finish.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from common.query_stats import QueryStats, active_query_stats, track_queries
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_worker_state = threading.local()
+
+
+def get_section_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ANALYTICS_SECTION_WORKERS,
+                thread_name_prefix="analytics-section",
+            )
+        return _executor
+
+
+def run_timed(section: Callable[[], Any]) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = section()
+    return result, time.perf_counter() - started
+
+
+def run_in_worker(
+    section: Callable[[], Any], query_stats: List[QueryStats]
+) -> Tuple[Any, float]:
+    _worker_state.active = True
+    try:
+        with ExitStack() as stack:
+            for stats in query_stats:
+                stack.enter_context(track_queries(stats))
+            return run_timed(section)
+    finally:
+        _worker_state.active = False
+        close_old_connections()
+
+
+def in_section_worker() -> bool:
+    return getattr(_worker_state, "active", False)
+
+
+def run_sections(
+    sections: Dict[str, Callable[[], Any]],
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Run each section and return their results by name, concurrently when
+    ANALYTICS_PARALLEL_SECTIONS is set and this isn't already a section
+    worker.
+
+    The duration of every section, in milliseconds, is added to timings.
+    Exceptions raised by a section propagate to the caller either way.
+    """
+    if (
+        settings.ANALYTICS_PARALLEL_SECTIONS
+        and len(sections) > 1
+        and not in_section_worker()
+    ):
+        executor = get_section_executor()
+        query_stats = active_query_stats()
+        futures = {
+            name: executor.submit(run_in_worker, section, query_stats)
+            for name, section in sections.items()
+        }
+        outcomes = {name: future.result() for name, future in futures.items()}
+    else:
+        outcomes = {name: run_timed(section) for name, section in sections.items()}
+
+    if timings is not None:
+        for name, (_, duration) in outcomes.items():
+            timings[name] = round(duration * 1000, 3)
+    return {name: result for name, (result, _) in outcomes.items()}
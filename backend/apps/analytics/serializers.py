@@ -1,6 +1,116 @@
 from rest_framework import serializers
 
+from apps.analytics.comparison import COMPARISON_MODES
+from apps.analytics.forecast import FORECAST_HORIZON_MONTHS
+from apps.analytics.ranking import RANKING_METRICS
+from apps.analytics.utils import MATRIX_SORT_FIELDS
+
+DASHBOARD_SECTIONS = (
+    "analytics",
+    "source_analytics",
+    "user_earnings",
+    "top_by_impressions",
+    "top_by_sales",
+    "sources",
+    "products",
+)
+
 
 class AnalyticsSerializer(serializers.Serializer):
     period_start = serializers.DateField(required=False)
     period_end = serializers.DateField(required=False)
+
+
+class AnalyticsRequestSerializer(AnalyticsSerializer):
+    # A data_watermark from an earlier response
+    since = serializers.DateTimeField(required=False)
+    # Comma-separated COMPARISON_MODES
+    compare = serializers.CharField(required=False)
+
+    def validate_compare(self, value):
+        modes = {mode.strip() for mode in value.split(",") if mode.strip()}
+        unknown = modes - set(COMPARISON_MODES)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown comparison modes: {', '.join(sorted(unknown))}"
+            )
+        return modes
+
+    def validate(self, attrs):
+        if attrs.get("compare") and not (
+            attrs.get("period_start") and attrs.get("period_end")
+        ):
+            raise serializers.ValidationError(
+                "Comparisons need period_start and period_end."
+            )
+        return attrs
+
+
+class DashboardSerializer(AnalyticsSerializer):
+    # Comma-separated DASHBOARD_SECTIONS, all of them when omitted
+    sections = serializers.CharField(required=False)
+
+    def validate_sections(self, value):
+        sections = {name.strip() for name in value.split(",") if name.strip()}
+        unknown = sections - set(DASHBOARD_SECTIONS)
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown sections: {', '.join(sorted(unknown))}"
+            )
+        return sections
+
+
+class TopContentSerializer(AnalyticsSerializer):
+    metric = serializers.ChoiceField(choices=RANKING_METRICS, default="impressions")
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        if bool(attrs.get("period_start")) != bool(attrs.get("period_end")):
+            raise serializers.ValidationError(
+                "period_start and period_end must be given together."
+            )
+        if attrs["metric"] == "growth" and not attrs.get("period_start"):
+            raise serializers.ValidationError(
+                "Growth needs period_start and period_end."
+            )
+        return attrs
+
+
+class ForecastSerializer(serializers.Serializer):
+    months = serializers.IntegerField(
+        min_value=1, max_value=FORECAST_HORIZON_MONTHS, default=6
+    )
+    product_id = serializers.IntegerField(required=False)
+
+
+class ProductMatrixSerializer(AnalyticsSerializer):
+    granularity = serializers.ChoiceField(
+        choices=["daily", "monthly", "yearly"], required=False
+    )
+    sort = serializers.ChoiceField(
+        choices=[*MATRIX_SORT_FIELDS, "title"], default="revenue"
+    )
+    order = serializers.ChoiceField(choices=["asc", "desc"], default="desc")
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+
+    def validate(self, attrs):
+        period_start = attrs.get("period_start")
+        period_end = attrs.get("period_end")
+        if bool(period_start) != bool(period_end):
+            raise serializers.ValidationError(
+                "period_start and period_end must be given together."
+            )
+        if period_start and period_start > period_end:
+            raise serializers.ValidationError(
+                "period_start must not be after period_end."
+            )
+        return attrs
+
+
+class AnalyticsExportSerializer(AnalyticsSerializer):
+    # `format` is taken by DRF's content negotiation
+    export_format = serializers.ChoiceField(choices=["ndjson", "csv"], default="ndjson")
+    granularity = serializers.ChoiceField(
+        choices=["daily", "monthly", "yearly"], default="daily"
+    )
+    product_id = serializers.IntegerField(required=False)
@@ -0,0 +1,153 @@
+"""
+Dense, calendar-correct time series for analytics time_stats.
+
+Bucket keys are generated by calendar arithmetic (month and year numbers, day
+ordinals) instead of walking back by fixed day counts, and every bucket is
+addressed by its integer offset from the first key. That lets aggregated rows
+be joined onto the series by index into per-metric columns, with buckets that
+have no data left at the zero the columns start with.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+SERIES_METRICS = (
+    "impressions",
+    "sales",
+    "rentals",
+    "royalty_revenue",
+    "impression_revenue",
+)
+
+HOUR = timedelta(hours=1)
+
+Bucket = Union[date, datetime]
+
+
+def month_number(value: Bucket) -> int:
+    return value.year * 12 + value.month - 1
+
+
+def month_start(number: int) -> date:
+    return date(number // 12, number % 12 + 1, 1)
+
+
+def yearly_bucket_keys(years: int, period_end: Optional[Bucket]) -> List[date]:
+    """The first day of each of the `years` years ending with period_end's."""
+    end_year = (period_end or datetime.now()).year
+    return [date(year, 1, 1) for year in range(end_year - years + 1, end_year + 1)]
+
+
+def monthly_bucket_keys(months: int, period_end: Optional[Bucket]) -> List[date]:
+    """The first day of each of the `months` months ending with period_end's."""
+    end_month = month_number(period_end or datetime.now())
+    if months == 1:
+        # A single month is charted together with the month after it
+        return [month_start(end_month), month_start(end_month + 1)]
+    first_month = end_month - months + 1
+    return [month_start(number) for number in range(first_month, end_month + 1)]
+
+
+def daily_bucket_keys(period_start: date, period_end: date) -> List[date]:
+    ordinals = range(period_start.toordinal(), period_end.toordinal() + 1)
+    return list(map(date.fromordinal, ordinals))
+
+
+def hourly_bucket_keys(period_start: datetime, period_end: datetime) -> List[datetime]:
+    first_hour = period_start.replace(minute=0, second=0, microsecond=0)
+    if period_end < first_hour:
+        return []
+    hours = (period_end - first_hour) // HOUR + 1
+    return [first_hour + HOUR * offset for offset in range(hours)]
+
+
+def bucket_keys_between(
+    granularity: str, period_start: date, period_end: date
+) -> List[date]:
+    """Every daily, monthly or yearly bucket key from period_start to period_end."""
+    if granularity == "yearly":
+        years = range(period_start.year, period_end.year + 1)
+        return [date(year, 1, 1) for year in years]
+    if granularity == "monthly":
+        months = range(month_number(period_start), month_number(period_end) + 1)
+        return list(map(month_start, months))
+    return daily_bucket_keys(period_start, period_end)
+
+
+def series_bucket_keys(
+    granularity: str, period_start: date, period_end: date
+) -> List[date]:
+    """
+    The daily, monthly or yearly bucket keys of the time_stats of a period, as
+    calculate_granular_time_stats generates them for a bounded range.
+    """
+    if granularity == "yearly":
+        return yearly_bucket_keys(period_end.year - period_start.year + 1, period_end)
+    if granularity == "monthly":
+        months = month_number(period_end) - month_number(period_start) + 1
+        return monthly_bucket_keys(months, period_end)
+    return daily_bucket_keys(period_start, period_end)
+
+
+def bucket_offset(granularity: str, first_key: Bucket, key: Bucket) -> int:
+    """Position of `key` in a series of the given granularity starting at first_key."""
+    if granularity == "yearly":
+        return key.year - first_key.year
+    if granularity == "monthly":
+        return month_number(key) - month_number(first_key)
+    if granularity == "daily":
+        return key.toordinal() - first_key.toordinal()
+    return (key - first_key) // HOUR
+
+
+def bucket_labels(granularity: str, keys: Sequence[Bucket]) -> List[str]:
+    if granularity == "yearly":
+        return [f"{key.year:04d}" for key in keys]
+    if granularity == "monthly":
+        return [f"{key.year:04d}-{key.month:02d}" for key in keys]
+    if granularity == "daily":
+        return [f"{key.year:04d}-{key.month:02d}-{key.day:02d}" for key in keys]
+    return [
+        f"{key.year:04d}-{key.month:02d}-{key.day:02d} {key.hour:02d}:00"
+        for key in keys
+    ]
+
+
+def bucket_label_days(granularity: str, label: str) -> Tuple[date, date]:
+    """First and last day covered by a bucket, from its label."""
+    if granularity == "yearly":
+        year = int(label)
+        return date(year, 1, 1), date(year, 12, 31)
+    if granularity == "monthly":
+        first_day = date(int(label[:4]), int(label[5:7]), 1)
+        return first_day, month_start(month_number(first_day) + 1) - timedelta(days=1)
+    day = date.fromisoformat(label[:10])
+    return day, day
+
+
+def fill_series_columns(
+    granularity: str,
+    bucket_keys: Sequence[Bucket],
+    rows: Iterable[Sequence[Any]],
+    metrics: Sequence[str] = SERIES_METRICS,
+) -> Dict[str, List[Any]]:
+    """
+    Join aggregated (bucket, *values) rows, with the values in `metrics` order,
+    onto a contiguous series of bucket keys as produced by the *_bucket_keys
+    functions.
+
+    Returns one zero-filled column per metric; rows outside the series are
+    ignored.
+    """
+    size = len(bucket_keys)
+    columns = [[0] * size for _ in metrics]
+
+    if size:
+        first_key = bucket_keys[0]
+        for bucket, *values in rows:
+            index = bucket_offset(granularity, first_key, bucket)
+            if 0 <= index < size:
+                for column, value in zip(columns, values):
+                    column[index] = value
+
+    return dict(zip(metrics, columns))
@@ -1,18 +1,66 @@
+import json
+import os
 import random
 import string
-from datetime import date, timedelta
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 from ddt import ddt, data
+import numpy as np
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from apps.product.models import Product, ProductImpressions, ProductSale
-from apps.project.models import Project, ProjectUser
-from apps.analytics.utils import calculate_analytics
+from apps.product.models import (
+    Product,
+    ProductDailyRollup,
+    ProductImpressions,
+    ProductSale,
+)
+from apps.product.partitions import (
+    default_partition_name,
+    ensure_fact_partitions,
+    maintain_fact_partitions,
+    month_partition_name,
+)
+from apps.product.services import refresh_daily_rollups
+from apps.data_imports.models import File
+from apps.expenses.models import Expense
+from apps.data_imports.services import delete_file
+from apps.project.models import ProducerProductAccess, Project, ProjectUser
+from apps.sources.models import Source
+from apps.analytics.benchmarks import compare_benchmark_results
+from apps.analytics.cache import get_project_data_version
+from apps.analytics.comparison import shift_months
+from apps.analytics.forecast import holt_forecast, refresh_revenue_forecasts
+from apps.analytics.sections import get_section_executor, run_sections
+from common.query_stats import track_queries
+from apps.analytics.series import (
+    daily_bucket_keys,
+    fill_series_columns,
+    month_number,
+    yearly_bucket_keys,
+)
+from apps.analytics.utils import (
+    calculate_analytics,
+    calculate_analytics_per_source,
+    calculate_project_earnings,
+    calculate_time_stats,
+    calculate_totals,
+    calculate_user_earnings,
+    monthly_bucket_keys,
+)
 
 
 @ddt
@@ -231,7 +279,7 @@ class AnalyticsViewTests(TestCase):
         self.assertIsInstance(response.data, dict)
         self.assertEqual(response.data.get("granularity"), "yearly")
 
-    @data(1, 3, 5, 7, 14)  # ~ 1, 3, 5, 7, 14 days
+    @data(3, 5, 7, 14)  # ~ 3, 5, 7, 14 days
     def test_analytics_get_with_daily_granularity_multiple(self, days):
         """Test analytics GET endpoint with daily granularity for multiple day ranges"""
         start_date = date.today() - timedelta(days=days)
@@ -249,6 +297,40 @@ class AnalyticsViewTests(TestCase):
         self.assertIsInstance(response.data, dict)
         self.assertEqual(response.data.get("granularity"), "daily")
 
+    def test_analytics_get_with_hourly_granularity(self):
+        """Test analytics GET endpoint with hourly granularity (1 day range)"""
+        start_date = date.today() - timedelta(days=1)
+        sale_time = timezone.make_aware(datetime.combine(start_date, time(14, 30)))
+        ProductSale.objects.create(
+            product=self.product,
+            type=ProductSale.TYPE_RENTAL,
+            unit_price=Decimal("10.00"),
+            unit_price_currency="USD",
+            quantity=1,
+            royalty_amount=Decimal("4.00"),
+            royalty_currency="USD",
+            period_start=sale_time,
+            period_end=sale_time,
+        )
+
+        response = self.client.get(
+            self.analytics_url,
+            {
+                "period_start": start_date.strftime("%Y-%m-%d"),
+                "period_end": date.today().strftime("%Y-%m-%d"),
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get("granularity"), "hourly")
+        time_stats = response.data["time_stats"]
+        self.assertEqual(len(time_stats), 48)
+        self.assertEqual(time_stats[14]["period"], f"{start_date:%Y-%m-%d} 14:00")
+        self.assertEqual(time_stats[14]["sales"], 1)
+        self.assertEqual(time_stats[14]["rentals"], 1)
+        self.assertEqual(time_stats[14]["royalty_revenue"], Decimal("4.00"))
+        self.assertEqual(sum(entry["sales"] for entry in time_stats), 1)
+
     def test_analytics_granularity_max_when_no_period_set(self):
         """Test that granularity is 'max' when no period parameters are provided"""
         response = self.client.get(self.analytics_url)
@@ -355,6 +437,8 @@ class TimeRangeCalculationTests(TestCase):
         )
 
         # Call the analytics function with no granularity specified (triggers the code snippet)
+        refresh_daily_rollups([self.product.id])
+
         result = calculate_analytics(
             project_id=self.project.id,
             filters={},
@@ -379,6 +463,8 @@ class TimeRangeCalculationTests(TestCase):
             period_end=impression_date + timedelta(days=1)
         )
 
+        refresh_daily_rollups([self.product.id])
+
         result = calculate_analytics(
             project_id=self.project.id,
             filters={},
@@ -407,6 +493,8 @@ class TimeRangeCalculationTests(TestCase):
             period_end=sale_date + timedelta(days=1)
         )
 
+        refresh_daily_rollups([self.product.id])
+
         result = calculate_analytics(
             project_id=self.project.id,
             filters={},
@@ -422,6 +510,8 @@ class TimeRangeCalculationTests(TestCase):
     def test_no_data_fallback_to_yearly(self):
         """Test fallback to 1 year when no data exists"""
         # No data created - should fallback to 1 year
+        refresh_daily_rollups([self.product.id])
+
         result = calculate_analytics(
             project_id=self.project.id,
             filters={},
@@ -447,6 +537,8 @@ class TimeRangeCalculationTests(TestCase):
             period_end=start_date + timedelta(days=1)
         )
 
+        refresh_daily_rollups([self.product.id])
+
         result = calculate_analytics(
             project_id=self.project.id,
             filters={},
@@ -470,6 +562,8 @@ class TimeRangeCalculationTests(TestCase):
             period_end=start_date + timedelta(days=1)
         )
 
+        refresh_daily_rollups([self.product.id])
+
         result = calculate_analytics(
             project_id=self.project.id,
             filters={},
@@ -493,6 +587,8 @@ class TimeRangeCalculationTests(TestCase):
             period_end=start_date + timedelta(days=1)
         )
 
+        refresh_daily_rollups([self.product.id])
+
         result = calculate_analytics(
             project_id=self.project.id,
             filters={},
@@ -520,6 +616,8 @@ class TimeRangeCalculationTests(TestCase):
             period_end=start_date + timedelta(days=1)
         )
 
+        refresh_daily_rollups([self.product.id])
+
         result = calculate_analytics(
             project_id=self.project.id,
             filters={},
@@ -558,6 +656,8 @@ class TimeRangeCalculationTests(TestCase):
             period_end=sale_date + timedelta(days=1)
         )
 
+        refresh_daily_rollups([self.product.id])
+
         result = calculate_analytics(
             project_id=self.project.id,
             filters={},
@@ -582,6 +682,8 @@ class TimeRangeCalculationTests(TestCase):
             period_end=future_date + timedelta(days=1)
         )
 
+        refresh_daily_rollups([self.product.id])
+
         result = calculate_analytics(
             project_id=self.project.id,
             filters={},
@@ -593,3 +695,1678 @@ class TimeRangeCalculationTests(TestCase):
         # Should still work and return valid result
         self.assertIn('granularity', result)
         self.assertIn('time_stats', result)
+
+
+class TimeBucketAggregationTests(TestCase):
+    """Tests for the single-pass time bucket aggregation engine"""
+
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.product = Product.objects.create(
+            project=self.project,
+            title="Test Product",
+            statement_frequency="Monthly",
+            first_statement_end_date=date.today(),
+            payment_threshold=100.00,
+            payment_window=30,
+            is_active=True,
+        )
+
+        for day, impressions in ((date(2024, 1, 5), 1000), (date(2024, 1, 20), 500)):
+            ProductImpressions.objects.create(
+                product=self.product,
+                impressions=impressions,
+                ecpm=Decimal("2.00"),
+                period_start=day,
+                period_end=day,
+            )
+
+        for day, sale_type in (
+            (date(2024, 1, 10), ProductSale.TYPE_PURCHASE),
+            (date(2024, 3, 10), ProductSale.TYPE_RENTAL),
+            (date(2024, 3, 11), ProductSale.TYPE_PURCHASE),
+        ):
+            ProductSale.objects.create(
+                product=self.product,
+                type=sale_type,
+                unit_price=Decimal("10.00"),
+                unit_price_currency="USD",
+                quantity=1,
+                royalty_amount=Decimal("4.00"),
+                royalty_currency="USD",
+                period_start=day,
+                period_end=day,
+            )
+
+        refresh_daily_rollups([self.product.id])
+        self.rollups_qs = ProductDailyRollup.objects.filter(product=self.product)
+
+    def test_monthly_buckets_use_a_single_query(self):
+        """All metrics are computed with a single grouped query"""
+        bucket_keys = [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1)]
+
+        with self.assertNumQueries(1):
+            time_stats = calculate_time_stats(self.rollups_qs, "monthly", bucket_keys)
+
+        self.assertEqual(
+            [entry["month"] for entry in time_stats], ["2024-01", "2024-02", "2024-03"]
+        )
+        self.assertEqual(time_stats[0]["impressions"], 1500)
+        self.assertEqual(time_stats[0]["impression_revenue"], Decimal("3"))
+        self.assertEqual(time_stats[0]["sales"], 1)
+        self.assertEqual(time_stats[0]["rentals"], 0)
+        self.assertEqual(time_stats[1]["impressions"], 0)
+        self.assertEqual(time_stats[1]["royalty_revenue"], 0)
+        self.assertEqual(time_stats[2]["sales"], 2)
+        self.assertEqual(time_stats[2]["rentals"], 1)
+        self.assertEqual(time_stats[2]["royalty_revenue"], Decimal("8.00"))
+
+    def test_yearly_and_daily_buckets_share_the_engine(self):
+        """Every granularity produces labels in its expected format"""
+        yearly = calculate_time_stats(self.rollups_qs, "yearly", [date(2024, 1, 1)])
+        self.assertEqual(yearly[0]["year"], "2024")
+        self.assertEqual(yearly[0]["sales"], 3)
+
+        daily = calculate_time_stats(self.rollups_qs, "daily", [date(2024, 1, 5)])
+        self.assertEqual(daily[0]["period"], "2024-01-05")
+        self.assertEqual(daily[0]["impressions"], 1000)
+
+    def test_monthly_bucket_keys_end_at_period_end(self):
+        """Monthly bucket keys are ordered and end with the period end month"""
+        keys = monthly_bucket_keys(3, datetime(2024, 3, 31))
+        self.assertEqual(keys[-1], date(2024, 3, 1))
+        self.assertEqual(keys, sorted(keys))
+
+    def test_totals_use_a_single_query(self):
+        """Totals are computed from the rollups in one query"""
+        with self.assertNumQueries(1):
+            totals = calculate_totals(self.rollups_qs)
+
+        self.assertEqual(totals["total_impressions"], 1500)
+        self.assertEqual(totals["total_sales_count"], 3)
+        self.assertEqual(totals["rentals_count"], 1)
+        self.assertEqual(totals["purchases_count"], 2)
+        self.assertEqual(totals["rentals_revenue"], Decimal("4.00"))
+        self.assertEqual(totals["purchases_revenue"], Decimal("8.00"))
+        self.assertEqual(totals["total_royalty_revenue"], Decimal("12.00"))
+
+
+class BucketSeriesTests(TestCase):
+    """Tests for the calendar-correct bucket series generator"""
+
+    def test_monthly_keys_neither_skip_nor_repeat_months(self):
+        """Long monthly series contain every calendar month exactly once"""
+        keys = monthly_bucket_keys(120, date(2024, 3, 31))
+
+        self.assertEqual(len(set(keys)), 120)
+        self.assertEqual(keys[0], date(2014, 4, 1))
+        self.assertEqual(keys[-1], date(2024, 3, 1))
+        for previous, current in zip(keys, keys[1:]):
+            self.assertEqual(month_number(current) - month_number(previous), 1)
+
+    def test_single_month_is_charted_with_the_next_one(self):
+        """A one-month range keeps its two-point series"""
+        self.assertEqual(
+            monthly_bucket_keys(1, date(2024, 12, 15)),
+            [date(2024, 12, 1), date(2025, 1, 1)],
+        )
+
+    def test_yearly_keys_cover_consecutive_years(self):
+        """Yearly series are not shifted by leap years"""
+        keys = yearly_bucket_keys(30, date(2024, 1, 1))
+
+        self.assertEqual(keys, [date(year, 1, 1) for year in range(1995, 2025)])
+
+    def test_daily_series_is_zero_filled_by_index(self):
+        """Rows are joined onto the series by offset; other buckets stay zero"""
+        keys = daily_bucket_keys(date(2014, 1, 1), date(2023, 12, 31))
+        rows = [
+            (date(2016, 2, 29), 10, 1, 0, Decimal("2.00"), Decimal("0.5")),
+            (date(2030, 1, 1), 99, 9, 9, Decimal("9.00"), Decimal("9")),
+        ]
+
+        columns = fill_series_columns("daily", keys, rows)
+
+        self.assertEqual(len(keys), 3652)
+        self.assertEqual(columns["impressions"][keys.index(date(2016, 2, 29))], 10)
+        self.assertEqual(sum(columns["impressions"]), 10)
+        self.assertEqual(columns["rentals"], [0] * len(keys))
+
+
+class DailyRollupTests(TestCase):
+    """Tests for incremental maintenance of the daily rollup table"""
+
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.product = Product.objects.create(
+            project=self.project, title="Test Product"
+        )
+        self.file = File.objects.create(project=self.project, name="statement.csv")
+
+    def create_sale(self, day, from_file=None, **kwargs):
+        values = {
+            "product": self.product,
+            "type": ProductSale.TYPE_PURCHASE,
+            "unit_price": Decimal("10.00"),
+            "unit_price_currency": "USD",
+            "quantity": 1,
+            "royalty_amount": Decimal("5.00"),
+            "royalty_currency": "USD",
+            "period_start": day,
+            "period_end": day,
+            "from_file": from_file,
+        }
+        values.update(kwargs)
+        return ProductSale.objects.create(**values)
+
+    def test_refresh_aggregates_sales_and_impressions(self):
+        """Rollup rows hold the combined metrics of each product and day"""
+        day = date(2024, 5, 1)
+        self.create_sale(day)
+        self.create_sale(day, type=ProductSale.TYPE_RENTAL, is_refund=True)
+        ProductImpressions.objects.create(
+            product=self.product,
+            impressions=2000,
+            ecpm=Decimal("1.50"),
+            period_start=day,
+            period_end=day,
+        )
+
+        self.assertEqual(refresh_daily_rollups([self.product.id]), 1)
+
+        rollup = ProductDailyRollup.objects.get(product=self.product)
+        self.assertEqual(rollup.impressions, 2000)
+        self.assertEqual(rollup.impression_revenue, Decimal("3"))
+        self.assertEqual(rollup.sales_count, 2)
+        self.assertEqual(rollup.rentals_count, 1)
+        self.assertEqual(rollup.purchases_count, 1)
+        self.assertEqual(rollup.refunds_count, 1)
+        self.assertEqual(rollup.royalty_revenue, Decimal("10.00"))
+        self.assertEqual(rollup.refunds_revenue, Decimal("5.00"))
+
+    def test_refresh_window_leaves_other_days_untouched(self):
+        """Only rollup rows inside the refreshed window are rebuilt"""
+        self.create_sale(date(2024, 5, 1))
+        refresh_daily_rollups([self.product.id])
+
+        self.create_sale(date(2024, 5, 1))
+        self.create_sale(date(2024, 6, 1))
+        refresh_daily_rollups([self.product.id], date(2024, 6, 1), date(2024, 6, 1))
+
+        rollups = ProductDailyRollup.objects.filter(product=self.product)
+        self.assertEqual(rollups.get(period_start=date(2024, 5, 1)).sales_count, 1)
+        self.assertEqual(rollups.get(period_start=date(2024, 6, 1)).sales_count, 1)
+
+    def test_timestamps_roll_up_into_their_day(self):
+        """Fact rows anywhere inside a day land in that day's rollup row"""
+        for hour in (0, 13, 23):
+            moment = timezone.make_aware(datetime(2024, 5, 1, hour, 30))
+            self.create_sale(moment)
+
+        refresh_daily_rollups([self.product.id], date(2024, 5, 1), date(2024, 5, 1))
+
+        rollup = ProductDailyRollup.objects.get(product=self.product)
+        self.assertEqual(rollup.period_start, date(2024, 5, 1))
+        self.assertEqual(rollup.sales_count, 3)
+
+    def test_delete_file_removes_its_rollups(self):
+        """Deleting an imported file refreshes the rollups it contributed to"""
+        self.create_sale(date(2024, 5, 1))
+        self.create_sale(date(2024, 5, 1), from_file=self.file)
+        self.create_sale(date(2024, 5, 2), from_file=self.file)
+        refresh_daily_rollups([self.product.id])
+
+        delete_file(self.file.id)
+
+        rollups = ProductDailyRollup.objects.filter(product=self.product)
+        self.assertEqual(rollups.count(), 1)
+        self.assertEqual(rollups.get().sales_count, 1)
+
+    def test_analytics_reads_from_rollups(self):
+        """calculate_analytics only reflects data that has been rolled up"""
+        self.create_sale(date(2024, 5, 1))
+        filters = {"period_start__gte": date(2024, 1, 1)}
+
+        result = calculate_analytics(self.project.id, filters, None, None)
+        self.assertEqual(result["total_sales_count"], 0)
+
+        refresh_daily_rollups([self.product.id])
+
+        result = calculate_analytics(self.project.id, filters, None, None)
+        self.assertEqual(result["total_sales_count"], 1)
+        self.assertEqual(result["total_royalty_revenue"], Decimal("5.00"))
+
+
+class SourceAnalyticsTests(TestCase):
+    """Tests for the grouped per-source analytics"""
+
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.sources = [
+            Source.objects.create(
+                project=self.project,
+                platform=platform,
+                account_name=f"{platform} account",
+            )
+            for platform in (Source.PLATFORM_YOUTUBE, Source.PLATFORM_VIMEO)
+        ]
+
+        day = date(2024, 5, 1)
+        for index, source in enumerate(self.sources, start=1):
+            for _ in range(index):
+                product = Product.objects.create(
+                    project=self.project, title=f"Video {source.id}", source=source
+                )
+                ProductImpressions.objects.create(
+                    product=product,
+                    impressions=1000 * index,
+                    ecpm=Decimal("1.00"),
+                    period_start=day,
+                    period_end=day,
+                )
+                ProductSale.objects.create(
+                    product=product,
+                    type=ProductSale.TYPE_RENTAL,
+                    unit_price=Decimal("10.00"),
+                    unit_price_currency="USD",
+                    quantity=1,
+                    royalty_amount=Decimal("2.00"),
+                    royalty_currency="USD",
+                    period_start=day,
+                    period_end=day,
+                )
+
+        refresh_daily_rollups(
+            Product.objects.filter(project=self.project).values_list("id", flat=True)
+        )
+        self.rollups_qs = ProductDailyRollup.objects.filter(
+            product__project=self.project
+        )
+
+    def test_per_source_totals_are_independent(self):
+        """Each source only reports its own products' data"""
+        source_analytics = calculate_analytics_per_source(
+            self.project.id, self.rollups_qs
+        )
+        by_id = {entry["id"]: entry["analytics"] for entry in source_analytics}
+
+        youtube, vimeo = self.sources
+        self.assertEqual(by_id[youtube.id]["total_impressions"], 1000)
+        self.assertEqual(by_id[youtube.id]["product_count"], 1)
+        self.assertEqual(by_id[youtube.id]["rentals_count"], 1)
+        self.assertEqual(by_id[vimeo.id]["total_impressions"], 4000)
+        self.assertEqual(by_id[vimeo.id]["product_count"], 2)
+        self.assertEqual(by_id[vimeo.id]["total_royalty_revenue"], 4.0)
+        self.assertEqual(source_analytics[0]["id"], vimeo.id)
+
+    def test_query_count_does_not_grow_with_sources(self):
+        """Per-source analytics use a fixed number of queries"""
+        Source.objects.create(
+            project=self.project,
+            platform=Source.PLATFORM_TWITCH,
+            account_name="Empty account",
+        )
+
+        with self.assertNumQueries(2):
+            source_analytics = calculate_analytics_per_source(
+                self.project.id, self.rollups_qs
+            )
+
+        self.assertEqual(len(source_analytics), 3)
+        self.assertEqual(source_analytics[-1]["analytics"]["total_impressions"], 0)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class AnalyticsCacheTests(TestCase):
+    """Tests for the versioned, visibility-aware analytics cache"""
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user(
+            email="cache_owner@test.com", name="Owner", password="Testaccount1_"
+        )
+        self.producer = User.objects.create_user(
+            email="cache_producer@test.com", name="Producer", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        ProjectUser.objects.create(
+            project=self.project,
+            user=self.owner,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        producer_membership = ProjectUser.objects.create(
+            project=self.project,
+            user=self.producer,
+            role=ProjectUser.PROJECT_USER_ROLE_PRODUCER,
+        )
+        self.product_a = Product.objects.create(project=self.project, title="A")
+        self.product_b = Product.objects.create(project=self.project, title="B")
+        ProducerProductAccess.objects.create(
+            project_user=producer_membership, product=self.product_a
+        )
+        self.filters = {"period_start__gte": date(2024, 1, 1)}
+
+        self.create_sale(self.product_a)
+        self.create_sale(self.product_b)
+        refresh_daily_rollups([self.product_a.id, self.product_b.id])
+
+    def create_sale(self, product):
+        return ProductSale.objects.create(
+            product=product,
+            type=ProductSale.TYPE_PURCHASE,
+            unit_price=Decimal("10.00"),
+            unit_price_currency="USD",
+            quantity=1,
+            royalty_amount=Decimal("5.00"),
+            royalty_currency="USD",
+            period_start=date(2024, 5, 1),
+            period_end=date(2024, 5, 1),
+        )
+
+    def test_repeated_call_is_served_from_cache(self):
+        """Only the data version is read when the response is cached"""
+        calculate_analytics(self.project.id, self.filters, None, None)
+
+        with self.assertNumQueries(1):
+            result = calculate_analytics(self.project.id, self.filters, None, None)
+        self.assertEqual(result["total_sales_count"], 2)
+
+    def test_refreshing_rollups_invalidates_cache(self):
+        """New data landing in the rollups is visible on the next call"""
+        calculate_analytics(self.project.id, self.filters, None, None)
+
+        self.create_sale(self.product_a)
+        refresh_daily_rollups([self.product_a.id])
+
+        result = calculate_analytics(self.project.id, self.filters, None, None)
+        self.assertEqual(result["total_sales_count"], 3)
+
+    def test_producers_do_not_share_owner_entries(self):
+        """Cached responses are keyed by the caller's visible products"""
+        owner_result = calculate_analytics(
+            self.project.id, self.filters, None, None, user=self.owner
+        )
+        producer_result = calculate_analytics(
+            self.project.id, self.filters, None, None, user=self.producer
+        )
+
+        self.assertEqual(owner_result["total_sales_count"], 2)
+        self.assertEqual(producer_result["total_sales_count"], 1)
+
+    def test_expense_changes_bump_data_version(self):
+        """Creating an expense through the API invalidates the project's cache"""
+        client = APIClient()
+        self.owner.currently_selected_project = self.project
+        self.owner.save()
+        client.force_authenticate(user=self.owner)
+        version = get_project_data_version(self.project.id)
+
+        response = client.post(
+            reverse("expense-list-create"),
+            {
+                "name": "Editing",
+                "value": "10.00",
+                "type": "static",
+                "user": self.producer.id,
+                "product": self.product_a.id,
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(get_project_data_version(self.project.id), version + 1)
+
+
+class UserEarningsTests(TestCase):
+    """Tests for the batched expense-based earnings calculation"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.users = [
+            User.objects.create_user(
+                email=f"earner_{i}@test.com", name=f"Earner {i}", password="Test1_"
+            )
+            for i in range(2)
+        ]
+        for user in self.users:
+            ProjectUser.objects.create(project=self.project, user=user)
+        self.products = [
+            Product.objects.create(project=self.project, title=f"Product {i}")
+            for i in range(3)
+        ]
+
+        for i, product in enumerate(self.products):
+            ProductSale.objects.create(
+                product=product,
+                type=ProductSale.TYPE_PURCHASE,
+                unit_price=Decimal("10.00"),
+                unit_price_currency="USD",
+                quantity=1,
+                royalty_amount=Decimal("100.00") * (i + 1),
+                royalty_currency="USD",
+                period_start=date(2024, 5, 1),
+                period_end=date(2024, 5, 1),
+            )
+            ProductImpressions.objects.create(
+                product=product,
+                impressions=1000,
+                ecpm=Decimal("10.00"),
+                period_start=date(2024, 5, 1),
+                period_end=date(2024, 5, 1),
+            )
+            # 10% of every product's revenue for the first user
+            self.create_expense(self.users[0], product, Expense.TYPE_PERCENTAGE, "10")
+        self.create_expense(self.users[0], self.products[0], Expense.TYPE_STATIC, "25")
+        self.create_expense(self.users[1], self.products[2], Expense.TYPE_STATIC, "5")
+        refresh_daily_rollups(product.id for product in self.products)
+
+    def create_expense(self, user, product, expense_type, value):
+        return Expense.objects.create(
+            name="Expense",
+            value=Decimal(value),
+            type=expense_type,
+            user=user,
+            product=product,
+            project=self.project,
+        )
+
+    def test_percentage_and_static_expenses(self):
+        """Earnings combine static amounts with a share of product revenue"""
+        earnings = calculate_user_earnings(self.project.id, self.users[0].id)
+
+        # Revenue is 110 + 210 + 310; 10% of it plus the static 25
+        self.assertEqual(earnings["total_earnings"], 88.0)
+        self.assertEqual(earnings["expense_count"], 4)
+        self.assertTrue(earnings["has_expenses"])
+
+    def test_revenue_is_fetched_in_one_query(self):
+        """Query count does not grow with the number of percentage expenses"""
+        with self.assertNumQueries(2):
+            calculate_user_earnings(self.project.id, self.users[0].id)
+
+    def test_project_earnings_cover_every_member(self):
+        """The bulk variant matches the per-user calculation for all members"""
+        with self.assertNumQueries(3):
+            earnings = calculate_project_earnings(self.project.id)
+
+        for user in self.users:
+            self.assertEqual(
+                earnings[user.id],
+                calculate_user_earnings(self.project.id, user.id),
+            )
+
+
+@skipUnless(connection.vendor == "postgresql", "Partitioning needs PostgreSQL")
+class FactPartitionTests(TestCase):
+    """Tests for the monthly partitions of the fact tables"""
+
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.product = Product.objects.create(
+            project=self.project, title="Test Product"
+        )
+
+    def partition_of(self, impression):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM product_impressions "
+                "WHERE id = %s",
+                [impression.id],
+            )
+            return cursor.fetchone()[0]
+
+    def create_impression(self, moment):
+        return ProductImpressions.objects.create(
+            product=self.product,
+            impressions=100,
+            ecpm=Decimal("1.00"),
+            period_start=moment,
+            period_end=moment,
+        )
+
+    def test_rows_are_stored_in_their_month_partition(self):
+        """Rows for upcoming months go straight to their month partition"""
+        maintain_fact_partitions()
+        month = date.today().replace(day=1)
+        impression = self.create_impression(
+            timezone.make_aware(datetime.combine(month, time(12)))
+        )
+
+        self.assertEqual(
+            self.partition_of(impression),
+            month_partition_name("product_impressions", month),
+        )
+
+    def test_maintenance_moves_rows_out_of_the_default_partition(self):
+        """Months without a partition are split out of DEFAULT with their rows"""
+        moment = timezone.make_aware(datetime(1990, 7, 15, 8))
+        impression = self.create_impression(moment)
+        self.assertEqual(
+            self.partition_of(impression),
+            default_partition_name("product_impressions"),
+        )
+
+        self.assertGreaterEqual(maintain_fact_partitions(), 1)
+
+        self.assertEqual(
+            self.partition_of(impression),
+            month_partition_name("product_impressions", date(1990, 7, 1)),
+        )
+        impression.refresh_from_db()
+        self.assertEqual(impression.impressions, 100)
+
+    def test_ensure_partitions_covers_a_range_of_months(self):
+        """Partitions are created up front for history that is about to be loaded"""
+        impression = self.create_impression(
+            timezone.make_aware(datetime(1991, 2, 10, 8))
+        )
+
+        self.assertEqual(ensure_fact_partitions(date(1991, 1, 1), date(1991, 3, 1)), 6)
+        self.assertEqual(ensure_fact_partitions(date(1991, 1, 1), date(1991, 3, 1)), 0)
+        self.assertEqual(
+            self.partition_of(impression),
+            month_partition_name("product_impressions", date(1991, 2, 1)),
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "Synthetic data needs PostgreSQL")
+class SyntheticBenchmarkTests(TestCase):
+    """Tests for the synthetic tenant and analytics benchmark commands"""
+
+    def setUp(self):
+        call_command(
+            "seed_synthetic_tenants",
+            products=4,
+            sources=2,
+            producers=1,
+            years=1,
+            name_prefix="Benchmark tenant",
+            stdout=StringIO(),
+        )
+        self.project = Project.objects.get(name="Benchmark tenant 1")
+
+    def test_seed_creates_a_tenant_with_history(self):
+        """The synthetic project has products, producers and a year of rollups"""
+        products = Product.objects.filter(project=self.project)
+        self.assertEqual(products.count(), 4)
+        self.assertEqual(self.project.sources.count(), 2)
+        self.assertEqual(
+            ProductImpressions.objects.filter(product__project=self.project).count(),
+            4 * 365,
+        )
+        self.assertEqual(
+            ProductDailyRollup.objects.filter(product__project=self.project).count(),
+            4 * 365,
+        )
+
+        producer = ProjectUser.objects.get(
+            project=self.project, role=ProjectUser.PROJECT_USER_ROLE_PRODUCER
+        )
+        self.assertEqual(producer.product_access.count(), 1)
+
+    def test_benchmark_writes_results(self):
+        """Every case is timed for the owner and the producer"""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command(
+                "benchmark_analytics",
+                name_prefix="Benchmark tenant",
+                repeat=1,
+                output=output,
+                stdout=StringIO(),
+            )
+            with open(output) as results_file:
+                results = json.load(results_file)
+
+        self.assertEqual(results["datasets"][0]["products"], 4)
+        cases = {(row["case"], row["role"]) for row in results["results"]}
+        for case in (
+            "analytics_yearly",
+            "analytics_monthly",
+            "analytics_daily",
+            "analytics_hourly",
+            "analytics_per_source",
+            "top_content_by_impressions",
+            "top_content_by_sales",
+            "report_generation",
+        ):
+            self.assertIn((case, "owner"), cases)
+            self.assertIn((case, "producer"), cases)
+        self.assertTrue(all(row["queries"] > 0 for row in results["results"]))
+
+        # The rolled back report runs leave no reports behind
+        self.assertFalse(self.project.report_set.exists())
+
+    def test_compare_flags_slower_cases_and_extra_queries(self):
+        """Regressions are cases with more queries or a slower median"""
+        row = {
+            "project": "Benchmark tenant 1",
+            "case": "analytics_monthly",
+            "role": "owner",
+            "queries": 10,
+            "median_ms": 100.0,
+        }
+        baseline = {"results": [row]}
+
+        self.assertEqual(
+            compare_benchmark_results(
+                {"results": [dict(row, median_ms=120.0)]}, baseline
+            ),
+            [],
+        )
+        regressions = compare_benchmark_results(
+            {"results": [dict(row, queries=11, median_ms=200.0)]}, baseline
+        )
+        self.assertEqual(len(regressions), 2)
+
+
+class ProductMatrixTests(TestCase):
+    """Tests for the products x periods analytics matrix"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="matrix@test.com", name="Matrix User", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.project_user = ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("product-matrix")
+
+        self.products = [
+            Product.objects.create(project=self.project, title=title)
+            for title in ("Alpha", "Beta", "Gamma")
+        ]
+        # Alpha earns the most, Gamma has no data at all
+        self.create_sale(self.products[0], date(2024, 1, 10), Decimal("30.00"))
+        self.create_sale(self.products[0], date(2024, 3, 5), Decimal("10.00"))
+        self.create_sale(self.products[1], date(2024, 3, 20), Decimal("5.00"))
+        ProductImpressions.objects.create(
+            product=self.products[1],
+            impressions=1000,
+            ecpm=Decimal("2.00"),
+            period_start=date(2024, 3, 20),
+            period_end=date(2024, 3, 20),
+        )
+        refresh_daily_rollups([product.id for product in self.products])
+
+    def create_sale(self, product, day, royalty_amount):
+        return ProductSale.objects.create(
+            product=product,
+            type=ProductSale.TYPE_PURCHASE,
+            unit_price=Decimal("10.00"),
+            unit_price_currency="USD",
+            quantity=1,
+            royalty_amount=royalty_amount,
+            royalty_currency="USD",
+            period_start=day,
+            period_end=day,
+        )
+
+    def get_matrix(self, **params):
+        params.setdefault("period_start", "2024-01-01")
+        params.setdefault("period_end", "2024-03-31")
+        return self.client.get(self.url, params)
+
+    def test_matrix_is_sparse_and_sorted_by_revenue(self):
+        response = self.get_matrix()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data["granularity"], "monthly")
+        self.assertEqual(data["periods"], ["2024-01", "2024-02", "2024-03"])
+        self.assertEqual(data["product_count"], 2)
+        self.assertEqual(
+            [product["title"] for product in data["products"]], ["Alpha", "Beta"]
+        )
+        self.assertEqual(data["products"][0]["totals"]["royalty_revenue"], 40.0)
+        self.assertEqual(data["products"][1]["totals"]["revenue"], 7.0)
+
+        # [product index, period index, impressions, sales, rentals,
+        #  royalty_revenue, impression_revenue]
+        self.assertEqual(
+            data["cells"],
+            [
+                [0, 0, 0, 1, 0, 30.0, 0.0],
+                [0, 2, 0, 1, 0, 10.0, 0.0],
+                [1, 2, 1000, 1, 0, 5.0, 2.0],
+            ],
+        )
+
+    def test_matrix_sort_order_and_limit(self):
+        response = self.get_matrix(sort="impressions", limit=1)
+
+        self.assertEqual(response.data["product_count"], 2)
+        self.assertEqual(
+            [product["title"] for product in response.data["products"]], ["Beta"]
+        )
+        self.assertEqual({cell[0] for cell in response.data["cells"]}, {0})
+
+        response = self.get_matrix(sort="title", order="asc")
+        self.assertEqual(
+            [product["title"] for product in response.data["products"]],
+            ["Alpha", "Beta"],
+        )
+
+    def test_matrix_respects_producer_visibility(self):
+        self.project_user.role = ProjectUser.PROJECT_USER_ROLE_PRODUCER
+        self.project_user.save()
+        ProducerProductAccess.objects.create(
+            project_user=self.project_user, product=self.products[1]
+        )
+
+        response = self.get_matrix()
+
+        self.assertEqual(
+            [product["title"] for product in response.data["products"]], ["Beta"]
+        )
+        self.assertEqual(len(response.data["cells"]), 1)
+
+    def test_matrix_daily_granularity(self):
+        response = self.get_matrix(period_start="2024-03-01", period_end="2024-03-31")
+
+        self.assertEqual(response.data["granularity"], "daily")
+        self.assertEqual(len(response.data["periods"]), 31)
+        self.assertEqual(
+            {(cell[0], cell[1]) for cell in response.data["cells"]},
+            {(0, 4), (1, 19)},
+        )
+
+    def test_matrix_runs_a_fixed_number_of_queries(self):
+        """Membership, data version, ranking, cells and product count"""
+        with self.assertNumQueries(5):
+            self.get_matrix()
+
+    def test_matrix_rejects_half_open_ranges(self):
+        response = self.client.get(self.url, {"period_start": "2024-01-01"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AnalyticsExportTests(TestCase):
+    """Tests for the streaming NDJSON/CSV analytics export"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="export@test.com", name="Export User", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.project_user = ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("analytics-export")
+
+        self.products = []
+        for title in ("Alpha", "Beta"):
+            product = Product.objects.create(project=self.project, title=title)
+            self.products.append(product)
+            for day in (date(2024, 1, 10), date(2024, 1, 11), date(2024, 2, 1)):
+                ProductImpressions.objects.create(
+                    product=product,
+                    impressions=100,
+                    ecpm=Decimal("2.00"),
+                    period_start=day,
+                    period_end=day,
+                )
+        refresh_daily_rollups([product.id for product in self.products])
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson_export_streams_daily_rows_per_product(self):
+        response, content = self.export()
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(
+            rows[0],
+            {
+                "product_id": self.products[0].id,
+                "product_title": "Alpha",
+                "period": "2024-01-10",
+                "impressions": 100,
+                "sales": 0,
+                "rentals": 0,
+                "royalty_revenue": 0.0,
+                "impression_revenue": 0.2,
+            },
+        )
+
+    def test_csv_export_with_filters_and_granularity(self):
+        response, content = self.export(
+            export_format="csv",
+            granularity="monthly",
+            period_start="2024-01-01",
+            period_end="2024-01-31",
+        )
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = content.splitlines()
+        self.assertEqual(
+            lines[0],
+            "product_id,product_title,period,impressions,sales,rentals,"
+            "royalty_revenue,impression_revenue",
+        )
+        self.assertEqual(
+            lines[1:],
+            [
+                f"{self.products[0].id},Alpha,2024-01,200,0,0,0.0,0.4",
+                f"{self.products[1].id},Beta,2024-01,200,0,0,0.0,0.4",
+            ],
+        )
+
+    def test_export_respects_producer_visibility(self):
+        self.project_user.role = ProjectUser.PROJECT_USER_ROLE_PRODUCER
+        self.project_user.save()
+        ProducerProductAccess.objects.create(
+            project_user=self.project_user, product=self.products[1]
+        )
+
+        _, content = self.export()
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual({row["product_title"] for row in rows}, {"Beta"})
+
+        _, content = self.export(product_id=self.products[0].id)
+        self.assertEqual(content, "")
+
+    def test_non_member_is_forbidden(self):
+        self.project_user.delete()
+
+        for export_format in ("ndjson", "csv"):
+            response = self.client.get(self.url, {"export_format": export_format})
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class ConditionalAnalyticsTests(TestCase):
+    """Tests for ETag/Last-Modified revalidation and `since` deltas"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="conditional@test.com", name="Owner", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("project-analytics")
+        self.params = {"period_start": "2024-01-01", "period_end": "2024-01-31"}
+
+        self.product = Product.objects.create(project=self.project, title="Alpha")
+        for day in (date(2024, 1, 10), date(2024, 1, 20)):
+            self.add_impressions(day)
+        refresh_daily_rollups([self.product.id])
+
+    def add_impressions(self, day):
+        ProductImpressions.objects.create(
+            product=self.product,
+            impressions=100,
+            ecpm=Decimal("2.00"),
+            period_start=day,
+            period_end=day,
+        )
+
+    def test_unchanged_data_is_not_modified(self):
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+
+        revalidated = self.client.get(
+            self.url, self.params, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(revalidated["ETag"], response["ETag"])
+
+        revalidated = self.client.get(
+            self.url, self.params, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_with_data_and_parameters(self):
+        etag = self.client.get(self.url, self.params)["ETag"]
+
+        other = self.client.get(self.url, {**self.params, "period_end": "2024-01-30"})
+        self.assertNotEqual(other["ETag"], etag)
+
+        self.add_impressions(date(2024, 1, 21))
+        refresh_daily_rollups([self.product.id], date(2024, 1, 21), date(2024, 1, 21))
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_since_returns_only_changed_buckets(self):
+        watermark = self.client.get(self.url, self.params).data["data_watermark"]
+        full = self.client.get(self.url, {**self.params, "since": watermark}).data
+        self.assertTrue(full["delta"])
+        self.assertEqual(full["time_stats"], [])
+
+        self.add_impressions(date(2024, 1, 21))
+        refresh_daily_rollups([self.product.id], date(2024, 1, 21), date(2024, 1, 21))
+        delta = self.client.get(self.url, {**self.params, "since": watermark}).data
+
+        self.assertTrue(delta["delta"])
+        self.assertEqual(len(delta["time_stats"]), 1)
+        self.assertEqual(delta["time_stats"][0]["impressions"], 100)
+        self.assertGreater(delta["data_watermark"], full["data_watermark"])
+
+    def test_unbounded_changes_return_every_bucket(self):
+        watermark = self.client.get(self.url, self.params).data["data_watermark"]
+        other = Product.objects.create(project=self.project, title="Beta")
+        self.client.delete(reverse("product_detail", args=[other.id]))
+
+        delta = self.client.get(self.url, {**self.params, "since": watermark}).data
+
+        self.assertTrue(delta["delta"])
+        self.assertEqual(len(delta["time_stats"]), 31)
+
+    def test_since_older_than_retention_is_a_full_response(self):
+        since = timezone.now() - timedelta(days=365)
+        data = self.client.get(
+            self.url, {**self.params, "since": since.isoformat()}
+        ).data
+
+        self.assertFalse(data["delta"])
+        self.assertEqual(len(data["time_stats"]), 31)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)
+class ParallelSectionsTests(TransactionTestCase):
+    """
+    Tests for running the analytics sections concurrently. Worker threads query
+    over their own connections, so the data has to be committed, and is removed
+    again explicitly.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="parallel@test.com", name="Owner", password="Testaccount1_"
+        )
+        self.addCleanup(self.user.delete)
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.addCleanup(self.project.delete)
+        ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+
+        source = Source.objects.create(
+            project=self.project,
+            account_name="Channel",
+            platform=Source.PLATFORM_YOUTUBE,
+        )
+        for title in ("Alpha", "Beta"):
+            product = Product.objects.create(
+                project=self.project, source=source, title=title
+            )
+            for day in (date(2024, 1, 10), date(2024, 3, 5)):
+                ProductImpressions.objects.create(
+                    product=product,
+                    impressions=100,
+                    ecpm=Decimal("2.00"),
+                    period_start=timezone.make_aware(datetime.combine(day, time())),
+                    period_end=timezone.make_aware(datetime.combine(day, time())),
+                )
+        refresh_daily_rollups(self.project.product_set.values_list("id", flat=True))
+
+    def analytics(self, timings=None):
+        return calculate_analytics(
+            self.project.id,
+            {},
+            date(2024, 1, 1),
+            date(2024, 12, 31),
+            None,
+            "monthly",
+            self.user,
+            timings=timings,
+        )
+
+    def test_parallel_sections_match_sequential_results(self):
+        sequential = self.analytics()
+        timings = {}
+        with override_settings(ANALYTICS_PARALLEL_SECTIONS=True):
+            parallel = self.analytics(timings)
+
+        self.assertEqual(parallel, sequential)
+        self.assertEqual(parallel["total_impressions"], 400)
+        self.assertEqual(
+            set(timings),
+            {
+                "time_stats",
+                "totals",
+                "currency",
+                "source_analytics",
+                "product_count",
+                "user_earnings",
+            },
+        )
+
+    @override_settings(ANALYTICS_PARALLEL_SECTIONS=True)
+    def test_sections_run_on_worker_threads(self):
+        sections = {
+            name: lambda: threading.current_thread().name for name in ("a", "b")
+        }
+
+        results = run_sections(sections)
+
+        for thread_name in results.values():
+            self.assertTrue(thread_name.startswith("analytics-section"))
+
+    @override_settings(ANALYTICS_PARALLEL_SECTIONS=True)
+    def test_worker_queries_are_tracked(self):
+        with track_queries() as stats:
+            run_sections(
+                {name: lambda: Project.objects.count() for name in ("a", "b")}
+            )
+
+        self.assertEqual(
+            stats.duplicates(), {'SELECT COUNT(*) AS "__count" FROM "project"': 2}
+        )
+
+    @override_settings(ANALYTICS_PARALLEL_SECTIONS=True)
+    def test_section_errors_propagate(self):
+        def failing():
+            raise ValueError("Section failed")
+
+        with self.assertRaisesMessage(ValueError, "Section failed"):
+            run_sections({"ok": lambda: 1, "failing": failing})
+
+    @override_settings(
+        ANALYTICS_PARALLEL_SECTIONS=True,
+        ANALYTICS_SECTION_WORKERS=1,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+    )
+    def test_dashboard_completes_with_a_single_worker(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        responses = []
+
+        def get_dashboard():
+            try:
+                responses.append(client.get(reverse("analytics-dashboard")))
+            finally:
+                connection.close()
+
+        # A pool of the overridden size instead of the shared one
+        with mock.patch("apps.analytics.sections._executor", None):
+            request = threading.Thread(target=get_dashboard, daemon=True)
+            request.start()
+            request.join(timeout=30)
+            get_section_executor().shutdown(wait=False)
+
+        self.assertFalse(request.is_alive(), "The dashboard request never finished")
+        self.assertEqual(responses[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(responses[0].data["analytics"]["total_impressions"], 400)
+
+    @override_settings(
+        DEBUG=True,
+        QUERY_STATS_ENABLED=True,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+    )
+    def test_query_headers_count_parallel_sections(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        # Resolves the visibility, which is kept on the user object
+        client.get(reverse("project-analytics"))
+
+        sequential = client.get(reverse("project-analytics"))
+        with override_settings(ANALYTICS_PARALLEL_SECTIONS=True):
+            parallel = client.get(reverse("project-analytics"))
+
+        self.assertEqual(parallel["X-Query-Count"], sequential["X-Query-Count"])
+
+    @override_settings(DEBUG=True)
+    def test_server_timing_header_in_debug(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get(reverse("project-analytics"))
+
+        self.assertIn("time_stats;dur=", response["Server-Timing"])
+        self.assertIn("user_earnings;dur=", response["Server-Timing"])
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)
+class DashboardTests(TestCase):
+    """Tests for the combined dashboard endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="dashboard@test.com", name="Owner", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.project_user = ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("analytics-dashboard")
+
+        self.source = Source.objects.create(
+            project=self.project,
+            platform=Source.PLATFORM_YOUTUBE,
+            account_name="Channel",
+        )
+        self.alpha = Product.objects.create(
+            project=self.project, title="Alpha", source=self.source
+        )
+        self.beta = Product.objects.create(project=self.project, title="Beta")
+        day = timezone.make_aware(datetime(2024, 1, 10))
+        ProductImpressions.objects.create(
+            product=self.alpha,
+            impressions=100,
+            ecpm=Decimal("2.00"),
+            period_start=day,
+            period_end=day,
+        )
+        ProductSale.objects.create(
+            product=self.beta,
+            type=ProductSale.TYPE_PURCHASE,
+            unit_price=Decimal("10.00"),
+            unit_price_currency="USD",
+            quantity=1,
+            royalty_amount=Decimal("4.00"),
+            royalty_currency="USD",
+            period_start=day,
+            period_end=day,
+        )
+        refresh_daily_rollups([self.alpha.id, self.beta.id])
+
+    def test_all_sections_by_default(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        analytics = response.data["analytics"]
+        self.assertEqual(analytics["total_impressions"], 100)
+        self.assertIn("source_analytics", analytics)
+        self.assertIn("user_earnings", analytics)
+        self.assertEqual(
+            [p["title"] for p in response.data["top_by_impressions"]], ["Alpha"]
+        )
+        self.assertEqual([p["title"] for p in response.data["top_by_sales"]], ["Beta"])
+        self.assertEqual(response.data["sources"][0]["imported_video_count"], 1)
+        self.assertEqual(
+            sorted(p["title"] for p in response.data["products"]), ["Alpha", "Beta"]
+        )
+
+    def test_selected_sections_only(self):
+        response = self.client.get(self.url, {"sections": "analytics,sources"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {"analytics", "sources"})
+        self.assertNotIn("source_analytics", response.data["analytics"])
+        self.assertNotIn("user_earnings", response.data["analytics"])
+        self.assertEqual(response.data["analytics"]["total_impressions"], 100)
+
+    def test_unknown_section_is_rejected(self):
+        response = self.client.get(self.url, {"sections": "analytics,everything"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_producer_sees_only_accessible_products(self):
+        self.project_user.role = ProjectUser.PROJECT_USER_ROLE_PRODUCER
+        self.project_user.save()
+        ProducerProductAccess.objects.create(
+            project_user=self.project_user, product=self.alpha
+        )
+
+        response = self.client.get(
+            self.url, {"sections": "analytics,products,top_by_sales"}
+        )
+
+        self.assertEqual([p["title"] for p in response.data["products"]], ["Alpha"])
+        self.assertEqual(response.data["top_by_sales"], [])
+        self.assertEqual(response.data["analytics"]["total_sales_count"], 0)
+
+    def test_non_member_is_forbidden(self):
+        self.project_user.delete()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_membership_is_resolved_once(self):
+        # A fresh user object, as the visibility is kept on it
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.client.force_authenticate(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+
+        membership_queries = [
+            q["sql"] for q in queries if 'FROM "project_user"' in q["sql"]
+        ]
+        self.assertEqual(len(membership_queries), 1)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)
+class ComparisonTests(TestCase):
+    """Tests for previous-period and year-over-year comparisons"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="comparison@test.com", name="Owner", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("project-analytics")
+
+        self.product = Product.objects.create(project=self.project, title="Alpha")
+        for day, impressions in (
+            (date(2024, 1, 5), 300),
+            (date(2023, 12, 5), 200),
+            (date(2023, 1, 5), 100),
+        ):
+            ProductImpressions.objects.create(
+                product=self.product,
+                impressions=impressions,
+                ecpm=Decimal("2.00"),
+                period_start=timezone.make_aware(datetime.combine(day, time(12))),
+                period_end=timezone.make_aware(datetime.combine(day, time(12))),
+            )
+        refresh_daily_rollups([self.product.id])
+
+    def get(self, **params):
+        return self.client.get(
+            self.url,
+            {"period_start": "2024-01-01", "period_end": "2024-01-31", **params},
+        )
+
+    def test_previous_and_year_ago_periods(self):
+        response = self.get(compare="previous,year")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        previous = response.data["comparison"]["previous"]
+        year = response.data["comparison"]["year"]
+        self.assertEqual(previous["period_start"], date(2023, 12, 1))
+        self.assertEqual(previous["totals"]["impressions"], 200)
+        self.assertEqual(previous["deltas"]["impressions"]["change"], 100)
+        self.assertEqual(previous["deltas"]["impressions"]["percent"], 50.0)
+        self.assertEqual(year["period_end"], date(2023, 1, 31))
+        self.assertEqual(year["deltas"]["impressions"]["percent"], 200.0)
+
+        # Comparison buckets line up with the current ones
+        self.assertEqual(len(previous["time_stats"]), 31)
+        self.assertEqual(previous["time_stats"][4]["period"], "2023-12-05")
+        self.assertEqual(previous["time_stats"][4]["impressions"], 200)
+        self.assertEqual(response.data["time_stats"][4]["impressions"], 300)
+
+    def test_comparison_keeps_the_time_stats_buckets(self):
+        # A single month is charted together with the month after it
+        for period_end, buckets in ((date(2024, 1, 31), 2), (date(2024, 3, 31), 3)):
+            filters = {
+                "period_start__gte": timezone.make_aware(datetime(2024, 1, 1)),
+                "period_end__lte": timezone.make_aware(
+                    datetime.combine(period_end, time.max)
+                ),
+            }
+            args = (self.project.id, filters, date(2024, 1, 1), period_end)
+
+            plain = calculate_analytics(*args, None, "monthly", self.user)
+            compared = calculate_analytics(
+                *args, None, "monthly", self.user, compare=["previous"]
+            )
+
+            self.assertEqual(len(plain["time_stats"]), buckets)
+            self.assertEqual(compared["time_stats"], plain["time_stats"])
+            self.assertEqual(
+                len(compared["comparison"]["previous"]["time_stats"]), buckets
+            )
+
+    def test_comparison_adds_no_query(self):
+        # Resolves the visibility, which is kept on the user object
+        self.get()
+
+        with CaptureQueriesContext(connection) as plain:
+            self.get()
+        with CaptureQueriesContext(connection) as compared:
+            self.get(compare="previous,year")
+
+        self.assertEqual(len(compared), len(plain))
+
+    def test_overlapping_periods_count_in_both(self):
+        # Over a year, the previous period contains the year-ago one
+        response = self.client.get(
+            self.url,
+            {
+                "period_start": "2023-06-01",
+                "period_end": "2024-12-31",
+                "compare": "previous,year",
+            },
+        )
+
+        comparison = response.data["comparison"]
+        self.assertEqual(response.data["granularity"], "monthly")
+        self.assertEqual(comparison["previous"]["period_start"], date(2021, 11, 1))
+        self.assertEqual(comparison["previous"]["totals"]["impressions"], 100)
+        self.assertEqual(comparison["year"]["totals"]["impressions"], 300)
+        self.assertEqual(response.data["total_impressions"], 500)
+
+    def test_hourly_ranges_are_compared_by_day(self):
+        response = self.client.get(
+            self.url,
+            {
+                "period_start": "2024-01-05",
+                "period_end": "2024-01-05",
+                "compare": "previous",
+            },
+        )
+
+        self.assertEqual(response.data["granularity"], "hourly")
+        previous = response.data["comparison"]["previous"]
+        self.assertEqual(previous["period_start"], date(2024, 1, 4))
+        self.assertIsNone(previous["deltas"]["impressions"]["percent"])
+        self.assertEqual(previous["deltas"]["impressions"]["change"], 300)
+
+    def test_comparison_needs_a_period(self):
+        response = self.client.get(self.url, {"compare": "previous"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_shift_months_clamps_to_month_end(self):
+        self.assertEqual(shift_months(date(2024, 3, 31), -1), date(2024, 2, 29))
+        self.assertEqual(shift_months(date(2024, 2, 29), -12), date(2023, 2, 28))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class TopContentTests(TestCase):
+    """Tests for the top content rankings over the daily rollups"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="ranking@test.com", name="Owner", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.project_user = ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("top-content")
+
+        self.alpha = Product.objects.create(project=self.project, title="Alpha")
+        self.beta = Product.objects.create(project=self.project, title="Beta")
+        self.add_impressions(self.alpha, date(2024, 1, 10), 100)
+        self.add_impressions(self.beta, date(2024, 1, 20), 300)
+        self.add_impressions(self.beta, date(2023, 12, 20), 1000)
+        self.add_sale(self.alpha, date(2024, 1, 15), Decimal("40.00"))
+        refresh_daily_rollups([self.alpha.id, self.beta.id])
+
+    def add_impressions(self, product, day, impressions):
+        moment = timezone.make_aware(datetime.combine(day, time(12)))
+        ProductImpressions.objects.create(
+            product=product,
+            impressions=impressions,
+            ecpm=Decimal("10.00"),
+            period_start=moment,
+            period_end=moment,
+        )
+
+    def add_sale(self, product, day, royalty_amount):
+        moment = timezone.make_aware(datetime.combine(day, time(12)))
+        ProductSale.objects.create(
+            product=product,
+            type=ProductSale.TYPE_PURCHASE,
+            unit_price=royalty_amount,
+            unit_price_currency="USD",
+            quantity=1,
+            royalty_amount=royalty_amount,
+            royalty_currency="USD",
+            period_start=moment,
+            period_end=moment,
+        )
+
+    def rank(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_ranking_is_limited_to_the_period(self):
+        january = {"period_start": "2024-01-01", "period_end": "2024-01-31"}
+
+        results = self.rank(**january)
+
+        self.assertEqual([row["title"] for row in results], ["Beta", "Alpha"])
+        self.assertEqual(results[0]["impressions"], 300)
+        self.assertEqual(results[0]["impression_revenue"], 3.0)
+        self.assertEqual(results[0]["rank"], 1)
+        self.assertNotIn("sales", results[0])
+
+        # All time, Beta's December impressions count as well
+        self.assertEqual(self.rank()[0]["impressions"], 1300)
+
+    def test_ranking_by_royalty_revenue(self):
+        results = self.rank(metric="royalty_revenue", limit=5)
+
+        self.assertEqual([row["title"] for row in results], ["Alpha"])
+        self.assertEqual(results[0]["royalty_revenue"], 40.0)
+
+    def test_ranking_by_growth(self):
+        results = self.rank(
+            metric="growth", period_start="2024-01-01", period_end="2024-01-31"
+        )
+
+        # Beta earned 10.00 in December and 3.00 in January
+        self.assertEqual([row["title"] for row in results], ["Alpha"])
+        self.assertEqual(results[0]["growth"], 41.0)
+        self.assertEqual(results[0]["previous_revenue"], 0.0)
+
+    def test_growth_needs_a_period(self):
+        response = self.client.get(self.url, {"metric": "growth"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_producer_ranking_is_limited_to_accessible_products(self):
+        self.project_user.role = ProjectUser.PROJECT_USER_ROLE_PRODUCER
+        self.project_user.save()
+        ProducerProductAccess.objects.create(
+            project_user=self.project_user, product=self.alpha
+        )
+
+        self.assertEqual([row["title"] for row in self.rank()], ["Alpha"])
+
+    def test_ingest_invalidates_cached_ranking(self):
+        self.assertEqual(self.rank()[0]["title"], "Beta")
+
+        self.add_impressions(self.alpha, date(2024, 1, 11), 5000)
+        refresh_daily_rollups([self.alpha.id])
+
+        self.assertEqual(self.rank()[0]["title"], "Alpha")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)
+class ForecastTests(TestCase):
+    """Tests for the nightly revenue forecasts"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="forecast@test.com", name="Owner", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.project_user = ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("revenue-forecast")
+
+        self.steady = Product.objects.create(project=self.project, title="Steady")
+        self.growing = Product.objects.create(project=self.project, title="Growing")
+        for month in range(1, 7):
+            self.add_sale(self.steady, date(2024, month, 10), Decimal("100.00"))
+            self.add_sale(self.growing, date(2024, month, 10), Decimal(month * 10))
+        refresh_daily_rollups([self.steady.id, self.growing.id])
+        self.today = date(2024, 7, 15)
+
+    def add_sale(self, product, day, royalty_amount):
+        moment = timezone.make_aware(datetime.combine(day, time(12)))
+        ProductSale.objects.create(
+            product=product,
+            type=ProductSale.TYPE_PURCHASE,
+            unit_price=royalty_amount,
+            unit_price_currency="USD",
+            quantity=1,
+            royalty_amount=royalty_amount,
+            royalty_currency="USD",
+            period_start=moment,
+            period_end=moment,
+        )
+
+    def refresh(self):
+        return refresh_revenue_forecasts([self.project.id], self.today)
+
+    def test_holt_forecast_follows_level_and_trend(self):
+        series = np.array(
+            [
+                [0, 0, 0, 5, 5, 5, 5, 5],
+                [10, 20, 30, 40, 50, 60, 70, 80],
+                [0] * 8,
+            ],
+            dtype=float,
+        )
+
+        forecast = holt_forecast(series, 3)
+
+        # Months before the launch do not pull the steady product down
+        np.testing.assert_allclose(forecast[0], [5, 5, 5])
+        self.assertTrue(np.all(np.diff(forecast[1]) > 0))
+        self.assertGreater(forecast[1][0], 80)
+        np.testing.assert_allclose(forecast[2], [0, 0, 0])
+        # Products are fitted independently of the batch they are in
+        np.testing.assert_allclose(holt_forecast(series[1:2], 3)[0], forecast[1])
+
+    def test_forecast_of_the_project(self):
+        self.assertEqual(self.refresh(), 1)
+
+        response = self.client.get(self.url, {"months": 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["months"], ["2024-07", "2024-08", "2024-09"])
+        self.assertFalse(response.data["stale"])
+        products = {row["title"]: row for row in response.data["products"]}
+        self.assertEqual(products["Steady"]["royalty_revenue"], [100.0] * 3)
+        self.assertGreater(products["Growing"]["royalty_revenue"][0], 60)
+        self.assertEqual(products["Growing"]["impression_revenue"], [0.0] * 3)
+        self.assertEqual(
+            response.data["total"]["royalty_revenue"][0],
+            round(100 + products["Growing"]["royalty_revenue"][0], 2),
+        )
+
+    def test_forecasts_are_refitted_per_data_version(self):
+        self.refresh()
+        self.assertEqual(self.refresh(), 0)
+
+        self.add_sale(self.steady, date(2024, 7, 1), Decimal("5.00"))
+        refresh_daily_rollups([self.steady.id])
+        self.assertTrue(self.client.get(self.url).data["stale"])
+
+        self.assertEqual(self.refresh(), 1)
+        self.assertFalse(self.client.get(self.url).data["stale"])
+
+    def test_producer_forecast_covers_accessible_products(self):
+        self.refresh()
+        self.project_user.role = ProjectUser.PROJECT_USER_ROLE_PRODUCER
+        self.project_user.save()
+        ProducerProductAccess.objects.create(
+            project_user=self.project_user, product=self.steady
+        )
+
+        response = self.client.get(self.url, {"months": 2})
+
+        self.assertEqual(
+            [row["title"] for row in response.data["products"]], ["Steady"]
+        )
+        self.assertEqual(response.data["total"]["royalty_revenue"], [100.0, 100.0])
+
+    def test_no_forecast_yet(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
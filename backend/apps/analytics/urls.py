@@ -1,8 +1,20 @@
 from django.urls import path
 
-from apps.analytics.views import AnalyticsView
+from apps.analytics.views import (
+    AnalyticsExportView,
+    AnalyticsView,
+    DashboardView,
+    ForecastView,
+    ProductMatrixView,
+    TopContentView,
+)
 
 urlpatterns = [
     path("", AnalyticsView.as_view(), name="project-analytics"),
+    path("dashboard/", DashboardView.as_view(), name="analytics-dashboard"),
+    path("matrix/", ProductMatrixView.as_view(), name="product-matrix"),
+    path("top/", TopContentView.as_view(), name="top-content"),
+    path("forecast/", ForecastView.as_view(), name="revenue-forecast"),
+    path("export/", AnalyticsExportView.as_view(), name="analytics-export"),
     path("<int:product_id>/", AnalyticsView.as_view(), name="product-analytics"),
 ]
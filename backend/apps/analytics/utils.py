@@ -1,444 +1,215 @@
-from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional, Union
-
-from django.db.models import Count, DecimalField, ExpressionWrapper, F, QuerySet, Sum
-from django.db.models.functions import TruncDate, TruncHour, TruncMonth, TruncYear
-
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from django.db.models import (
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Min,
+    Q,
+    QuerySet,
+    Sum,
+)
+from django.db.models.functions import (
+    Coalesce,
+    Round,
+    TruncDate,
+    TruncHour,
+    TruncMonth,
+    TruncYear,
+)
+from django.utils import timezone
+
+from apps.analytics.cache import (
+    build_analytics_cache_key,
+    get_cached_analytics,
+    get_changed_periods,
+    set_cached_analytics,
+)
+from apps.analytics.comparison import (
+    aggregate_period_buckets,
+    calculate_delta,
+    comparison_shift,
+)
+from apps.analytics.sections import run_sections
+from apps.analytics.series import (
+    SERIES_METRICS,
+    bucket_keys_between,
+    bucket_label_days,
+    bucket_labels,
+    bucket_offset,
+    daily_bucket_keys,
+    fill_series_columns,
+    hourly_bucket_keys,
+    monthly_bucket_keys,
+    series_bucket_keys,
+    yearly_bucket_keys,
+)
 from apps.expenses.models import Expense
-from apps.product.models import Product, ProductImpressions, ProductSale
-from apps.project.models import ProducerProductAccess, ProjectUser
+from apps.product.currency import conversion_rate
+from apps.product.models import (
+    Product,
+    ProductDailyRollup,
+    ProductImpressions,
+    ProductSale,
+)
+from apps.project.models import Project, ProjectUser
+from apps.project.visibility import resolve_product_visibility
 from apps.sources.models import Source
 
+# Truncation function and label key for every supported bucket size
+TIME_BUCKETS = {
+    "hourly": (TruncHour, "period"),
+    "daily": (TruncDate, "period"),
+    "monthly": (TruncMonth, "month"),
+    "yearly": (TruncYear, "year"),
+}
 
-def calculate_yearly_stats(
-    impressions_qs: QuerySet,
-    sales_qs: QuerySet,
-    years: int,
-    period_end: Optional[date],
-) -> List[Dict[str, Any]]:
-    now = datetime.now()
-
-    # Yearly impressions
-    yearly_impressions = (
-        impressions_qs.annotate(year=TruncYear("period_start"))
-        .values("year")
-        .annotate(impressions=Sum("impressions"))
-        .order_by("year")
-    )
-
-    # Yearly impression revenue
-    impression_revenue_qs = (
-        impressions_qs.annotate(year=TruncYear("period_start"))
-        .annotate(
-            revenue_expr=ExpressionWrapper(
-                F("impressions") * F("ecpm") / 1000,
-                output_field=DecimalField(max_digits=30, decimal_places=18),
-            )
-        )
-        .values("year")
-        .annotate(impression_revenue=Sum("revenue_expr"))
-        .order_by("year")
-    )
-
-    # Yearly royalty revenue
-    yearly_revenue = (
-        sales_qs.annotate(year=TruncYear("period_start"))
-        .values("year")
-        .annotate(royalty_revenue=Sum("royalty_amount"))
-        .order_by("year")
-    )
-
-    # Yearly sales count
-    yearly_sales = (
-        sales_qs.annotate(year=TruncYear("period_start"))
-        .values("year")
-        .annotate(count=Count("id"))
-        .order_by("year")
-    )
-
-    # Yearly rentals
-    yearly_rentals_qs = sales_qs.filter(type=ProductSale.TYPE_RENTAL)
-    yearly_rentals = (
-        yearly_rentals_qs.annotate(year=TruncYear("period_start"))
-        .values("year")
-        .annotate(count=Count("id"))
-        .order_by("year")
-    )
-
-    # Map results by year
-    impressions_map = {
-        entry["year"]: entry["impressions"] or 0 for entry in yearly_impressions
-    }
-    impression_revenue_map = {
-        entry["year"]: round(entry["impression_revenue"] or 0, 6)
-        for entry in impression_revenue_qs
-    }
-    royalty_revenue_map = {
-        entry["year"]: entry["royalty_revenue"] or 0 for entry in yearly_revenue
-    }
-    sales_map = {entry["year"]: entry["count"] for entry in yearly_sales}
-    rentals_map = {entry["year"]: entry["count"] for entry in yearly_rentals}
-
-    yearly_stats = []
-
-    for i in range(years):
-        if period_end:
-            year_date = (
-                (period_end.replace(month=1, day=1) - timedelta(days=i * 365))
-                .replace(month=1, day=1)
-                .date()
-            )
-        else:
-            year_date = (
-                (now.replace(month=1, day=1) - timedelta(days=i * 365))
-                .replace(month=1, day=1)
-                .date()
-            )
-
-        yearly_stats.append(
-            {
-                "year": year_date.strftime("%Y"),
-                "impressions": impressions_map.get(year_date, 0),
-                "sales": sales_map.get(year_date, 0),
-                "rentals": rentals_map.get(year_date, 0),
-                "royalty_revenue": royalty_revenue_map.get(year_date, 0),
-                "impression_revenue": impression_revenue_map.get(year_date, 0),
-            }
-        )
-
-    yearly_stats.reverse()
-    return yearly_stats
 
+def aggregate_time_buckets(rollups_qs: QuerySet, granularity: str) -> List[Tuple]:
+    """
+    Aggregate every time_stats metric per bucket from the daily rollups,
+    issuing a single GROUP BY query.
 
-def calculate_monthly_stats(
-    impressions_qs: QuerySet,
-    sales_qs: QuerySet,
-    months: int,
-    period_end: Optional[date],
-) -> List[Dict[str, Any]]:
-    now = datetime.now()
-
-    # Monthly impressions
-    monthly_impressions = (
-        impressions_qs.annotate(month=TruncMonth("period_start"))
-        .values("month")
-        .annotate(impressions=Sum("impressions"))
-        .order_by("month")
-    )
+    Returns (bucket, *metrics) rows with the metrics in SERIES_METRICS order.
+    """
+    trunc = TIME_BUCKETS[granularity][0]
 
-    # Monthly impression revenue
-    impression_revenue_qs = (
-        impressions_qs.annotate(month=TruncMonth("period_start"))
+    return list(
+        rollups_qs.annotate(bucket=trunc("period_start"))
+        .values("bucket")
         .annotate(
-            revenue_expr=ExpressionWrapper(
-                F("impressions") * F("ecpm") / 1000,
-                output_field=DecimalField(max_digits=30, decimal_places=18),
-            )
+            impressions_sum=Sum("impressions"),
+            sales=Sum("sales_count"),
+            rentals=Sum("rentals_count"),
+            royalty_revenue_sum=Sum("royalty_revenue"),
+            impression_revenue_sum=Round(Sum("impression_revenue"), 6),
         )
-        .values("month")
-        .annotate(impression_revenue=Sum("revenue_expr"))
-        .order_by("month")
-    )
-
-    # Monthly royalty revenue
-    monthly_revenue = (
-        sales_qs.annotate(month=TruncMonth("period_start"))
-        .values("month")
-        .annotate(royalty_revenue=Sum("royalty_amount"))
-        .order_by("month")
-    )
-
-    # Monthly sales count
-    monthly_sales = (
-        sales_qs.annotate(month=TruncMonth("period_start"))
-        .values("month")
-        .annotate(count=Count("id"))
-        .order_by("month")
+        .values_list(
+            "bucket",
+            "impressions_sum",
+            "sales",
+            "rentals",
+            "royalty_revenue_sum",
+            "impression_revenue_sum",
+        )
+        .order_by()
     )
 
-    # Monthly rentals
-    monthly_rentals_qs = sales_qs.filter(type=ProductSale.TYPE_RENTAL)
-    monthly_rentals = (
-        monthly_rentals_qs.annotate(month=TruncMonth("period_start"))
-        .values("month")
-        .annotate(count=Count("id"))
-        .order_by("month")
-    )
 
-    # Map results by month
-    impressions_map = {
-        entry["month"]: entry["impressions"] or 0 for entry in monthly_impressions
-    }
-    impression_revenue_map = {
-        entry["month"]: round(entry["impression_revenue"] or 0, 6)
-        for entry in impression_revenue_qs
-    }
-    royalty_revenue_map = {
-        entry["month"]: entry["royalty_revenue"] or 0 for entry in monthly_revenue
-    }
-    sales_map = {entry["month"]: entry["count"] for entry in monthly_sales}
-    rentals_map = {entry["month"]: entry["count"] for entry in monthly_rentals}
-
-    monthly_stats = []
-    single_month_adjustment = False
-    if months == 1:
-        months += 1
-        single_month_adjustment = True
-
-    for i in range(months):
-        if period_end:
-            month_date = (
-                (period_end.replace(day=1) - timedelta(days=i * 30))
-                .replace(day=1)
-                .date()
-            )
-        else:
-            month_date = (now.replace(day=1) - timedelta(days=i * 30)).replace(day=1)
-            month_date = month_date.date().replace(day=1)
-
-        if single_month_adjustment:
-            month_date = (month_date + timedelta(days=31)).replace(day=1)
-
-        monthly_stats.append(
-            {
-                "month": month_date.strftime("%Y-%m"),
-                "impressions": impressions_map.get(month_date, 0),
-                "sales": sales_map.get(month_date, 0),
-                "rentals": rentals_map.get(month_date, 0),
-                "royalty_revenue": royalty_revenue_map.get(month_date, 0),
-                "impression_revenue": impression_revenue_map.get(month_date, 0),
-            }
-        )
+def calculate_time_stats(
+    rollups_qs: QuerySet,
+    granularity: str,
+    bucket_keys: List[Any],
+) -> List[Dict[str, Any]]:
+    """
+    Build the time_stats series for the given bucket keys, zero-filling any
+    bucket that has no data.
 
-    monthly_stats.reverse()
-    return monthly_stats
+    The aggregated buckets are joined onto the series by bucket index into
+    per-metric columns, so multi-year daily series cost one list per metric
+    rather than a lookup and a fresh dict per empty bucket.
+    """
+    rows = aggregate_time_buckets(rollups_qs, granularity)
+    columns = fill_series_columns(granularity, bucket_keys, rows)
+    return build_time_stats(granularity, bucket_keys, columns)
 
 
-def calculate_daily_stats(
+def calculate_hourly_time_stats(
     impressions_qs: QuerySet,
     sales_qs: QuerySet,
-    period_start: date,
-    period_end: date,
+    bucket_keys: List[datetime],
 ) -> List[Dict[str, Any]]:
-    # Daily impressions
-    daily_impressions = (
-        impressions_qs.annotate(day=TruncDate("period_start"))
-        .values("day")
-        .annotate(impressions=Sum("impressions"))
-        .order_by("day")
-    )
-
-    # Daily impression revenue
-    impression_revenue_qs = (
-        impressions_qs.annotate(day=TruncDate("period_start"))
+    """
+    Build the hourly time_stats series from the raw fact tables, which carry
+    full timestamps unlike the daily rollups. Callers bound period_start on
+    both sides so only the month partitions of the range are scanned.
+    """
+    impression_rows = (
+        impressions_qs.annotate(bucket=TruncHour("period_start"))
+        .values("bucket")
         .annotate(
-            revenue_expr=ExpressionWrapper(
-                F("impressions") * F("ecpm") / 1000,
-                output_field=DecimalField(max_digits=30, decimal_places=18),
-            )
+            impressions_sum=Coalesce(Sum("impressions"), 0),
+            impression_revenue_sum=Round(
+                Coalesce(
+                    Sum(
+                        ExpressionWrapper(
+                            F("impressions") * F("ecpm") / 1000,
+                            output_field=DecimalField(
+                                max_digits=30, decimal_places=18
+                            ),
+                        )
+                    ),
+                    Decimal("0"),
+                ),
+                6,
+            ),
         )
-        .values("day")
-        .annotate(impression_revenue=Sum("revenue_expr"))
-        .order_by("day")
-    )
-
-    # Daily royalty revenue
-    daily_revenue = (
-        sales_qs.annotate(day=TruncDate("period_start"))
-        .values("day")
-        .annotate(royalty_revenue=Sum("royalty_amount"))
-        .order_by("day")
-    )
-
-    # Daily sales count
-    daily_sales = (
-        sales_qs.annotate(day=TruncDate("period_start"))
-        .values("day")
-        .annotate(count=Count("id"))
-        .order_by("day")
-    )
-
-    # Daily rentals
-    daily_rentals_qs = sales_qs.filter(type=ProductSale.TYPE_RENTAL)
-    daily_rentals = (
-        daily_rentals_qs.annotate(day=TruncDate("period_start"))
-        .values("day")
-        .annotate(count=Count("id"))
-        .order_by("day")
+        .values_list("bucket", "impressions_sum", "impression_revenue_sum")
+        .order_by()
     )
-
-    # Map results by day
-    impressions_map = {
-        entry["day"]: entry["impressions"] or 0 for entry in daily_impressions
-    }
-    impression_revenue_map = {
-        entry["day"]: round(entry["impression_revenue"] or 0, 6)
-        for entry in impression_revenue_qs
-    }
-    royalty_revenue_map = {
-        entry["day"]: entry["royalty_revenue"] or 0 for entry in daily_revenue
-    }
-    sales_map = {entry["day"]: entry["count"] for entry in daily_sales}
-    rentals_map = {entry["day"]: entry["count"] for entry in daily_rentals}
-
-    daily_stats = []
-    current_date = period_start
-
-    while current_date <= period_end:
-        daily_stats.append(
-            {
-                "period": current_date.strftime("%Y-%m-%d"),
-                "impressions": impressions_map.get(current_date, 0),
-                "sales": sales_map.get(current_date, 0),
-                "rentals": rentals_map.get(current_date, 0),
-                "royalty_revenue": royalty_revenue_map.get(current_date, 0),
-                "impression_revenue": impression_revenue_map.get(current_date, 0),
-            }
+    sales_rows = (
+        sales_qs.annotate(
+            bucket=TruncHour("period_start"),
+            day=TruncDate("period_start"),
+            reporting_currency=F("product__project__reporting_currency"),
         )
-        current_date += timedelta(days=1)
-
-    return daily_stats
-
-
-def calculate_hourly_stats(
-    impressions_qs: QuerySet,
-    sales_qs: QuerySet,
-    period_start: datetime,
-    period_end: datetime,
-) -> List[Dict[str, Any]]:
-    # Hourly impressions
-    hourly_impressions = (
-        impressions_qs.annotate(hour=TruncHour("period_start"))
-        .values("hour")
-        .annotate(impressions=Sum("impressions"))
-        .order_by("hour")
-    )
-
-    # Hourly impression revenue
-    impression_revenue_qs = (
-        impressions_qs.annotate(hour=TruncHour("period_start"))
+        .values("bucket")
         .annotate(
-            revenue_expr=ExpressionWrapper(
-                F("impressions") * F("ecpm") / 1000,
-                output_field=DecimalField(max_digits=30, decimal_places=18),
-            )
+            sales=Count("id"),
+            rentals=Count("id", filter=Q(type=ProductSale.TYPE_RENTAL)),
+            # Few enough rows to convert each one, unlike the daily rollups
+            royalty_revenue_sum=Round(
+                Sum(
+                    F("royalty_amount")
+                    * conversion_rate("royalty_currency", "reporting_currency", "day")
+                ),
+                2,
+            ),
         )
-        .values("hour")
-        .annotate(impression_revenue=Sum("revenue_expr"))
-        .order_by("hour")
+        .values_list("bucket", "sales", "rentals", "royalty_revenue_sum")
+        .order_by()
     )
 
-    # Hourly royalty revenue
-    hourly_revenue = (
-        sales_qs.annotate(hour=TruncHour("period_start"))
-        .values("hour")
-        .annotate(royalty_revenue=Sum("royalty_amount"))
-        .order_by("hour")
+    columns = fill_series_columns(
+        "hourly", bucket_keys, impression_rows, ("impressions", "impression_revenue")
     )
-
-    # Hourly sales count
-    hourly_sales = (
-        sales_qs.annotate(hour=TruncHour("period_start"))
-        .values("hour")
-        .annotate(count=Count("id"))
-        .order_by("hour")
-    )
-
-    # Hourly rentals
-    hourly_rentals_qs = sales_qs.filter(type=ProductSale.TYPE_RENTAL)
-    hourly_rentals = (
-        hourly_rentals_qs.annotate(hour=TruncHour("period_start"))
-        .values("hour")
-        .annotate(count=Count("id"))
-        .order_by("hour")
-    )
-
-    # Map results by hour
-    impressions_map = {
-        entry["hour"]: entry["impressions"] or 0 for entry in hourly_impressions
-    }
-    impression_revenue_map = {
-        entry["hour"]: round(entry["impression_revenue"] or 0, 6)
-        for entry in impression_revenue_qs
-    }
-    royalty_revenue_map = {
-        entry["hour"]: entry["royalty_revenue"] or 0 for entry in hourly_revenue
-    }
-    sales_map = {entry["hour"]: entry["count"] for entry in hourly_sales}
-    rentals_map = {entry["hour"]: entry["count"] for entry in hourly_rentals}
-
-    hourly_stats = []
-    current_hour = period_start.replace(minute=0, second=0, microsecond=0)
-
-    while current_hour <= period_end:
-        hourly_stats.append(
-            {
-                "period": current_hour.strftime("%Y-%m-%d %H:00"),
-                "impressions": impressions_map.get(current_hour, 0),
-                "sales": sales_map.get(current_hour, 0),
-                "rentals": rentals_map.get(current_hour, 0),
-                "royalty_revenue": royalty_revenue_map.get(current_hour, 0),
-                "impression_revenue": impression_revenue_map.get(current_hour, 0),
-            }
+    columns.update(
+        fill_series_columns(
+            "hourly", bucket_keys, sales_rows, ("sales", "rentals", "royalty_revenue")
         )
-        current_hour += timedelta(hours=1)
-
-    return hourly_stats
-
-
-def calculate_totals(
-    impressions_qs: QuerySet, sales_qs: QuerySet
-) -> Dict[str, Union[int, float]]:
-    # Total calculations
-    total_impressions = (
-        impressions_qs.aggregate(Sum("impressions"))["impressions__sum"] or 0
     )
+    return build_time_stats("hourly", bucket_keys, columns)
 
-    total_impression_revenue = (
-        impressions_qs.annotate(
-            revenue_expr=ExpressionWrapper(
-                F("impressions") * F("ecpm") / 1000,
-                output_field=DecimalField(max_digits=30, decimal_places=18),
-            )
-        ).aggregate(total=Sum("revenue_expr"))["total"]
-        or 0
-    )
-
-    total_sales_count = sales_qs.count()
-    total_royalty_revenue = (
-        sales_qs.aggregate(total_revenue=Sum("royalty_amount"))["total_revenue"] or 0
-    )
-
-    rentals_qs = sales_qs.filter(type=ProductSale.TYPE_RENTAL)
-    rentals_count = rentals_qs.count()
-    rentals_revenue = (
-        rentals_qs.aggregate(total_rentals_revenue=Sum("royalty_amount"))[
-            "total_rentals_revenue"
-        ]
-        or 0
-    )
 
-    purchases_qs = sales_qs.filter(type=ProductSale.TYPE_PURCHASE)
-    purchases_count = purchases_qs.count()
-    purchases_revenue = (
-        purchases_qs.aggregate(total_purchases_revenue=Sum("royalty_amount"))[
-            "total_purchases_revenue"
-        ]
-        or 0
+def build_time_stats(
+    granularity: str, bucket_keys: List[Any], columns: Dict[str, List[Any]]
+) -> List[Dict[str, Any]]:
+    fields = (TIME_BUCKETS[granularity][1], *SERIES_METRICS)
+    return [
+        dict(zip(fields, values))
+        for values in zip(
+            bucket_labels(granularity, bucket_keys),
+            *(columns[metric] for metric in SERIES_METRICS),
+        )
+    ]
+
+
+def calculate_totals(rollups_qs: QuerySet) -> Dict[str, Union[int, float]]:
+    totals = rollups_qs.aggregate(
+        total_impressions=Sum("impressions"),
+        total_impression_revenue=Sum("impression_revenue"),
+        total_sales_count=Sum("sales_count"),
+        total_royalty_revenue=Sum("royalty_revenue"),
+        rentals_count=Sum("rentals_count"),
+        rentals_revenue=Sum("rentals_revenue"),
+        purchases_count=Sum("purchases_count"),
+        purchases_revenue=Sum("purchases_revenue"),
     )
 
-    data = {
-        "total_impressions": total_impressions,
-        "total_sales_count": total_sales_count,
-        "total_royalty_revenue": total_royalty_revenue,
-        "rentals_count": rentals_count,
-        "rentals_revenue": rentals_revenue,
-        "purchases_count": purchases_count,
-        "purchases_revenue": purchases_revenue,
-        "total_impression_revenue": total_impression_revenue,
-    }
-
-    return data
+    return {key: value or 0 for key, value in totals.items()}
 
 
 def calculate_user_earnings(
@@ -468,38 +239,123 @@ def calculate_user_earnings(
     
     if product_id:
         expenses_qs = expenses_qs.filter(product_id=product_id)
-    
+
+    expenses = list(expenses_qs)
+    return summarize_earnings(expenses, calculate_expenses_revenue(expenses, filters))
+
+
+def calculate_project_earnings(
+    project_id: int,
+    product_id: int = None,
+    filters: Dict[str, Any] = None,
+) -> Dict[int, Dict[str, Union[int, float]]]:
+    """
+    Calculate the earnings of every member of a project at once.
+
+    Uses one query for the expenses and one for the revenue of all the products
+    they reference, regardless of the number of members.
+
+    Returns:
+        Dictionary mapping each member's user ID to their earnings information
+    """
+    expenses_qs = Expense.objects.filter(project_id=project_id, is_deleted=False)
+    if product_id:
+        expenses_qs = expenses_qs.filter(product_id=product_id)
+
+    expenses = list(expenses_qs)
+    product_revenue = calculate_expenses_revenue(expenses, filters)
+
+    expenses_by_user = {
+        user_id: []
+        for user_id in ProjectUser.objects.filter(project_id=project_id).values_list(
+            "user_id", flat=True
+        )
+    }
+    for expense in expenses:
+        expenses_by_user.setdefault(expense.user_id, []).append(expense)
+
+    return {
+        user_id: summarize_earnings(user_expenses, product_revenue)
+        for user_id, user_expenses in expenses_by_user.items()
+    }
+
+
+def calculate_expenses_revenue(
+    expenses: List[Expense], filters: Dict[str, Any] = None
+) -> Dict[int, float]:
+    """Revenue of the products that percentage expenses are based on."""
+    product_ids = {
+        expense.product_id
+        for expense in expenses
+        if expense.type == Expense.TYPE_PERCENTAGE
+    }
+    if not product_ids:
+        return {}
+    return calculate_products_revenue(product_ids, filters)
+
+
+def summarize_earnings(
+    expenses: List[Expense], product_revenue: Dict[int, float]
+) -> Dict[str, Union[int, float]]:
+    """
+    Apply static and percentage expenses to already computed product revenue.
+    """
     # If no expenses found, return zero earnings
-    if not expenses_qs.exists():
+    if not expenses:
         return {
             "total_earnings": 0,
             "has_expenses": False,
             "expense_count": 0
         }
-    
+
     total_earnings = 0
-    
-    for expense in expenses_qs:
+
+    for expense in expenses:
         if expense.type == Expense.TYPE_STATIC:
             # Static amount - just add the value
             total_earnings += float(expense.value)
         elif expense.type == Expense.TYPE_PERCENTAGE:
-            # Percentage-based - calculate based on product revenue
-            if product_id:
-                # For specific product
-                product_revenue = calculate_product_revenue(product_id, filters)
-            else:
-                # For all products this expense applies to
-                product_revenue = calculate_product_revenue(expense.product_id, filters)
-            
-            # Calculate percentage of revenue
-            percentage_earnings = (float(expense.value) / 100) * product_revenue
-            total_earnings += percentage_earnings
-    
+            # Percentage of the revenue of the product the expense applies to
+            revenue = product_revenue.get(expense.product_id, 0.0)
+            total_earnings += (float(expense.value) / 100) * revenue
+
     return {
         "total_earnings": round(total_earnings, 2),
         "has_expenses": True,
-        "expense_count": expenses_qs.count()
+        "expense_count": len(expenses)
+    }
+
+
+def calculate_products_revenue(
+    product_ids: Iterable[int], filters: Dict[str, Any] = None
+) -> Dict[int, float]:
+    """
+    Calculate total revenue (royalties plus impression revenue) per product
+    with a single grouped query over the daily rollups.
+
+    Args:
+        product_ids: The product IDs
+        filters: Optional filters for date range, etc.
+
+    Returns:
+        Dictionary mapping product ID to its total revenue
+    """
+    rollups_qs = ProductDailyRollup.objects.filter(product_id__in=list(product_ids))
+    if filters:
+        rollups_qs = rollups_qs.filter(**filters)
+
+    rows = (
+        rollups_qs.values("product_id")
+        .annotate(
+            royalty_revenue_sum=Sum("royalty_revenue"),
+            impression_revenue_sum=Sum("impression_revenue"),
+        )
+        .order_by()
+    )
+    return {
+        row["product_id"]: float(row["royalty_revenue_sum"] or 0)
+        + float(row["impression_revenue_sum"] or 0)
+        for row in rows
     }
 
 
@@ -514,30 +370,7 @@ def calculate_product_revenue(product_id: int, filters: Dict[str, Any] = None) -
     Returns:
         Total revenue for the product
     """
-    # Get sales for the product
-    sales_qs = ProductSale.objects.filter(product_id=product_id)
-    
-    # Get impressions for the product
-    impressions_qs = ProductImpressions.objects.filter(product_id=product_id)
-    
-    if filters:
-        sales_qs = sales_qs.filter(**filters)
-        impressions_qs = impressions_qs.filter(**filters)
-    
-    # Calculate royalty revenue
-    royalty_revenue = sales_qs.aggregate(
-        total=Sum("royalty_amount")
-    )["total"] or 0
-    
-    # Calculate impression revenue
-    impression_revenue = impressions_qs.annotate(
-        revenue_expr=ExpressionWrapper(
-            F("impressions") * F("ecpm") / 1000,
-            output_field=DecimalField(max_digits=30, decimal_places=18),
-        )
-    ).aggregate(total=Sum("revenue_expr"))["total"] or 0
-    
-    return float(royalty_revenue) + float(impression_revenue)
+    return calculate_products_revenue([product_id], filters).get(product_id, 0.0)
 
 
 def calculate_project_user_earnings(
@@ -561,63 +394,38 @@ def calculate_project_user_earnings(
 
 def calculate_analytics_per_source(
     project_id: int,
-    impressions_qs: QuerySet,
-    sales_qs: QuerySet,
+    rollups_qs: QuerySet,
 ) -> List[Dict[str, Any]]:
     """
     Calculate analytics per source, returning source information along with impressions and sales data.
-    """
-    # Get all sources for the project
-    sources = Source.objects.filter(project_id=project_id)
-
-    source_analytics = []
-
-    for source in sources:
-        # Get impressions and sales for this source
-        impressions_qs = impressions_qs.filter(
-            product__source_id=source.id,
-        )
-        sales_qs = sales_qs.filter(
-            product__source_id=source.id,
-        )
-
-        # Calculate totals for this source
-        total_impressions = (
-            impressions_qs.aggregate(total=Sum("impressions"))["total"] or 0
-        )
 
-        total_impression_revenue = (
-            impressions_qs.annotate(
-                revenue_expr=ExpressionWrapper(
-                    F("impressions") * F("ecpm") / 1000,
-                    output_field=DecimalField(max_digits=30, decimal_places=18),
-                )
-            ).aggregate(total=Sum("revenue_expr"))["total"]
-            or 0
-        )
-
-        total_sales_count = sales_qs.count()
-        total_royalty_revenue = (
-            sales_qs.aggregate(total=Sum("royalty_amount"))["total"] or 0
+    All per-source totals come from one GROUP BY over the rollups, and the
+    product counts are annotated onto the sources query.
+    """
+    source_totals = {
+        row["product__source_id"]: row
+        for row in rollups_qs.values("product__source_id")
+        .annotate(
+            total_impressions=Sum("impressions"),
+            total_impression_revenue=Sum("impression_revenue"),
+            total_sales_count=Sum("sales_count"),
+            total_royalty_revenue=Sum("royalty_revenue"),
+            rentals_count=Sum("rentals_count"),
+            rentals_revenue=Sum("rentals_revenue"),
+            purchases_count=Sum("purchases_count"),
+            purchases_revenue=Sum("purchases_revenue"),
         )
+        .order_by()
+    }
 
-        # Calculate rentals and purchases separately
-        rentals_qs = sales_qs.filter(type=ProductSale.TYPE_RENTAL)
-        rentals_count = rentals_qs.count()
-        rentals_revenue = (
-            rentals_qs.aggregate(total=Sum("royalty_amount"))["total"] or 0
-        )
+    sources = Source.objects.filter(project_id=project_id).annotate(
+        product_count=Count("product", filter=Q(product__project_id=project_id))
+    )
 
-        purchases_qs = sales_qs.filter(type=ProductSale.TYPE_PURCHASE)
-        purchases_count = purchases_qs.count()
-        purchases_revenue = (
-            purchases_qs.aggregate(total=Sum("royalty_amount"))["total"] or 0
-        )
+    source_analytics = []
 
-        # Get product count for this source
-        product_count = Product.objects.filter(
-            source_id=source.id, project_id=project_id
-        ).count()
+    for source in sources:
+        totals = source_totals.get(source.id, {})
 
         # Compile source analytics data
         source_data = {
@@ -626,15 +434,19 @@ def calculate_analytics_per_source(
             "platform": source.platform,
             "platform_display": source.get_platform_display(),
             "analytics": {
-                "total_impressions": total_impressions,
-                "total_impression_revenue": round(float(total_impression_revenue), 6),
-                "total_sales_count": total_sales_count,
-                "total_royalty_revenue": float(total_royalty_revenue),
-                "rentals_count": rentals_count,
-                "rentals_revenue": float(rentals_revenue),
-                "purchases_count": purchases_count,
-                "purchases_revenue": float(purchases_revenue),
-                "product_count": product_count,
+                "total_impressions": totals.get("total_impressions") or 0,
+                "total_impression_revenue": round(
+                    float(totals.get("total_impression_revenue") or 0), 6
+                ),
+                "total_sales_count": totals.get("total_sales_count") or 0,
+                "total_royalty_revenue": float(
+                    totals.get("total_royalty_revenue") or 0
+                ),
+                "rentals_count": totals.get("rentals_count") or 0,
+                "rentals_revenue": float(totals.get("rentals_revenue") or 0),
+                "purchases_count": totals.get("purchases_count") or 0,
+                "purchases_revenue": float(totals.get("purchases_revenue") or 0),
+                "product_count": source.product_count,
             },
         }
 
@@ -658,50 +470,291 @@ def calculate_analytics(
     product_id: int = None,
     granularity: str = "monthly",
     user=None,
+    since: Optional[datetime] = None,
+    timings: Optional[Dict[str, float]] = None,
+    exclude: Iterable[str] = (),
+    compare: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """
+    Return the analytics of a project (or of one of its products).
+
+    Sections named in exclude, such as source_analytics or user_earnings, are
+    neither computed nor returned.
+
+    With a period and COMPARISON_MODES in compare, `comparison` holds the
+    previous and/or year-ago period's series, totals and deltas, see
+    calculate_comparison.
+
+    The user-independent part of the response is cached per project data version
+    and per visible-product set, so owners share cache entries and producers only
+    ever see numbers computed over the products they can access.
+
+    With `since`, time_stats only holds the buckets whose data changed after
+    that watermark and `delta` is set, unless those changes are no longer known.
+
+    The duration of every section that ran is added to timings, in milliseconds.
+    """
+    visibility_token = visible_products = None
+    if not product_id and user:
+        visibility = resolve_product_visibility(project_id, user)
+        visibility_token = visibility.cache_token
+        visible_products = visibility.product_ids
+
+    cache_key = get_analytics_cache_key(
+        project_id,
+        filters,
+        period_start,
+        period_end,
+        product_id,
+        granularity,
+        visibility_token,
+        exclude=exclude,
+        compare=compare,
+    )
+    data = get_cached_analytics(cache_key)
+    sections = {}
+    if data is None:
+        sections = analytics_sections(
+            project_id,
+            filters,
+            period_start,
+            period_end,
+            product_id,
+            granularity,
+            visible_products,
+            compare,
+        )
+    # Calculate user earnings if user is provided
+    if user:
+        sections["user_earnings"] = lambda: calculate_user_earnings(
+            project_id, user.id, product_id, filters
+        )
+    for name in exclude:
+        sections.pop(name, None)
+    results = run_sections(sections, timings)
+
+    if data is None:
+        data = merge_analytics_sections(results)
+        set_cached_analytics(cache_key, data)
+
+    if since:
+        changed_periods = get_changed_periods(project_id, since)
+        data["delta"] = changed_periods is not None
+        if changed_periods is not None:
+            data["time_stats"] = filter_changed_buckets(
+                data["time_stats"], data["granularity"], changed_periods
+            )
+
+    if "user_earnings" in results:
+        data["user_earnings"] = results["user_earnings"]
+
+    return data
+
+
+def get_analytics_cache_key(
+    project_id: int,
+    filters: Dict[str, Any],
+    period_start: date,
+    period_end: date,
+    product_id: Optional[int],
+    granularity: str,
+    visibility_token: Optional[str],
+    data_version: Optional[int] = None,
+    exclude: Iterable[str] = (),
+    compare: Iterable[str] = (),
+) -> str:
+    return build_analytics_cache_key(
+        project_id,
+        visibility_token,
+        data_version,
+        exclude=sorted(exclude),
+        compare=sorted(compare),
+        product_id=product_id,
+        filters=filters,
+        period_start=period_start,
+        period_end=period_end,
+        granularity=granularity,
+        # Open-ended ranges are bucketed relative to today
+        today=date.today(),
+    )
+
+
+def filter_changed_buckets(
+    time_stats: List[Dict[str, Any]],
+    granularity: str,
+    changed_periods: List[Tuple[Optional[date], Optional[date]]],
+) -> List[Dict[str, Any]]:
+    """The time_stats buckets overlapping any of the changed periods."""
+    label_key = TIME_BUCKETS[granularity][1]
+    changed_buckets = []
+    for bucket in time_stats:
+        first_day, last_day = bucket_label_days(granularity, bucket[label_key])
+        if any(
+            (start is None or start <= last_day) and (end is None or end >= first_day)
+            for start, end in changed_periods
+        ):
+            changed_buckets.append(bucket)
+    return changed_buckets
+
+
+def aggregate_analytics(
+    project_id: int,
+    filters: Dict[str, Any],
+    period_start: date,
+    period_end: date,
+    product_id: int = None,
+    granularity: str = "monthly",
+    visible_products: Optional[QuerySet] = None,
+    timings: Optional[Dict[str, float]] = None,
+    compare: Iterable[str] = (),
 ) -> Dict[str, Any]:
+    sections = analytics_sections(
+        project_id,
+        filters,
+        period_start,
+        period_end,
+        product_id,
+        granularity,
+        visible_products,
+        compare,
+    )
+    return merge_analytics_sections(run_sections(sections, timings))
+
+
+def analytics_sections(
+    project_id: int,
+    filters: Dict[str, Any],
+    period_start: date,
+    period_end: date,
+    product_id: int = None,
+    granularity: str = "monthly",
+    visible_products: Optional[QuerySet] = None,
+    compare: Iterable[str] = (),
+) -> Dict[str, Callable[[], Any]]:
+    """
+    The independent parts of an analytics response by name, as callables for
+    run_sections. merge_analytics_sections assembles their results.
+
+    visible_products is a ProductVisibility.product_ids subquery, or None for
+    every product of the project.
+    """
     if product_id:
-        impressions_qs = ProductImpressions.objects.filter(product_id=product_id)
-        sales_qs = ProductSale.objects.filter(product_id=product_id)
+        rollups_qs = ProductDailyRollup.objects.filter(product_id=product_id)
     else:
-        impressions_qs = ProductImpressions.objects.filter(
-            product__project_id=project_id
-        )
-        sales_qs = ProductSale.objects.filter(product__project_id=project_id)
-        
-        # Apply producer role filtering if user is provided and is a producer
-        if user:
-            try:
-                project_user = ProjectUser.objects.get(user=user, project_id=project_id)
-                if project_user.role == ProjectUser.PROJECT_USER_ROLE_PRODUCER:
-                    # Get accessible product IDs for this producer
-                    accessible_product_ids = list(ProducerProductAccess.objects.filter(
-                        project_user=project_user
-                    ).values_list('product_id', flat=True))
-                    
-                    # Filter impressions and sales to only accessible products
-                    impressions_qs = impressions_qs.filter(product_id__in=accessible_product_ids)
-                    sales_qs = sales_qs.filter(product_id__in=accessible_product_ids)
-            except ProjectUser.DoesNotExist:
-                # User is not a member of this project, return empty querysets
-                impressions_qs = impressions_qs.none()
-                sales_qs = sales_qs.none()
+        rollups_qs = ProductDailyRollup.objects.filter(product__project_id=project_id)
+
+        # Restrict producers (and non-members) to the products they can access
+        if visible_products is not None:
+            rollups_qs = rollups_qs.filter(product_id__in=visible_products)
 
+    # Compared periods lie outside the filtered range
+    unfiltered_rollups_qs = rollups_qs
     if filters:
-        impressions_qs = impressions_qs.filter(**filters)
-        sales_qs = sales_qs.filter(**filters)
+        rollups_qs = rollups_qs.filter(**filters)
+
+    sections = {
+        "time_stats": lambda: calculate_granular_time_stats(
+            rollups_qs,
+            project_id,
+            filters,
+            period_start,
+            period_end,
+            product_id,
+            granularity,
+            visible_products,
+        ),
+        "totals": lambda: calculate_totals(rollups_qs),
+        # The unit of every revenue figure
+        "currency": lambda: Project.objects.filter(id=project_id)
+        .values_list("reporting_currency", flat=True)
+        .first(),
+    }
+    if compare and period_start and period_end:
+        sections["comparison"] = lambda: calculate_comparison(
+            unfiltered_rollups_qs, granularity, period_start, period_end, compare
+        )
+        if granularity != "hourly":
+            # The comparison query yields the current series as well
+            del sections["time_stats"]
+    if not product_id:
+        sections["source_analytics"] = lambda: calculate_analytics_per_source(
+            project_id, rollups_qs
+        )
+        # Only include product count for full project analytics
+        sections["product_count"] = lambda: Product.objects.filter(
+            project_id=project_id
+        ).count()
+    return sections
+
+
+def merge_analytics_sections(results: Dict[str, Any]) -> Dict[str, Any]:
+    data = dict(results["totals"])
+
+    if "time_stats" in results:
+        granularity, data["time_stats"] = results["time_stats"]
+    else:
+        granularity, data["time_stats"], _ = results["comparison"]
+    if "comparison" in results:
+        data["comparison"] = results["comparison"][2]
+
+    # Include granularity information in response
+    data["granularity"] = granularity
+    data["currency"] = results["currency"]
 
+    for name in ("source_analytics", "product_count"):
+        if name in results:
+            data[name] = results[name]
+
+    return data
+
+
+def calculate_granular_time_stats(
+    rollups_qs: QuerySet,
+    project_id: int,
+    filters: Dict[str, Any],
+    period_start: date,
+    period_end: date,
+    product_id: Optional[int],
+    granularity: str,
+    visible_products: Optional[QuerySet],
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    The time series at the requested granularity, along with the granularity
+    actually used, which "max" resolves to monthly or yearly buckets.
+    """
     # Calculate time-based stats based on granularity
+    time_stats = []
     if granularity == "daily":
         if period_start and period_end:
-            time_stats = calculate_daily_stats(
-                impressions_qs, sales_qs, period_start, period_end
+            time_stats = calculate_time_stats(
+                rollups_qs,
+                granularity,
+                daily_bucket_keys(period_start, period_end),
             )
-    elif granularity == "hourly": # Currently unused; enable this in the view when ready
+    elif granularity == "hourly":
         period_start_time = filters.get("period_start__gte")
         period_end_time = filters.get("period_end__lte")
         if period_start_time and period_end_time:
-            time_stats = calculate_hourly_stats(
-                impressions_qs, sales_qs, period_start_time, period_end_time
+            if timezone.is_naive(period_start_time):
+                period_start_time = timezone.make_aware(period_start_time)
+            if timezone.is_naive(period_end_time):
+                period_end_time = timezone.make_aware(period_end_time)
+
+            # Hours are only known to the raw fact tables
+            facts_scope = Q(period_start__lte=period_end_time)
+            if product_id:
+                facts_scope &= Q(product_id=product_id)
+            else:
+                facts_scope &= Q(product__project_id=project_id)
+                if visible_products is not None:
+                    facts_scope &= Q(product_id__in=visible_products)
+
+            time_stats = calculate_hourly_time_stats(
+                ProductImpressions.objects.filter(
+                    facts_scope, is_quarantined=False, **filters
+                ),
+                ProductSale.objects.filter(facts_scope, **filters),
+                hourly_bucket_keys(period_start_time, period_end_time),
             )
     elif granularity == "monthly": 
         months = 12
@@ -711,32 +764,26 @@ def calculate_analytics(
                 + (period_end.month - period_start.month)
                 + 1
             )
-        time_stats = calculate_monthly_stats(
-            impressions_qs, sales_qs, months, filters.get("period_end__lte")
+        time_stats = calculate_time_stats(
+            rollups_qs,
+            granularity,
+            monthly_bucket_keys(months, filters.get("period_end__lte")),
         )
     elif granularity == "yearly": 
         years = 5
         if period_start and period_end:
             years = period_end.year - period_start.year + 1
-        time_stats = calculate_yearly_stats(
-            impressions_qs, sales_qs, years, filters.get("period_end__lte")
+        time_stats = calculate_time_stats(
+            rollups_qs,
+            granularity,
+            yearly_bucket_keys(years, filters.get("period_end__lte")),
         )
 
     else:
         # Find the earliest data point to determine the full range
-        earliest_impression = impressions_qs.order_by('period_start').first()
-        earliest_sale = sales_qs.order_by('period_start').first()
-        
-        earliest_date = None
-        if earliest_impression and earliest_sale:
-            earliest_date = min(earliest_impression.period_start, earliest_sale.period_start)
-        elif earliest_impression:
-            earliest_date = earliest_impression.period_start
-        elif earliest_sale:
-            earliest_date = earliest_sale.period_start
+        earliest_date = rollups_qs.aggregate(earliest=Min("period_start"))["earliest"]
         
         if earliest_date:
-            from datetime import datetime
             current_date = datetime.now().date()
             months = (current_date.year - earliest_date.year) * 12 + (current_date.month - earliest_date.month) + 1
             years = current_date.year - earliest_date.year + 1
@@ -747,39 +794,228 @@ def calculate_analytics(
         
         # If only 1-2 year of data, switch to monthly granularity for better visualization
         if years <= 2:
-            time_stats = calculate_monthly_stats(
-                impressions_qs, sales_qs, months, None
-            )
             granularity = "monthly"
-        else:
-            time_stats = calculate_yearly_stats(
-                impressions_qs, sales_qs, years, None
+            time_stats = calculate_time_stats(
+                rollups_qs,
+                granularity,
+                monthly_bucket_keys(months, None),
             )
+        else:
             granularity = "yearly"
+            time_stats = calculate_time_stats(
+                rollups_qs,
+                granularity,
+                yearly_bucket_keys(years, None),
+            )
 
-    data = calculate_totals(impressions_qs, sales_qs)
+    return granularity, time_stats
 
-    data["time_stats"] = time_stats
 
-    # Include granularity information in response
-    data["granularity"] = granularity
+def calculate_comparison(
+    rollups_qs: QuerySet,
+    granularity: str,
+    period_start: date,
+    period_end: date,
+    modes: Iterable[str],
+) -> Tuple[str, List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    The current series along with the series, totals and deltas of the
+    compared periods, from rollups not restricted to any period, in one query.
+    Comparison buckets line up by position with the current ones.
 
-    # Calculate user earnings if user is provided
+    Hourly ranges are compared by day, as hours are only known to the raw fact
+    tables. Returns the granularity of the series, the current series and the
+    comparison of every mode.
+    """
+    if granularity == "hourly":
+        granularity = "daily"
+    # The same buckets as time_stats without a comparison
+    bucket_keys = series_bucket_keys(granularity, period_start, period_end)
+    periods = {"current": (period_start, period_end)}
+    period_keys = {"current": bucket_keys}
+    for mode in modes:
+        shift = comparison_shift(mode, granularity, period_start, period_end)
+        periods[mode] = (shift(period_start), shift(period_end))
+        period_keys[mode] = [shift(key) for key in bucket_keys]
+
+    rows = aggregate_period_buckets(
+        rollups_qs, TIME_BUCKETS[granularity][0], periods
+    )
+    columns = {
+        name: fill_series_columns(granularity, period_keys[name], rows[name])
+        for name in periods
+    }
+    totals = {
+        name: {metric: sum(column) for metric, column in period_columns.items()}
+        for name, period_columns in columns.items()
+    }
+
+    comparisons = {}
+    for mode in modes:
+        start, end = periods[mode]
+        comparisons[mode] = {
+            "period_start": start,
+            "period_end": end,
+            "totals": totals[mode],
+            "deltas": {
+                metric: calculate_delta(totals["current"][metric], total)
+                for metric, total in totals[mode].items()
+            },
+            "time_stats": build_time_stats(
+                granularity, period_keys[mode], columns[mode]
+            ),
+        }
+    current = build_time_stats(granularity, bucket_keys, columns["current"])
+    return granularity, current, comparisons
+
+
+# Sortable columns of the product matrix, besides the product title
+MATRIX_SORT_FIELDS = (*SERIES_METRICS, "revenue")
+
+
+def matrix_aggregates() -> Dict[str, Any]:
+    """Per-metric rollup aggregates, in SERIES_METRICS order."""
+    return {
+        "impressions_sum": Sum("impressions"),
+        "sales_sum": Sum("sales_count"),
+        "rentals_sum": Sum("rentals_count"),
+        "royalty_revenue_sum": Sum("royalty_revenue"),
+        "impression_revenue_sum": Round(Sum("impression_revenue"), 6),
+    }
+
+
+def matrix_values(values: Iterable[Any]) -> List[Union[int, float]]:
+    return [
+        float(value or 0) if isinstance(value, Decimal) else value or 0
+        for value in values
+    ]
+
+
+def calculate_product_matrix(
+    project_id: int,
+    filters: Dict[str, Any],
+    period_start: date,
+    period_end: date,
+    granularity: str = "monthly",
+    sort: str = "revenue",
+    descending: bool = True,
+    limit: int = 100,
+    user=None,
+) -> Dict[str, Any]:
+    """
+    Return the products x time buckets matrix of a project, cached like
+    calculate_analytics per data version and visible-product set.
+    """
+    visibility_token = visible_products = None
     if user:
-        earnings_data = calculate_user_earnings(
-            project_id, 
-            user.id, 
-            product_id, 
-            filters
+        visibility = resolve_product_visibility(project_id, user)
+        visibility_token = visibility.cache_token
+        visible_products = visibility.product_ids
+
+    cache_key = build_analytics_cache_key(
+        project_id,
+        visibility_token,
+        view="product_matrix",
+        filters=filters,
+        period_start=period_start,
+        period_end=period_end,
+        granularity=granularity,
+        sort=sort,
+        descending=descending,
+        limit=limit,
+    )
+    data = get_cached_analytics(cache_key)
+    if data is None:
+        data = aggregate_product_matrix(
+            project_id,
+            filters,
+            bucket_keys_between(granularity, period_start, period_end),
+            granularity,
+            sort,
+            descending,
+            limit,
+            visible_products,
         )
-        data["user_earnings"] = earnings_data
+        set_cached_analytics(cache_key, data)
 
-    if not product_id:
-        source_analytics = calculate_analytics_per_source(
-            project_id, impressions_qs, sales_qs
+    return data
+
+
+def aggregate_product_matrix(
+    project_id: int,
+    filters: Dict[str, Any],
+    bucket_keys: List[date],
+    granularity: str,
+    sort: str = "revenue",
+    descending: bool = True,
+    limit: int = 100,
+    visible_products: Optional[QuerySet] = None,
+) -> Dict[str, Any]:
+    """
+    Build a sparse products x time buckets matrix from the daily rollups.
+
+    The products are ranked and cut to the top `limit` with one grouped query,
+    then the cells of those products come from a second one grouped by product
+    and bucket. Only non-empty cells are returned, as
+    [product index, period index, *metrics] rows with the metrics in
+    SERIES_METRICS order.
+    """
+    rollups_qs = ProductDailyRollup.objects.filter(product__project_id=project_id)
+    if visible_products is not None:
+        rollups_qs = rollups_qs.filter(product_id__in=visible_products)
+    if filters:
+        rollups_qs = rollups_qs.filter(**filters)
+
+    product_totals = rollups_qs.values("product_id", "product__title").annotate(
+        **matrix_aggregates(),
+        revenue_sum=Sum("royalty_revenue") + Sum("impression_revenue"),
+    )
+    ordering = "product__title" if sort == "title" else f"{sort}_sum"
+    ranked = product_totals.order_by(
+        f"-{ordering}" if descending else ordering, "product_id"
+    )[:limit]
+
+    products = []
+    for row in ranked:
+        products.append(
+            {
+                "id": row["product_id"],
+                "title": row["product__title"],
+                "totals": dict(
+                    zip(
+                        MATRIX_SORT_FIELDS,
+                        matrix_values(
+                            row[f"{metric}_sum"] for metric in MATRIX_SORT_FIELDS
+                        ),
+                    )
+                ),
+            }
         )
-        data["source_analytics"] = source_analytics
-        # Only include product count for full project analytics
-        data["product_count"] = Product.objects.filter(project_id=project_id).count()
+    product_indexes = {product["id"]: index for index, product in enumerate(products)}
+
+    cells = []
+    if products and bucket_keys:
+        trunc = TIME_BUCKETS[granularity][0]
+        cell_rows = (
+            rollups_qs.filter(product_id__in=product_indexes)
+            .annotate(bucket=trunc("period_start"))
+            .values("product_id", "bucket")
+            .annotate(**matrix_aggregates())
+            .values_list("product_id", "bucket", *matrix_aggregates())
+            .order_by()
+        )
+        for product_id, bucket, *values in cell_rows:
+            index = bucket_offset(granularity, bucket_keys[0], bucket)
+            if 0 <= index < len(bucket_keys):
+                product_index = product_indexes[product_id]
+                cells.append([product_index, index, *matrix_values(values)])
+        cells.sort()
 
-    return data
+    return {
+        "granularity": granularity,
+        "periods": bucket_labels(granularity, bucket_keys),
+        "metrics": list(SERIES_METRICS),
+        "product_count": product_totals.count(),
+        "products": products,
+        "cells": cells,
+    }
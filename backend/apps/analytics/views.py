@@ -1,12 +1,45 @@
-from datetime import datetime, time
+from datetime import date, datetime, time
 
+from django.conf import settings
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.analytics.serializers import AnalyticsSerializer
-from apps.analytics.utils import calculate_analytics
+from apps.analytics.cache import build_analytics_etag, get_project_data_watermark
+from apps.analytics.export import (
+    EXPORT_CONTENT_TYPES,
+    EXPORT_ENCODERS,
+    get_export_queryset,
+    iter_export_rows,
+)
+from apps.analytics.forecast import get_revenue_forecast
+from apps.analytics.ranking import rank_products
+from apps.analytics.sections import run_sections
+from apps.analytics.serializers import (
+    DASHBOARD_SECTIONS,
+    AnalyticsExportSerializer,
+    AnalyticsRequestSerializer,
+    DashboardSerializer,
+    ForecastSerializer,
+    ProductMatrixSerializer,
+    TopContentSerializer,
+)
+from apps.analytics.series import month_number, month_start
+from apps.analytics.utils import (
+    calculate_analytics,
+    calculate_product_matrix,
+    get_analytics_cache_key,
+)
+from apps.product.serializers import ProductSerializer, with_serialized_relations
+from apps.project.visibility import resolve_product_visibility
+from apps.sources.models import Source
+from apps.sources.serializers import SourceSerializer
 
 
 class AnalyticsView(APIView):
@@ -20,7 +53,7 @@ class AnalyticsView(APIView):
         delta = period_end - period_start
 
         if delta.days <= 1:
-            return "daily"  # TODO: Change to "hourly" after switching Date fields to DateTime
+            return "hourly"
         elif delta.days <= 31:  # Approximately 1 month
             return "daily"
         elif delta.days <= 730:
@@ -29,22 +62,59 @@ class AnalyticsView(APIView):
             return "yearly"
 
     def get(self, request, product_id=None):
-        serializer = AnalyticsSerializer(data=request.query_params)
+        serializer = AnalyticsRequestSerializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
         project_id = request.user.currently_selected_project_id
         period_start = serializer.validated_data.get("period_start", None)
         period_end = serializer.validated_data.get("period_end", None)
+        since = serializer.validated_data.get("since", None)
+        compare = serializer.validated_data.get("compare", set())
 
         filters = {}
 
         if period_start and period_end:
-            start_date = datetime.combine(period_start, time.min)
-            end_date = datetime.combine(period_end, time.max)
+            start_date = timezone.make_aware(datetime.combine(period_start, time.min))
+            end_date = timezone.make_aware(datetime.combine(period_end, time.max))
             filters["period_start__gte"] = start_date
             filters["period_end__lte"] = end_date
 
         granularity = self._determine_granularity(period_start, period_end)
 
+        # Read before computing, so a change landing meanwhile is sent again
+        # rather than missed by the next `since` request
+        data_version, data_updated_at = get_project_data_watermark(project_id)
+        visibility_token = None
+        if not product_id:
+            visibility = resolve_product_visibility(project_id, request.user)
+            visibility_token = visibility.cache_token
+        cache_key = get_analytics_cache_key(
+            project_id,
+            filters,
+            period_start,
+            period_end,
+            product_id,
+            granularity,
+            visibility_token,
+            data_version,
+            compare=compare,
+        )
+        validators = {
+            "ETag": build_analytics_etag(f"{cache_key}:{since}", request.user.id),
+        }
+        if data_updated_at:
+            validators["Last-Modified"] = http_date(data_updated_at.timestamp())
+
+        not_modified = get_conditional_response(
+            request,
+            etag=validators["ETag"],
+            last_modified=data_updated_at and int(data_updated_at.timestamp()),
+        )
+        if not_modified is not None:
+            for header, value in validators.items():
+                not_modified[header] = value
+            return not_modified
+
+        timings = {}
         data = calculate_analytics(
             project_id,
             filters,
@@ -53,6 +123,268 @@ class AnalyticsView(APIView):
             product_id,
             granularity,
             request.user,
+            since,
+            timings,
+            compare=compare,
         )
+        data["data_watermark"] = data_updated_at
+
+        response = Response(data, status=status.HTTP_200_OK)
+        if settings.DEBUG and timings:
+            response["Server-Timing"] = ", ".join(
+                f"{name};dur={duration}" for name, duration in timings.items()
+            )
+        for header, value in validators.items():
+            response[header] = value
+        return response
+
+
+class DashboardView(AnalyticsView):
+    """
+    The analytics, top content, sources and products of the project in one
+    response, resolving the user's membership and visible products once for
+    all of them. `sections` selects what to compute, e.g. leaving out the
+    costlier source_analytics and user_earnings.
+    """
+
+    def get(self, request):
+        serializer = DashboardSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        project_id = request.user.currently_selected_project_id
+        period_start = serializer.validated_data.get("period_start", None)
+        period_end = serializer.validated_data.get("period_end", None)
+        selected = serializer.validated_data.get("sections") or set(DASHBOARD_SECTIONS)
+
+        visibility = resolve_product_visibility(project_id, request.user)
+        if not visibility.is_member:
+            return Response(
+                {"error": "User is not part of this project."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        products = visibility.products()
+
+        filters = {}
+
+        if period_start and period_end:
+            start_date = timezone.make_aware(datetime.combine(period_start, time.min))
+            end_date = timezone.make_aware(datetime.combine(period_end, time.max))
+            filters["period_start__gte"] = start_date
+            filters["period_end__lte"] = end_date
+
+        def serialize_products(queryset):
+            return ProductSerializer(
+                with_serialized_relations(queryset), many=True
+            ).data
+
+        sections = {}
+        if "analytics" in selected:
+            sections["analytics"] = lambda: calculate_analytics(
+                project_id,
+                filters,
+                period_start,
+                period_end,
+                None,
+                self._determine_granularity(period_start, period_end),
+                request.user,
+                exclude={"source_analytics", "user_earnings"} - selected,
+            )
+        if "top_by_impressions" in selected:
+            sections["top_by_impressions"] = lambda: rank_products(
+                project_id, "impressions", period_start, period_end, 10, visibility
+            )
+        if "top_by_sales" in selected:
+            sections["top_by_sales"] = lambda: rank_products(
+                project_id, "royalty_revenue", period_start, period_end, 10, visibility
+            )
+        if "sources" in selected:
+            sections["sources"] = lambda: SourceSerializer(
+                Source.objects.filter(project_id=project_id).annotate(
+                    product_count=Count("product")
+                ),
+                many=True,
+            ).data
+        if "products" in selected:
+            sections["products"] = lambda: serialize_products(products)
 
+        timings = {}
+        data = run_sections(sections, timings)
+
+        response = Response(data, status=status.HTTP_200_OK)
+        if settings.DEBUG and timings:
+            response["Server-Timing"] = ", ".join(
+                f"{name};dur={duration}" for name, duration in timings.items()
+            )
+        return response
+
+
+class TopContentView(APIView):
+    """
+    The best performing visible products of the project over a period, by
+    impressions, royalty revenue, impression revenue or revenue growth.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = TopContentSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        project_id = request.user.currently_selected_project_id
+
+        visibility = resolve_product_visibility(project_id, request.user)
+        if not visibility.is_member:
+            return Response(
+                {"error": "User is not part of this project."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        results = rank_products(
+            project_id,
+            serializer.validated_data["metric"],
+            serializer.validated_data.get("period_start", None),
+            serializer.validated_data.get("period_end", None),
+            serializer.validated_data["limit"],
+            visibility,
+        )
+        return Response(results, status=status.HTTP_200_OK)
+
+
+class ForecastView(APIView):
+    """
+    Projected royalty and impression revenue of the visible products, and of
+    all of them together, for the coming months. Forecasts are fitted nightly,
+    never on request.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = ForecastSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        project_id = request.user.currently_selected_project_id
+
+        visibility = resolve_product_visibility(project_id, request.user)
+        if not visibility.is_member:
+            return Response(
+                {"error": "User is not part of this project."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        data = get_revenue_forecast(
+            project_id,
+            serializer.validated_data["months"],
+            visibility,
+            serializer.validated_data.get("product_id"),
+        )
+        if data is None:
+            return Response(
+                {"error": "No forecast has been computed for this project yet."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
         return Response(data, status=status.HTTP_200_OK)
+
+
+class ProductMatrixView(APIView):
+    """
+    Analytics of every visible product per time bucket in one response, for
+    catalog tables. Defaults to the last 12 months by month.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def _determine_granularity(self, period_start, period_end):
+        delta = period_end - period_start
+
+        if delta.days <= 31:
+            return "daily"
+        elif delta.days <= 730:
+            return "monthly"
+        else:
+            return "yearly"
+
+    def get(self, request):
+        serializer = ProductMatrixSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        project_id = request.user.currently_selected_project_id
+        period_start = serializer.validated_data.get("period_start", None)
+        period_end = serializer.validated_data.get("period_end", None)
+
+        if not period_start:
+            period_end = date.today()
+            period_start = month_start(month_number(period_end) - 11)
+
+        filters = {
+            "period_start__gte": timezone.make_aware(
+                datetime.combine(period_start, time.min)
+            ),
+            "period_end__lte": timezone.make_aware(
+                datetime.combine(period_end, time.max)
+            ),
+        }
+
+        granularity = serializer.validated_data.get(
+            "granularity"
+        ) or self._determine_granularity(period_start, period_end)
+
+        data = calculate_product_matrix(
+            project_id,
+            filters,
+            period_start,
+            period_end,
+            granularity,
+            serializer.validated_data["sort"],
+            serializer.validated_data["order"] == "desc",
+            serializer.validated_data["limit"],
+            request.user,
+        )
+
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class AnalyticsExportView(APIView):
+    """
+    Stream the per-product, per-bucket analytics series of the project as
+    NDJSON or CSV, for BI tools pulling years of daily data.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = AnalyticsExportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        project_id = request.user.currently_selected_project_id
+        period_start = serializer.validated_data.get("period_start", None)
+        period_end = serializer.validated_data.get("period_end", None)
+        export_format = serializer.validated_data["export_format"]
+        granularity = serializer.validated_data["granularity"]
+
+        visibility = resolve_product_visibility(project_id, request.user)
+        if not visibility.is_member:
+            return Response(
+                {"error": "User is not part of this project."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        filters = {}
+
+        if period_start and period_end:
+            start_date = timezone.make_aware(datetime.combine(period_start, time.min))
+            end_date = timezone.make_aware(datetime.combine(period_end, time.max))
+            filters["period_start__gte"] = start_date
+            filters["period_end__lte"] = end_date
+
+        queryset = get_export_queryset(
+            project_id,
+            filters,
+            granularity,
+            serializer.validated_data.get("product_id"),
+            visibility.product_ids,
+        )
+        lines = EXPORT_ENCODERS[export_format](iter_export_rows(queryset, granularity))
+
+        response = StreamingHttpResponse(
+            lines, content_type=EXPORT_CONTENT_TYPES[export_format]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="analytics-{granularity}.{export_format}"'
+        )
+        return response
@@ -0,0 +1,91 @@
+"""
+Benchmarks of the import writers on a synthetic statement.
+
+The statement's rows are stored into a throwaway project by every writer the
+database supports, each run in a transaction that is rolled back like the
+analytics benchmarks, so the project and its rows are never kept.
+"""
+
+from typing import Any, Dict, List
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.analytics.benchmarks import measure
+from apps.data_imports.models import File
+from apps.data_imports.utils.report_processing import update_products_with_mappings
+from apps.data_imports.utils.writers import BulkImportWriter, CopyImportWriter
+from apps.project.models import Project
+
+BENCHMARK_MAPPINGS = {
+    "title": "Title",
+    "unit_price": "Unit Price",
+    "quantity": "Quantity",
+    "royalty_amount": "Royalty Amount",
+    "impressions": "Impressions",
+    "ecpm": "eCPM",
+    "period_start": "Period Start",
+    "period_end": "Period End",
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def synthetic_statement(rows: int, products: int) -> List[Dict[str, str]]:
+    """CSV rows with a sale and impressions each, spread over the products."""
+    return [
+        {
+            "Title": f"Benchmark product {i % products}",
+            "Unit Price": f"{1.99 + i % 18:.2f}",
+            "Quantity": str(1 + i % 5),
+            "Royalty Amount": f"{(1.99 + i % 18) * 0.7:.2f}",
+            "Impressions": str(50 + i % 950),
+            "eCPM": f"{0.5 + i % 10:.4f}",
+            "Period Start": f"2024-{1 + i % 12:02d}-01",
+            "Period End": f"2024-{1 + i % 12:02d}-28",
+        }
+        for i in range(rows)
+    ]
+
+
+def run_import_benchmarks(
+    rows: int = 50000, products: int = 1000, repeat: int = 3
+) -> Dict[str, Any]:
+    """Time the import of a synthetic statement with every writer."""
+    writers = {"bulk_create": BulkImportWriter}
+    if connection.vendor == "postgresql":
+        writers["copy"] = CopyImportWriter
+    statement = synthetic_statement(rows, products)
+    results = []
+
+    try:
+        with transaction.atomic():
+            project = Project.objects.create(name="Import benchmark")
+            file = File.objects.create(project=project, name="benchmark.csv")
+            for name, writer_class in writers.items():
+                result = measure(
+                    lambda: update_products_with_mappings(
+                        statement,
+                        project.id,
+                        file.id,
+                        BENCHMARK_MAPPINGS,
+                        writer_class=writer_class,
+                    ),
+                    repeat,
+                )
+                result["rows_per_second"] = round(rows / result["median_ms"] * 1000)
+                results.append({"case": name, **result})
+            raise _Rollback
+    except _Rollback:
+        pass
+
+    return {
+        "generated_at": timezone.now(),
+        "database": connection.vendor,
+        "repeat": repeat,
+        "rows": rows,
+        "products": products,
+        "results": results,
+    }
@@ -0,0 +1,191 @@
+"""
+Background imports of files with confirmed column mappings.
+
+An ImportJob is processed by task_process_import_job in chunks of
+IMPORT_JOB_CHUNK_ROWS CSV rows, each chunk committed in one transaction with
+the job's counters, so the rows_processed of a job always matches what is
+stored. A cancelled or failed job is resumed by skipping the rows of its
+committed chunks. Cancellation is requested on the job and honoured between
+chunks. The file's rollups are refreshed once the job stops, and its creator
+is notified when it completes or fails.
+
+Every committed chunk touches the job's updated_at. A running job that hasn't
+for IMPORT_JOB_STALE_SECONDS lost its worker: the task, acknowledged only once
+it returns, is delivered again and takes the job over, and the job can be
+resumed or cancelled by hand.
+"""
+
+import time
+from contextlib import closing
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.notifications.utils import create_notification
+from apps.product.services import refresh_file_rollups
+
+from .models import File, ImportJob
+from .utils.csv_stream import iter_batches, iter_csv_rows
+from .utils.report_processing import update_products_with_mappings
+
+ACTIVE_STATUSES = (ImportJob.STATUS_QUEUED, ImportJob.STATUS_RUNNING)
+RESUMABLE_STATUSES = (ImportJob.STATUS_FAILED, ImportJob.STATUS_CANCELLED)
+
+
+def stale_jobs() -> Q:
+    """Running jobs that stopped committing chunks, as their worker was lost."""
+    stale_before = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+    return Q(status=ImportJob.STATUS_RUNNING, updated_at__lt=stale_before)
+
+
+def is_stale(job: ImportJob) -> bool:
+    return ImportJob.objects.filter(stale_jobs(), id=job.id).exists()
+
+
+def is_being_imported(file: File) -> bool:
+    return file.import_jobs.filter(status__in=ACTIVE_STATUSES).exists()
+
+
+def enqueue_import_job(job: ImportJob) -> None:
+    from .tasks import task_process_import_job
+
+    transaction.on_commit(lambda: task_process_import_job.delay(job.id))
+
+
+def start_import_job(file: File, user=None) -> ImportJob:
+    """Queue an import of the file with its confirmed column mappings."""
+    if is_being_imported(file):
+        raise ValueError("This file is already being imported")
+    job = ImportJob.objects.create(file=file, created_by=user)
+    enqueue_import_job(job)
+    return job
+
+
+def cancel_import_job(job: ImportJob) -> ImportJob:
+    """
+    Cancel a queued or stale job right away, a running one after its current
+    chunk. The rows of committed chunks are kept.
+    """
+    if job.status not in ACTIVE_STATUSES:
+        raise ValueError(f"A {job.status} import can't be cancelled")
+    ImportJob.objects.filter(id=job.id).update(cancel_requested=True)
+    taken_over = ImportJob.objects.filter(stale_jobs(), id=job.id).update(
+        status=ImportJob.STATUS_CANCELLED, finished_at=timezone.now()
+    )
+    ImportJob.objects.filter(id=job.id, status=ImportJob.STATUS_QUEUED).update(
+        status=ImportJob.STATUS_CANCELLED, finished_at=timezone.now()
+    )
+    if taken_over:
+        # The lost worker never refreshed them for its committed chunks
+        refresh_file_rollups(job.file_id)
+    job.refresh_from_db()
+    return job
+
+
+def resume_import_job(job: ImportJob) -> ImportJob:
+    """
+    Queue a failed, cancelled or stale job again, from its last committed
+    chunk.
+    """
+    if job.status not in RESUMABLE_STATUSES and not is_stale(job):
+        raise ValueError(f"A {job.status} import can't be resumed")
+    if (
+        job.file.import_jobs.filter(status__in=ACTIVE_STATUSES)
+        .exclude(id=job.id)
+        .exists()
+    ):
+        raise ValueError("This file is already being imported")
+    job.status = ImportJob.STATUS_QUEUED
+    job.cancel_requested = False
+    job.error = ""
+    job.finished_at = None
+    job.save()
+    enqueue_import_job(job)
+    return job
+
+
+def process_import_job(job_id: int) -> ImportJob:
+    """
+    Import the rows of the job's file that its committed chunks don't cover.
+    A job running elsewhere is returned as is, unless it is stale.
+    """
+    now = timezone.now()
+    started = ImportJob.objects.filter(
+        Q(status=ImportJob.STATUS_QUEUED) | stale_jobs(),
+        id=job_id,
+        cancel_requested=False,
+    ).update(status=ImportJob.STATUS_RUNNING, started_at=now, updated_at=now)
+    job = ImportJob.objects.select_related("file", "created_by").get(id=job_id)
+    if not started:
+        # A redelivered task of a stale job cancelled while it ran
+        if ImportJob.objects.filter(
+            stale_jobs(), id=job_id, cancel_requested=True
+        ).update(status=ImportJob.STATUS_CANCELLED, finished_at=now):
+            refresh_file_rollups(job.file_id)
+            job.refresh_from_db()
+        return job
+
+    file = job.file
+    mappings = file.column_mappings or {}
+    run_started = time.perf_counter()
+    rows_this_run = 0
+    status = ImportJob.STATUS_COMPLETED
+    error = ""
+
+    try:
+        # The rows are closed before the file, even when the worker stops
+        with file.file.open("rb") as file_handle, closing(
+            iter_csv_rows(file_handle)
+        ) as rows:
+            # Rows of the chunks committed by earlier runs
+            for _ in islice(rows, job.rows_processed):
+                pass
+            for chunk in iter_batches(rows, settings.IMPORT_JOB_CHUNK_ROWS):
+                if ImportJob.objects.filter(id=job_id, cancel_requested=True).exists():
+                    status = ImportJob.STATUS_CANCELLED
+                    break
+                with transaction.atomic():
+                    result = update_products_with_mappings(
+                        chunk, file.project_id, file.id, mappings
+                    )
+                    rows_this_run += len(chunk)
+                    ImportJob.objects.filter(id=job_id).update(
+                        rows_processed=F("rows_processed") + len(chunk),
+                        rows_failed=F("rows_failed") + result["failed"],
+                        rows_per_second=rows_this_run
+                        / (time.perf_counter() - run_started),
+                        updated_at=timezone.now(),
+                    )
+    except Exception as e:
+        print(f"Error in import job {job_id}: {e}", flush=True)
+        status = ImportJob.STATUS_FAILED
+        error = str(e)
+
+    refresh_file_rollups(file.id)
+    if status == ImportJob.STATUS_COMPLETED:
+        file.is_processed = True
+        file.save()
+
+    ImportJob.objects.filter(id=job_id).update(
+        status=status, error=error, finished_at=timezone.now()
+    )
+    job.refresh_from_db()
+    notify_import_job(job)
+    return job
+
+
+def notify_import_job(job: ImportJob) -> None:
+    if not job.created_by or job.status == ImportJob.STATUS_CANCELLED:
+        return
+    if job.status == ImportJob.STATUS_COMPLETED:
+        title = (
+            f"Import of {job.file.name} completed: {job.rows_processed} rows, "
+            f"{job.rows_failed} failed"
+        )
+    else:
+        title = f"Import of {job.file.name} failed: {job.error}"
+    create_notification(job.created_by, title[:255])
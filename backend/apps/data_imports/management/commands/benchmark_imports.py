@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from apps.data_imports.benchmarks import run_import_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Time storing a synthetic statement with the bulk_create and, on "
+        "PostgreSQL, COPY import writers and write the timings and query counts "
+        "to a JSON file. Nothing is kept in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000)
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--output", default="import-benchmark.json")
+
+    def handle(self, *args, **options):
+        if min(options["rows"], options["products"], options["repeat"]) < 1:
+            raise CommandError("--rows, --products and --repeat must be at least 1.")
+
+        results = run_import_benchmarks(
+            options["rows"], options["products"], options["repeat"]
+        )
+
+        with open(options["output"], "w") as output:
+            json.dump(results, output, cls=DjangoJSONEncoder, indent=2)
+
+        for row in results["results"]:
+            self.stdout.write(
+                f"{row['case']}: median {row['median_ms']} ms, "
+                f"{row['rows_per_second']} rows/s, {row['queries']} queries"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 from apps.project.models import Project
@@ -31,3 +32,88 @@ class ColumnMapping(BaseModel):
     class Meta:
         db_table = "column_mapping"
         unique_together = ['file', 'csv_column']
+
+
+class ImportJob(BaseModel):
+    """
+    A background import of a file with its column mappings, committed in
+    chunks of rows, see apps/data_imports/jobs.py
+    """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CANCELLED = "cancelled"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+        (STATUS_CANCELLED, "Cancelled"),
+    ]
+
+    file = models.ForeignKey(File, on_delete=models.CASCADE, related_name="import_jobs")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED
+    )
+    # CSV rows of the committed chunks, where a resumed job continues
+    rows_processed = models.BigIntegerField(default=0)
+    # Sales and impressions the parser or the database rejected
+    rows_failed = models.BigIntegerField(default=0)
+    rows_per_second = models.FloatField(null=True)
+    cancel_requested = models.BooleanField(default=False)
+    error = models.TextField(blank=True, default="")
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = "import_job"
+
+
+class Upload(BaseModel):
+    """
+    A file uploaded in parts, assembled into a File once every part arrived,
+    see apps/data_imports/uploads.py
+    """
+
+    STATUS_UPLOADING = "uploading"
+    STATUS_COMPLETED = "completed"
+
+    STATUS_CHOICES = [
+        (STATUS_UPLOADING, "Uploading"),
+        (STATUS_COMPLETED, "Completed"),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True
+    )
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    part_size = models.IntegerField()
+    # SHA-256 of the whole file, hex encoded
+    checksum = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_UPLOADING
+    )
+    file = models.ForeignKey(File, on_delete=models.SET_NULL, null=True)
+
+    class Meta:
+        db_table = "upload"
+
+
+class UploadPart(BaseModel):
+    upload = models.ForeignKey(Upload, on_delete=models.CASCADE, related_name="parts")
+    number = models.IntegerField()
+    size = models.IntegerField()
+    # SHA-256 of the part, hex encoded
+    checksum = models.CharField(max_length=64)
+
+    class Meta:
+        db_table = "upload_part"
+        unique_together = ["upload", "number"]
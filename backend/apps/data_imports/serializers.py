@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
-from .models import File
+from .models import File, ImportJob, Upload
+from .uploads import missing_parts, part_count
 
 
 class FileSerializer(serializers.ModelSerializer):
@@ -10,3 +11,56 @@ class FileSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             "name": {"required": False},
         }
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id",
+            "file",
+            "status",
+            "rows_processed",
+            "rows_failed",
+            "rows_per_second",
+            "cancel_requested",
+            "error",
+            "started_at",
+            "finished_at",
+            "created_at",
+        ]
+
+
+class UploadCreateSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    checksum = serializers.RegexField(
+        r"^[0-9a-fA-F]{64}$",
+        error_messages={"invalid": "Expected a SHA-256 hex digest"},
+    )
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    part_count = serializers.SerializerMethodField()
+    missing_parts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Upload
+        fields = [
+            "id",
+            "name",
+            "size",
+            "part_size",
+            "part_count",
+            "missing_parts",
+            "checksum",
+            "status",
+            "file",
+            "created_at",
+        ]
+
+    def get_part_count(self, upload):
+        return part_count(upload)
+
+    def get_missing_parts(self, upload):
+        return missing_parts(upload)
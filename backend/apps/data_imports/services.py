@@ -1,10 +1,12 @@
 from django.shortcuts import get_object_or_404
 
 from apps.product.models import ProductImpressions, ProductSale
+from apps.product.services import get_rollup_scope, refresh_daily_rollups
 
 from .models import File, ColumnMapping
-from .serializers import FileSerializer
-from .utils.report_processing import process_report_with_mappings, read_csv
+from .jobs import is_being_imported, start_import_job
+from .serializers import FileSerializer, ImportJobSerializer
+from .uploads import complete_upload
 from .utils.column_mapping import get_csv_headers, detect_column_mappings, get_csv_preview
 from .utils.validation import validate_column_mappings, validate_csv_data_with_mappings
 
@@ -24,13 +26,19 @@ def create_file(file, data):
 
     saved_file = serializer.save()
 
-    # Get CSV headers and detect column mappings
+    return {
+        "file": FileSerializer(saved_file).data,
+        **get_mapping_suggestions(file),
+    }
+
+
+def get_mapping_suggestions(file):
+    """The headers, suggested column mappings and first rows of a CSV file"""
     csv_headers = get_csv_headers(file)
     suggested_mappings = detect_column_mappings(csv_headers)
     csv_preview = get_csv_preview(file)
 
     return {
-        "file": FileSerializer(saved_file).data,
         "csv_headers": csv_headers,
         "suggested_mappings": suggested_mappings,
         "csv_preview": csv_preview,
@@ -38,19 +46,21 @@ def create_file(file, data):
     }
 
 
-def confirm_column_mappings(file_id, mappings):
-    """Confirm column mappings and process the file"""
+def confirm_column_mappings(file_id, mappings, user=None):
+    """Confirm column mappings and queue the import of the file"""
     file = get_object_or_404(File, pk=file_id)
+    if is_being_imported(file):
+        raise ValueError("This file is already being imported")
     
     # Validate column mappings first
     is_valid, validation_errors = validate_column_mappings(mappings)
     if not is_valid:
         raise ValueError("; ".join(validation_errors))
     
-    # Read CSV data to validate against actual content
+    # Validate against the first rows of the actual content
     try:
         with file.file.open('rb') as file_handle:
-            csv_data = read_csv(file_handle)
+            csv_data = get_csv_preview(file_handle)
             data_is_valid, data_errors = validate_csv_data_with_mappings(csv_data, mappings)
             if not data_is_valid:
                 raise ValueError("; ".join(data_errors))
@@ -73,30 +83,57 @@ def confirm_column_mappings(file_id, mappings):
     file.column_mappings = mappings
     file.save()
     
-    # Process the report with the confirmed mappings
-    report_response = process_report_with_mappings(file)
-    
-    # Check if processing was successful
-    if report_response.get("status") == "error":
-        # If processing failed, don't mark as processed and return error
-        raise ValueError(f"Processing failed: {report_response.get('message', 'Unknown error')}")
-    
-    # Mark file as processed only if everything succeeded
-    file.is_processed = True
-    file.save()
-    
+    # Import the file in the background, the user is notified when it's done
+    job = start_import_job(file, user)
+
     return {
-        "report": report_response,
+        "report": {
+            "status": "queued",
+            "message": "Import started, you will be notified when it completes",
+        },
+        "job": ImportJobSerializer(job).data,
         "file": FileSerializer(file).data,
     }
 
 
+def complete_file_upload(upload, mappings=None, user=None):
+    """
+    Assemble an upload into a File and return its column mapping suggestions.
+    Given mappings, the file is imported right away as if they were confirmed.
+    """
+    file = complete_upload(upload)
+    with file.file.open('rb') as file_handle:
+        response_data = {
+            "file": FileSerializer(file).data,
+            **get_mapping_suggestions(file_handle),
+        }
+
+    if mappings:
+        try:
+            response_data.update(confirm_column_mappings(file.id, mappings, user))
+            response_data["requires_mapping"] = False
+        except ValueError as e:
+            # The file is kept, its mappings can still be confirmed
+            response_data["mapping_error"] = str(e)
+
+    return response_data
+
+
 def delete_file(pk):
     file = get_object_or_404(File, pk=pk)
+    # Its job would fail on the deleted rows, cancel it first
+    if is_being_imported(file):
+        raise ValueError("This file is being imported, cancel its import first")
 
-    ProductImpressions.objects.filter(from_file=file).delete()
-    ProductSale.objects.filter(from_file=file).delete()
+    impressions_qs = ProductImpressions.objects.filter(from_file=file)
+    sales_qs = ProductSale.objects.filter(from_file=file)
+    rollup_scope = get_rollup_scope(impressions_qs, sales_qs)
+
+    impressions_qs.delete()
+    sales_qs.delete()
 
     file.delete()
 
+    refresh_daily_rollups(*rollup_scope)
+
     return {"message": "File and related data deleted successfully"}
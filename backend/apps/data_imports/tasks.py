@@ -0,0 +1,22 @@
+from celery import shared_task
+from django.conf import settings
+
+from apps.data_imports.jobs import process_import_job
+from apps.data_imports.models import ImportJob
+
+
+# Acknowledged once the job stops, so the job of a lost worker is delivered
+# again, and taken over once stale
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=None)
+def task_process_import_job(self, job_id):
+    print(f"Running task for import job {job_id}.", flush=True)
+    job = process_import_job(job_id)
+    if job.status == ImportJob.STATUS_RUNNING:
+        # Running elsewhere, or on a lost worker until the job is stale
+        print(f"Import job {job_id} is running elsewhere.", flush=True)
+        raise self.retry(countdown=settings.IMPORT_JOB_STALE_SECONDS)
+    print(
+        f"Import job {job_id} {job.status}: {job.rows_processed} rows, "
+        f"{job.rows_failed} failed.",
+        flush=True,
+    )
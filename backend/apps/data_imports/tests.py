@@ -0,0 +1,737 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.data_imports.jobs import process_import_job
+from apps.data_imports.models import File, ImportJob, Upload
+from apps.data_imports.tasks import task_process_import_job
+from apps.data_imports.uploads import complete_upload
+from apps.data_imports.utils.column_mapping import get_csv_headers, get_csv_preview
+from apps.data_imports.utils.csv_stream import iter_batches, iter_csv_rows
+from apps.data_imports.utils.report_processing import (
+    process_report_with_mappings,
+    update_products_with_mappings,
+    validate_csv,
+)
+from apps.data_imports.utils.writers import (
+    BulkImportWriter,
+    CopyImportWriter,
+    get_import_writer,
+)
+from apps.notifications.models import Notification
+from apps.product.models import (
+    Product,
+    ProductDailyRollup,
+    ProductImpressions,
+    ProductSale,
+)
+from apps.project.models import Project, ProjectUser
+
+MAPPINGS = {
+    "title": "Title",
+    "unit_price": "Unit Price",
+    "quantity": "Quantity",
+    "royalty_amount": "Royalty",
+    "impressions": "Views",
+    "period_start": "Start",
+    "period_end": "End",
+}
+SALE_MAPPINGS = {
+    field: column for field, column in MAPPINGS.items() if field != "impressions"
+}
+
+
+class ChunkedReadFile(BytesIO):
+    """A file that fails on reads of the whole content and records read sizes"""
+
+    def __init__(self, content):
+        super().__init__(content)
+        self.read_sizes = []
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            raise AssertionError("The whole file was read at once")
+        self.read_sizes.append(size)
+        return super().read(size)
+
+    read1 = read
+
+
+def statement(rows, bom=False):
+    lines = ["Title,Unit Price,Quantity,Royalty,Views,Start,End"] + rows
+    return ("\ufeff" if bom else "").encode() + "\n".join(lines).encode()
+
+
+class CSVStreamTests(TestCase):
+    """Tests for the streaming CSV reading of imports"""
+
+    def test_headers_and_preview_read_only_the_start(self):
+        rows = [f"Product {i},1.00,1,0.50,,2024-01-01,2024-01-31" for i in range(5000)]
+        file = ChunkedReadFile(statement(rows, bom=True))
+
+        self.assertEqual(get_csv_headers(file)[0], "Title")
+        preview = get_csv_preview(file, max_rows=2)
+
+        self.assertEqual([row["Title"] for row in preview], ["Product 0", "Product 1"])
+        self.assertLess(sum(file.read_sizes), len(file.getvalue()) / 2)
+        self.assertEqual(file.tell(), 0)
+        self.assertFalse(file.closed)
+
+    def test_rows_stream_in_batches(self):
+        rows = [f"Product {i},1.00,1,0.50,,2024-01-01,2024-01-31" for i in range(2500)]
+        file = ChunkedReadFile(statement(rows))
+
+        batches = list(iter_batches(iter_csv_rows(file)))
+
+        self.assertEqual([len(batch) for batch in batches], [1000, 1000, 500])
+        self.assertEqual(batches[-1][-1]["Title"], "Product 2499")
+        self.assertLessEqual(max(file.read_sizes), 64 * 1024)
+
+    def test_validate_csv_rejects_empty_and_undecodable_files(self):
+        self.assertTrue(validate_csv(SimpleUploadedFile("a.csv", statement([]))))
+        self.assertFalse(validate_csv(SimpleUploadedFile("b.csv", b"")))
+        self.assertFalse(validate_csv(SimpleUploadedFile("c.csv", b"\xff\xfe\x00")))
+
+
+class ReportProcessingTests(TestCase):
+    """Tests for importing a stored statement with column mappings"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+
+    def import_statement(self, content):
+        file = File(
+            project=self.project, name="statement.csv", column_mappings=MAPPINGS
+        )
+        file.file.save("statement.csv", ContentFile(content))
+        return process_report_with_mappings(file)
+
+    def test_statement_is_imported(self):
+        response = self.import_statement(
+            statement(
+                [
+                    "Book,9.99,2,3.00,,2024-01-01,2024-01-31",
+                    "Video,,,,1500,2024-01-01,2024-01-31",
+                    "Book,9.99,1,1.50,,2024-02-01,2024-02-29",
+                ],
+                bom=True,
+            )
+        )
+
+        self.assertEqual(response["status"], "success")
+        self.assertEqual(response["message"], "Updated 3 products")
+        products = Product.objects.filter(project=self.project)
+        self.assertEqual(
+            sorted(products.values_list("title", flat=True)), ["Book", "Video"]
+        )
+        sales = ProductSale.objects.filter(product__project=self.project)
+        self.assertEqual(sales.count(), 2)
+        self.assertEqual(
+            sorted(sales.values_list("royalty_amount", flat=True)),
+            [Decimal("1.50"), Decimal("3.00")],
+        )
+        self.assertEqual(
+            ProductImpressions.objects.get(product__title="Video").impressions, 1500
+        )
+
+    def test_decoding_error_late_in_the_file_imports_nothing(self):
+        rows = [f"Product {i},1.00,1,0.50,,2024-01-01,2024-01-31" for i in range(3000)]
+        response = self.import_statement(statement(rows) + b"\nBroken \xff,1,1,1,,,")
+
+        self.assertEqual(response["status"], "error")
+        self.assertFalse(Product.objects.filter(project=self.project).exists())
+
+
+class BulkImportTests(TestCase):
+    """Tests for the bulk inserts of update_products_with_mappings"""
+
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.file = File.objects.create(project=self.project, name="statement.csv")
+
+    def rows(self, count, currency="USD"):
+        return [
+            {
+                "Title": f"Product {i % 50}",
+                "Unit Price": "2.00",
+                "Quantity": "1",
+                "Royalty": "1.00",
+                "Views": "10",
+                "Start": "2024-01-01",
+                "End": "2024-01-31",
+                "Currency": currency,
+            }
+            for i in range(count)
+        ]
+
+    def import_rows(self, rows, batch_size=100, writer_class=BulkImportWriter):
+        with CaptureQueriesContext(connection) as queries:
+            result = update_products_with_mappings(
+                rows,
+                self.project.id,
+                self.file.id,
+                MAPPINGS,
+                batch_size=batch_size,
+                writer_class=writer_class,
+            )
+        return result, len(queries)
+
+    def test_queries_grow_with_batches_not_rows(self):
+        for writer_class in (BulkImportWriter, CopyImportWriter):
+            with self.subTest(writer_class.__name__):
+                self.file = File.objects.create(project=self.project)
+                self.import_rows(self.rows(100), writer_class=writer_class)
+                result, queries = self.import_rows(
+                    self.rows(1000), batch_size=100, writer_class=writer_class
+                )
+                _, twice_the_rows_queries = self.import_rows(
+                    self.rows(2000), batch_size=200, writer_class=writer_class
+                )
+
+                self.assertEqual(result, {"updated": 1000, "failed": 0})
+                self.assertEqual(twice_the_rows_queries, queries)
+                self.assertEqual(
+                    Product.objects.filter(project=self.project).count(), 50
+                )
+                self.assertEqual(
+                    ProductSale.objects.filter(from_file=self.file).count(), 3100
+                )
+                self.assertEqual(
+                    ProductImpressions.objects.filter(from_file=self.file).count(),
+                    3100,
+                )
+
+    def test_writers_store_the_same_rows(self):
+        stored = []
+        for writer_class in (BulkImportWriter, CopyImportWriter):
+            self.file = File.objects.create(project=self.project)
+            self.import_rows(self.rows(120), writer_class=writer_class)
+            stored.append(
+                (
+                    sorted(
+                        ProductSale.objects.filter(from_file=self.file).values_list(
+                            "product__title",
+                            "type",
+                            "unit_price",
+                            "quantity",
+                            "royalty_amount",
+                            "period_start",
+                            "period_end",
+                        )
+                    ),
+                    sorted(
+                        ProductImpressions.objects.filter(
+                            from_file=self.file
+                        ).values_list(
+                            "product__title",
+                            "impressions",
+                            "period_start",
+                            "is_quarantined",
+                        )
+                    ),
+                )
+            )
+
+        self.assertEqual(len(stored[0][0]), 120)
+        self.assertEqual(stored[0], stored[1])
+
+    def test_rows_go_to_the_oldest_product_of_a_title(self):
+        oldest = Product.objects.create(project=self.project, title="Product 0")
+        Product.objects.create(project=self.project, title="Product 0")
+
+        for writer_class in (BulkImportWriter, CopyImportWriter):
+            with self.subTest(writer_class.__name__):
+                self.file = File.objects.create(project=self.project)
+                self.import_rows(self.rows(1), writer_class=writer_class)
+
+                self.assertEqual(
+                    ProductSale.objects.get(from_file=self.file).product, oldest
+                )
+
+    def test_rejected_rows_are_skipped(self):
+        mappings = {**MAPPINGS, "unit_price_currency": "Currency"}
+        rows = self.rows(5)
+        rows[2]["Currency"] = "NOT A CURRENCY CODE"
+        rows[3]["Views"] = "many"
+
+        for writer_class in (BulkImportWriter, CopyImportWriter):
+            with self.subTest(writer_class.__name__):
+                self.file = File.objects.create(project=self.project)
+                result = update_products_with_mappings(
+                    rows,
+                    self.project.id,
+                    self.file.id,
+                    mappings,
+                    batch_size=100,
+                    writer_class=writer_class,
+                )
+
+                self.assertEqual(result, {"updated": 5, "failed": 2})
+                self.assertEqual(
+                    ProductSale.objects.filter(from_file=self.file).count(), 4
+                )
+                self.assertEqual(
+                    ProductImpressions.objects.filter(from_file=self.file).count(), 4
+                )
+
+    def test_copy_is_used_on_postgresql_only(self):
+        writer = get_import_writer(self.project.id, self.file.id)
+        self.assertIsInstance(writer, CopyImportWriter)
+        self.assertEqual(writer.batch_size, settings.IMPORT_COPY_BATCH_SIZE)
+
+        with override_settings(IMPORT_USE_COPY=False):
+            writer = get_import_writer(self.project.id, self.file.id)
+        self.assertNotIsInstance(writer, CopyImportWriter)
+        self.assertEqual(writer.batch_size, settings.IMPORT_BATCH_SIZE)
+
+    def test_benchmark_writes_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command(
+                "benchmark_imports",
+                rows=300,
+                products=20,
+                repeat=1,
+                output=output,
+                stdout=StringIO(),
+            )
+            with open(output) as results_file:
+                results = json.load(results_file)
+
+        self.assertEqual(
+            [row["case"] for row in results["results"]], ["bulk_create", "copy"]
+        )
+        self.assertTrue(all(row["rows_per_second"] > 0 for row in results["results"]))
+        # The rolled back runs leave nothing behind
+        self.assertFalse(Project.objects.filter(name="Import benchmark").exists())
+
+
+class ImportJobTests(TestCase):
+    """Tests for the background import jobs of confirmed files"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email="importer@test.com", name="Owner", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.rows = [
+            f"Product {i},1.00,1,0.50,,2024-01-01,2024-01-31" for i in range(5)
+        ]
+        self.file = File(project=self.project, name="statement.csv")
+        self.file.file.save("statement.csv", ContentFile(statement(self.rows)))
+
+    def confirm_mappings(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                f"/data_imports/files/{self.file.id}/confirm-mappings/",
+                {"mappings": SALE_MAPPINGS},
+                format="json",
+            )
+        return response, callbacks
+
+    def sales(self):
+        return ProductSale.objects.filter(from_file=self.file)
+
+    def test_confirming_mappings_queues_a_job(self):
+        response, callbacks = self.confirm_mappings()
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["job"]["status"], ImportJob.STATUS_QUEUED)
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(self.sales().exists())
+
+        # A file can only be imported by one job at a time
+        response, _ = self.confirm_mappings()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(IMPORT_JOB_CHUNK_ROWS=2)
+    def test_job_imports_in_chunks_and_notifies(self):
+        response, _ = self.confirm_mappings()
+        job = process_import_job(response.data["job"]["id"])
+
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual((job.rows_processed, job.rows_failed), (5, 0))
+        self.assertGreater(job.rows_per_second, 0)
+        self.assertEqual(self.sales().count(), 5)
+        self.file.refresh_from_db()
+        self.assertTrue(self.file.is_processed)
+        self.assertTrue(
+            ProductDailyRollup.objects.filter(product__project=self.project).exists()
+        )
+        notification = Notification.objects.get(user=self.user)
+        self.assertIn("completed: 5 rows, 0 failed", notification.title)
+
+        response = self.client.get(f"/data_imports/import-jobs/{job.id}/")
+        self.assertEqual(response.data["rows_processed"], 5)
+
+    @override_settings(IMPORT_JOB_CHUNK_ROWS=1000)
+    def test_failed_job_resumes_after_its_committed_chunks(self):
+        # The file is decoded ahead of the rows being read, the broken byte has
+        # to come well after the first chunk
+        rows = [f"Product {i},1.00,1,0.50,,2024-01-01,2024-01-31" for i in range(3000)]
+        self.file.column_mappings = SALE_MAPPINGS
+        self.file.file.save(
+            "statement.csv",
+            ContentFile(statement(rows[:2500]) + b"\nBroken \xff,1,1,1,,,"),
+        )
+        job = ImportJob.objects.create(file=self.file, created_by=self.user)
+
+        job = process_import_job(job.id)
+
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertEqual(job.rows_processed, 2000)
+        self.assertEqual(self.sales().count(), 2000)
+        self.assertIn("failed", Notification.objects.get(user=self.user).title)
+
+        self.file.file.save("statement.csv", ContentFile(statement(rows)))
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(f"/data_imports/import-jobs/{job.id}/resume/")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(callbacks), 1)
+
+        job = process_import_job(job.id)
+
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual(job.rows_processed, 3000)
+        self.assertEqual(self.sales().count(), 3000)
+        self.assertEqual(self.sales().values("product__title").distinct().count(), 3000)
+
+    def test_cancelled_job_is_not_processed(self):
+        response, _ = self.confirm_mappings()
+        job_id = response.data["job"]["id"]
+
+        response = self.client.post(f"/data_imports/import-jobs/{job_id}/cancel/")
+        self.assertEqual(response.data["status"], ImportJob.STATUS_CANCELLED)
+        job = process_import_job(job_id)
+
+        self.assertEqual(job.status, ImportJob.STATUS_CANCELLED)
+        self.assertFalse(self.sales().exists())
+        response = self.client.post(f"/data_imports/import-jobs/{job_id}/cancel/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_file_being_imported_is_not_deleted(self):
+        response, _ = self.confirm_mappings()
+        job_id = response.data["job"]["id"]
+
+        response = self.client.delete(f"/data_imports/files/{self.file.id}/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(File.objects.filter(id=self.file.id).exists())
+
+        self.client.post(f"/data_imports/import-jobs/{job_id}/cancel/")
+        response = self.client.delete(f"/data_imports/files/{self.file.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(ImportJob.objects.filter(id=job_id).exists())
+
+    def crash_after_first_chunk(self, job_id):
+        """Process the job on a worker lost while importing its second chunk"""
+        calls = []
+
+        def import_chunk(*args, **kwargs):
+            calls.append(args)
+            if len(calls) > 1:
+                raise SystemExit("Worker lost")
+            return update_products_with_mappings(*args, **kwargs)
+
+        with mock.patch(
+            "apps.data_imports.jobs.update_products_with_mappings", import_chunk
+        ):
+            with self.assertRaises(SystemExit):
+                process_import_job(job_id)
+
+    def make_stale(self, job_id):
+        ImportJob.objects.filter(id=job_id).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+    @override_settings(IMPORT_JOB_CHUNK_ROWS=2)
+    def test_job_of_a_lost_worker_is_taken_over_once_stale(self):
+        response, _ = self.confirm_mappings()
+        job_id = response.data["job"]["id"]
+        self.crash_after_first_chunk(job_id)
+
+        job = ImportJob.objects.get(id=job_id)
+        self.assertEqual(job.status, ImportJob.STATUS_RUNNING)
+        self.assertEqual(job.rows_processed, 2)
+        # Redelivered while the job may still be running elsewhere
+        self.assertEqual(process_import_job(job_id).status, ImportJob.STATUS_RUNNING)
+        response = self.client.post(f"/data_imports/import-jobs/{job_id}/resume/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response, _ = self.confirm_mappings()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.make_stale(job_id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(f"/data_imports/import-jobs/{job_id}/resume/")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(callbacks), 1)
+        job = process_import_job(job_id)
+
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual(job.rows_processed, 5)
+        self.assertEqual(self.sales().count(), 5)
+
+    @override_settings(IMPORT_JOB_CHUNK_ROWS=2)
+    def test_redelivered_task_takes_over_a_stale_job(self):
+        response, _ = self.confirm_mappings()
+        job_id = response.data["job"]["id"]
+        self.crash_after_first_chunk(job_id)
+        self.make_stale(job_id)
+
+        job = process_import_job(job_id)
+
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual(self.sales().count(), 5)
+        self.assertTrue(task_process_import_job.acks_late)
+        self.assertTrue(task_process_import_job.reject_on_worker_lost)
+
+    @override_settings(IMPORT_JOB_CHUNK_ROWS=2)
+    def test_stale_job_is_cancelled_right_away(self):
+        response, _ = self.confirm_mappings()
+        job_id = response.data["job"]["id"]
+        self.crash_after_first_chunk(job_id)
+        self.make_stale(job_id)
+
+        response = self.client.post(f"/data_imports/import-jobs/{job_id}/cancel/")
+
+        self.assertEqual(response.data["status"], ImportJob.STATUS_CANCELLED)
+        self.assertEqual(self.sales().count(), 2)
+        self.assertTrue(
+            ProductDailyRollup.objects.filter(product__project=self.project).exists()
+        )
+        response, _ = self.confirm_mappings()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_jobs_of_other_projects_are_not_found(self):
+        other_project = Project.objects.create(name="Other", description="")
+        other_file = File.objects.create(project=other_project, name="other.csv")
+        job = ImportJob.objects.create(file=other_file)
+
+        response = self.client.get(f"/data_imports/import-jobs/{job.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class UploadTests(TestCase):
+    """Tests for the resumable uploads of large files in parts"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        parts_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, parts_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, UPLOAD_PARTS_ROOT=parts_root, UPLOAD_PART_SIZE=100
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email="uploader@test.com", name="Owner", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        rows = [f"Product {i},1.00,1,0.50,,2024-01-01,2024-01-31" for i in range(10)]
+        self.content = statement(rows)
+        self.parts = [
+            self.content[start : start + 100]
+            for start in range(0, len(self.content), 100)
+        ]
+
+    def start_upload(self, checksum=None):
+        response = self.client.post(
+            "/data_imports/uploads/",
+            {
+                "name": "statement.csv",
+                "size": len(self.content),
+                "checksum": checksum or hashlib.sha256(self.content).hexdigest(),
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def put_part(self, upload_id, number, content, checksum=None):
+        headers = {"HTTP_X_CHECKSUM_SHA256": checksum} if checksum else {}
+        return self.client.put(
+            f"/data_imports/uploads/{upload_id}/parts/{number}/",
+            content,
+            content_type="application/octet-stream",
+            **headers,
+        )
+
+    def complete(self, upload_id, data=None):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                f"/data_imports/uploads/{upload_id}/complete/",
+                data or {},
+                format="json",
+            )
+        return response, callbacks
+
+    def test_upload_resumes_missing_parts_and_completes(self):
+        upload = self.start_upload()
+        self.assertEqual(upload["part_count"], len(self.parts))
+        self.assertEqual(upload["missing_parts"], list(range(1, len(self.parts) + 1)))
+
+        for number, part in enumerate(self.parts[:-1], start=1):
+            response = self.put_part(upload["id"], number, part)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response, _ = self.complete(upload["id"])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f"/data_imports/uploads/{upload['id']}/")
+        self.assertEqual(response.data["missing_parts"], [len(self.parts)])
+
+        self.put_part(upload["id"], len(self.parts), self.parts[-1])
+        response, _ = self.complete(upload["id"])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data["requires_mapping"])
+        self.assertEqual(response.data["csv_headers"][0], "Title")
+        file = File.objects.get(id=response.data["file"]["id"])
+        with file.file.open("rb") as file_handle:
+            self.assertEqual(file_handle.read(), self.content)
+        self.assertFalse(
+            os.path.exists(os.path.join(settings.UPLOAD_PARTS_ROOT, str(upload["id"])))
+        )
+
+    def test_rejected_parts_are_not_stored(self):
+        upload = self.start_upload()
+
+        response = self.put_part(upload["id"], 1, self.parts[0][:50])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.put_part(upload["id"], 1, self.parts[0], checksum="0" * 64)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.put_part(upload["id"], len(self.parts) + 1, b"x")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f"/data_imports/uploads/{upload['id']}/")
+        self.assertIn(1, response.data["missing_parts"])
+
+        response = self.put_part(
+            upload["id"], 1, self.parts[0], hashlib.sha256(self.parts[0]).hexdigest()
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f"/data_imports/uploads/{upload['id']}/")
+        self.assertNotIn(1, response.data["missing_parts"])
+
+    def test_file_not_matching_its_checksum_is_not_kept(self):
+        upload = self.start_upload(checksum="a" * 64)
+        for number, part in enumerate(self.parts, start=1):
+            self.put_part(upload["id"], number, part)
+
+        response, _ = self.complete(upload["id"])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(File.objects.filter(project=self.project).exists())
+        self.assertFalse(any(files for _, _, files in os.walk(settings.MEDIA_ROOT)))
+
+    def test_completing_with_mappings_queues_the_import(self):
+        upload = self.start_upload()
+        for number, part in enumerate(self.parts, start=1):
+            self.put_part(upload["id"], number, part)
+
+        response, callbacks = self.complete(upload["id"], {"mappings": SALE_MAPPINGS})
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(callbacks), 1)
+        job = process_import_job(response.data["job"]["id"])
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual(
+            ProductSale.objects.filter(from_file_id=response.data["file"]["id"]).count(),
+            10,
+        )
+
+    def test_upload_is_completed_once(self):
+        upload_id = self.start_upload()["id"]
+        for number, part in enumerate(self.parts, start=1):
+            self.put_part(upload_id, number, part)
+        # As read by a concurrent request before the first one completed
+        upload = Upload.objects.get(id=upload_id)
+
+        response, _ = self.complete(upload_id)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertRaisesMessage(ValueError, "already complete"):
+            complete_upload(upload)
+        self.assertEqual(File.objects.filter(project=self.project).count(), 1)
+
+    def test_aborted_upload_is_removed_with_its_parts(self):
+        upload = self.start_upload()
+        self.put_part(upload["id"], 1, self.parts[0])
+
+        response = self.client.delete(f"/data_imports/uploads/{upload['id']}/")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Upload.objects.filter(id=upload["id"]).exists())
+        self.assertEqual(os.listdir(settings.UPLOAD_PARTS_ROOT), [])
+
+    def test_upload_of_an_existing_file_name_is_refused(self):
+        File.objects.create(project=self.project, name="statement.csv")
+
+        response = self.client.post(
+            "/data_imports/uploads/",
+            {
+                "name": "statement.csv",
+                "size": len(self.content),
+                "checksum": hashlib.sha256(self.content).hexdigest(),
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,184 @@
+"""
+Resumable uploads of large statements in parts.
+
+An upload is started with the file's name, size and SHA-256, and the server
+answers with the part size. Every part is streamed from the request body to
+its own file under UPLOAD_PARTS_ROOT, replacing an earlier copy of the part,
+so a client resumes by sending the parts the upload doesn't list yet. On
+completion the parts are streamed in order into the File's storage through
+one reader that hashes them on the way, and the checksum of the whole file is
+verified before the File is kept and the parts removed.
+"""
+
+import hashlib
+import io
+import math
+import os
+import shutil
+from typing import BinaryIO, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.db import transaction
+
+from .models import File, Upload, UploadPart
+
+# Bytes read from the request or a part at a time
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def part_count(upload: Upload) -> int:
+    return math.ceil(upload.size / upload.part_size)
+
+
+def expected_part_size(upload: Upload, number: int) -> int:
+    return min(upload.part_size, upload.size - (number - 1) * upload.part_size)
+
+
+def parts_directory(upload: Upload) -> str:
+    return os.path.join(settings.UPLOAD_PARTS_ROOT, str(upload.id))
+
+
+def part_path(upload: Upload, number: int) -> str:
+    return os.path.join(parts_directory(upload), f"{number:06d}")
+
+
+def missing_parts(upload: Upload) -> List[int]:
+    received = set(upload.parts.values_list("number", flat=True))
+    return [
+        number for number in range(1, part_count(upload) + 1) if number not in received
+    ]
+
+
+def start_upload(project_id: int, user, name: str, size: int, checksum: str) -> Upload:
+    if File.objects.filter(name=name, project_id=project_id).exists():
+        raise ValueError("A file with this name already exists")
+    return Upload.objects.create(
+        project_id=project_id,
+        created_by=user,
+        name=name,
+        size=size,
+        part_size=settings.UPLOAD_PART_SIZE,
+        checksum=checksum.lower(),
+    )
+
+
+def store_upload_part(
+    upload: Upload, number: int, stream: BinaryIO, checksum: Optional[str] = None
+) -> UploadPart:
+    """
+    Write a part from the stream to disk, checking its size and, if given, its
+    SHA-256. A rejected part leaves an earlier copy of it in place.
+    """
+    if upload.status != Upload.STATUS_UPLOADING:
+        raise ValueError("This upload is already complete")
+    if not 1 <= number <= part_count(upload):
+        raise ValueError(f"Part numbers go from 1 to {part_count(upload)}")
+
+    expected_size = expected_part_size(upload, number)
+    path = part_path(upload, number)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with open(f"{path}.partial", "wb") as part_file:
+        while chunk := stream.read(COPY_CHUNK_SIZE):
+            size += len(chunk)
+            if size > expected_size:
+                break
+            digest.update(chunk)
+            part_file.write(chunk)
+
+    error = None
+    if size != expected_size:
+        error = f"Part {number} must be {expected_size} bytes"
+    elif checksum and checksum.lower() != digest.hexdigest():
+        error = f"Part {number} doesn't match its checksum"
+    if error:
+        os.remove(f"{path}.partial")
+        raise ValueError(error)
+
+    os.replace(f"{path}.partial", path)
+    part, _ = UploadPart.objects.update_or_create(
+        upload=upload,
+        number=number,
+        defaults={"size": size, "checksum": digest.hexdigest()},
+    )
+    return part
+
+
+class PartsReader(io.RawIOBase):
+    """Reads the parts of an upload one after the other, hashing what it reads."""
+
+    def __init__(self, paths: Iterator[str]):
+        self.paths = paths
+        self.current = None
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while True:
+            if self.current is None:
+                path = next(self.paths, None)
+                if path is None:
+                    return 0
+                self.current = open(path, "rb")
+            read = self.current.readinto(buffer)
+            if read:
+                self.digest.update(memoryview(buffer)[:read])
+                self.size += read
+                return read
+            self.current.close()
+            self.current = None
+
+    def close(self) -> None:
+        if self.current is not None:
+            self.current.close()
+        super().close()
+
+
+def complete_upload(upload: Upload) -> File:
+    """
+    Assemble the parts into a File of the upload's project once all of them
+    arrived and the whole file matches the upload's checksum. The upload is
+    locked meanwhile, so it is only ever assembled once.
+    """
+    with transaction.atomic():
+        upload = Upload.objects.select_for_update().get(id=upload.id)
+        if upload.status != Upload.STATUS_UPLOADING:
+            raise ValueError("This upload is already complete")
+        missing = missing_parts(upload)
+        if missing:
+            raise ValueError(
+                f"Missing parts: {', '.join(str(number) for number in missing[:20])}"
+            )
+
+        paths = (
+            part_path(upload, number) for number in range(1, part_count(upload) + 1)
+        )
+        file = File(project_id=upload.project_id, name=upload.name)
+        with PartsReader(paths) as parts:
+            content = DjangoFile(io.BufferedReader(parts, COPY_CHUNK_SIZE))
+            file.file.save(upload.name, content, save=False)
+        if parts.digest.hexdigest() != upload.checksum:
+            file.file.delete(save=False)
+            raise ValueError("The uploaded file doesn't match its checksum")
+        file.save()
+
+        upload.file = file
+        upload.status = Upload.STATUS_COMPLETED
+        upload.save()
+
+    shutil.rmtree(parts_directory(upload), ignore_errors=True)
+    return file
+
+
+def abort_upload(upload: Upload) -> None:
+    with transaction.atomic():
+        # Waits for a completion still reading the parts
+        locked = Upload.objects.select_for_update().filter(id=upload.id).first()
+        if locked:
+            locked.delete()
+    shutil.rmtree(parts_directory(upload), ignore_errors=True)
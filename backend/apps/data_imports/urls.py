@@ -1,10 +1,49 @@
 from django.urls import path
 
-from .views import FileDetailView, FileListCreateView, ColumnMappingView, ExpectedFieldsView
+from .views import (
+    ColumnMappingView,
+    ExpectedFieldsView,
+    FileDetailView,
+    FileListCreateView,
+    ImportJobCancelView,
+    ImportJobDetailView,
+    ImportJobResumeView,
+    UploadCompleteView,
+    UploadCreateView,
+    UploadDetailView,
+    UploadPartView,
+)
 
 urlpatterns = [
     path("files/", FileListCreateView.as_view(), name="file-list-create"),
     path("files/<int:pk>/", FileDetailView.as_view(), name="file-detail"),
     path("files/<int:file_id>/confirm-mappings/", ColumnMappingView.as_view(), name="confirm-column-mappings"),
+    path(
+        "import-jobs/<int:pk>/",
+        ImportJobDetailView.as_view(),
+        name="import-job-detail",
+    ),
+    path(
+        "import-jobs/<int:pk>/cancel/",
+        ImportJobCancelView.as_view(),
+        name="import-job-cancel",
+    ),
+    path(
+        "import-jobs/<int:pk>/resume/",
+        ImportJobResumeView.as_view(),
+        name="import-job-resume",
+    ),
+    path("uploads/", UploadCreateView.as_view(), name="upload-create"),
+    path("uploads/<int:pk>/", UploadDetailView.as_view(), name="upload-detail"),
+    path(
+        "uploads/<int:pk>/parts/<int:number>/",
+        UploadPartView.as_view(),
+        name="upload-part",
+    ),
+    path(
+        "uploads/<int:pk>/complete/",
+        UploadCompleteView.as_view(),
+        name="upload-complete",
+    ),
     path("expected-fields/", ExpectedFieldsView.as_view(), name="expected-fields"),
 ]
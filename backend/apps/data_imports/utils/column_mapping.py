@@ -1,7 +1,7 @@
-import csv
-import io
-from typing import Dict, List, BinaryIO
 from difflib import SequenceMatcher
+from typing import BinaryIO, Dict, List
+
+from .csv_stream import read_csv_sample
 
 
 def get_expected_fields():
@@ -71,25 +71,11 @@ def detect_column_mappings(csv_headers: List[str]) -> Dict[str, str]:
 
 def get_csv_headers(file: BinaryIO) -> List[str]:
     """Extract headers from CSV file"""
-    file.seek(0)
-    decoded_file = io.StringIO(file.read().decode("utf-8"))
-    file.seek(0)
-    reader = csv.reader(decoded_file)
-    headers = next(reader, [])
+    headers, _ = read_csv_sample(file, max_rows=0)
     return headers
 
 
 def get_csv_preview(file: BinaryIO, max_rows: int = 5) -> List[Dict[str, str]]:
     """Get a preview of CSV data"""
-    file.seek(0)
-    decoded_file = io.StringIO(file.read().decode("utf-8"))
-    file.seek(0)
-    reader = csv.DictReader(decoded_file)
-    
-    preview_data = []
-    for i, row in enumerate(reader):
-        if i >= max_rows:
-            break
-        preview_data.append(row)
-    
+    _, preview_data = read_csv_sample(file, max_rows)
     return preview_data
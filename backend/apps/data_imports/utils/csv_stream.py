@@ -0,0 +1,56 @@
+"""
+Streaming CSV reading for imports.
+
+Uploads are decoded incrementally through an io.TextIOWrapper over the stored
+file and parsed row by row, so a statement is read once, in small chunks, and
+never held in memory as a whole. Readers rewind the file when they are done
+and leave it open for the next stage.
+"""
+
+import csv
+import io
+from contextlib import contextmanager
+from itertools import islice
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple, TypeVar
+
+CSV_BATCH_SIZE = 1000
+
+T = TypeVar("T")
+
+
+@contextmanager
+def open_csv(file: BinaryIO) -> Iterator[csv.DictReader]:
+    """A DictReader over the file from its start, skipping a UTF-8 BOM."""
+    file.seek(0)
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        yield csv.DictReader(text)
+    finally:
+        # Detaching keeps the wrapper from closing the file with it
+        text.detach()
+        file.seek(0)
+
+
+def iter_csv_rows(file: BinaryIO) -> Iterator[Dict[str, str]]:
+    """The rows of the file as dictionaries keyed by its headers."""
+    with open_csv(file) as reader:
+        yield from reader
+
+
+def iter_batches(
+    items: Iterable[T], batch_size: int = CSV_BATCH_SIZE
+) -> Iterator[List[T]]:
+    """Lists of up to batch_size consecutive items."""
+    items = iter(items)
+    while batch := list(islice(items, batch_size)):
+        yield batch
+
+
+def read_csv_sample(
+    file: BinaryIO, max_rows: int = 5
+) -> Tuple[List[str], List[Dict[str, str]]]:
+    """The headers and first max_rows rows of the file, reading no further."""
+    with open_csv(file) as reader:
+        headers = list(reader.fieldnames or [])
+        rows = list(islice(reader, max_rows))
+    return headers, rows
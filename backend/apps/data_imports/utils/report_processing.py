@@ -1,18 +1,19 @@
-import csv
-import io
 from decimal import Decimal
-from typing import Any, BinaryIO, Dict, List
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, Type
+
+from django.db import transaction
 
 from apps.product.models import Product, ProductImpressions, ProductSale
+from apps.product.services import refresh_file_rollups
+
+from .csv_stream import iter_batches, iter_csv_rows, read_csv_sample
+from .writers import BulkImportWriter, get_import_writer
 
 
 def validate_csv(file: BinaryIO) -> bool:
     """Validates if the uploaded file is a valid CSV."""
     try:
-        decoded_file = io.StringIO(file.read().decode("utf-8"))
-        file.seek(0)
-        reader = csv.reader(decoded_file)
-        headers = next(reader, None)
+        headers, _ = read_csv_sample(file, max_rows=0)
         if not headers:
             return False
         return True
@@ -21,14 +22,9 @@ def validate_csv(file: BinaryIO) -> bool:
         return False
 
 
-def read_csv(file: BinaryIO) -> List[Dict[str, str]]:
-    """Reads a CSV file and returns its content as a list of dictionaries."""
-    file.seek(0)  # Ensure the file pointer is at the beginning
-    decoded_file = io.StringIO(file.read().decode("utf-8"))
-    reader = csv.DictReader(decoded_file)
-
-    data = [row for row in reader]
-    return data
+def read_csv(file: BinaryIO) -> Iterator[Dict[str, str]]:
+    """Streams the rows of a CSV file as dictionaries."""
+    return iter_csv_rows(file)
 
 
 def process_report_with_mappings(file_obj) -> Dict[str, str]:
@@ -41,8 +37,11 @@ def process_report_with_mappings(file_obj) -> Dict[str, str]:
 
             data = read_csv(file_handle)
             mappings = file_obj.column_mappings or {}
-            
-            result = update_products_with_mappings(data, file_obj.project_id, file_obj.id, mappings)
+
+            result = update_products_with_mappings(
+                data, file_obj.project_id, file_obj.id, mappings
+            )
+            refresh_file_rollups(file_obj.id)
 
             return {
                 "status": "success",
@@ -53,43 +52,84 @@ def process_report_with_mappings(file_obj) -> Dict[str, str]:
         return {"status": "error", "message": str(e)}
 
 
-def update_products_with_mappings(
-    data: List[Dict[str, str]], project_id: int, file_id: int, mappings: Dict[str, str]
-) -> Dict[str, int]:
-    """Updates products based on CSV data using column mappings and returns a summary."""
-    updated_count = 0
-
-    # Get the mapped column name for title
+def parse_rows_with_mappings(
+    data: Iterable[Dict[str, str]], mappings: Dict[str, str]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Typed records of the CSV rows that have a title: the title, the field
+    values of the row's sale and impressions, None when it has none, and how
+    many of them failed to parse.
+    """
     title_column = mappings.get('title')
-    if not title_column:
-        return {"updated": 0}
-
     for row in data:
         title = row.get(title_column)
         if not title:
             continue
 
-        product = Product.objects.filter(title=title, project_id=project_id).first()
-        if not product:
-            product = Product.objects.create(title=title, project_id=project_id)
-
         # Check if this row contains sales data
+        sale = None
+        failed = 0
         unit_price_column = mappings.get('unit_price')
         if unit_price_column and row.get(unit_price_column):
-            store_product_sales_with_mappings(row, product, file_id, mappings)
+            sale = parse_product_sales_with_mappings(row, mappings)
+            failed += sale is None
 
         # Check if this row contains impressions data
+        impressions = None
         impressions_column = mappings.get('impressions')
         if impressions_column and row.get(impressions_column):
-            store_product_impressions_with_mappings(row, product, file_id, mappings)
-
-        updated_count += 1
+            impressions = parse_product_impressions_with_mappings(row, mappings)
+            failed += impressions is None
+
+        yield {
+            "title": title,
+            "sale": sale,
+            "impressions": impressions,
+            "failed": failed,
+        }
 
-    return {"updated": updated_count}
 
+def update_products_with_mappings(
+    data: Iterable[Dict[str, str]],
+    project_id: int,
+    file_id: int,
+    mappings: Dict[str, str],
+    batch_size: Optional[int] = None,
+    writer_class: Optional[Type[BulkImportWriter]] = None,
+) -> Dict[str, int]:
+    """
+    Updates products based on CSV data using column mappings and returns a
+    summary, with the number of sales and impressions that failed. The rows
+    are consumed in batches as they are read and stored by the writer for the
+    database (or writer_class), all in one transaction:
+    rows are decoded as they are stored, so a decoding error late in the file
+    must undo the rows stored before it.
+    """
+    updated_count = 0
 
-def store_product_sales_with_mappings(row: Dict[str, Any], product: Product, file_id: int, mappings: Dict[str, str]) -> None:
-    """Store product sales using column mappings"""
+    # Get the mapped column name for title
+    if not mappings.get('title'):
+        return {"updated": 0, "failed": 0}
+
+    with transaction.atomic():
+        if writer_class:
+            writer = writer_class(project_id, file_id, batch_size)
+        else:
+            writer = get_import_writer(project_id, file_id, batch_size)
+        for batch in iter_batches(
+            parse_rows_with_mappings(data, mappings), writer.batch_size
+        ):
+            writer.add(batch)
+            updated_count += len(batch)
+        writer.flush()
+
+    return {"updated": updated_count, "failed": writer.failed}
+
+
+def parse_product_sales_with_mappings(
+    row: Dict[str, Any], mappings: Dict[str, str]
+) -> Optional[Dict[str, Any]]:
+    """ProductSale field values of a row using column mappings"""
     try:
         # Get values using mappings
         unit_price = row.get(mappings.get('unit_price', ''))
@@ -104,29 +144,30 @@ def store_product_sales_with_mappings(row: Dict[str, Any], product: Product, fil
 
         # Convert and validate data
         if not unit_price:
-            return
+            return None
 
-        ProductSale.objects.create(
-            product=product,
-            type=consumption_type.lower() if consumption_type else 'purchase',
-            unit_price=Decimal(str(unit_price)),
-            unit_price_currency=unit_price_currency,
-            quantity=int(float(quantity)) if quantity else 1,
-            is_refund=is_refund_str.lower() in ['yes', 'true', '1'],
-            royalty_amount=Decimal(str(royalty_amount)) if royalty_amount else Decimal('0'),
-            royalty_currency=royalty_currency,
-            period_start=period_start if period_start else None,
-            period_end=period_end if period_end else None,
-            from_file_id=file_id,
-        )
+        return {
+            "type": consumption_type.lower() if consumption_type else 'purchase',
+            "unit_price": Decimal(str(unit_price)),
+            "unit_price_currency": unit_price_currency,
+            "quantity": int(float(quantity)) if quantity else 1,
+            "is_refund": is_refund_str.lower() in ['yes', 'true', '1'],
+            "royalty_amount": (
+                Decimal(str(royalty_amount)) if royalty_amount else Decimal('0')
+            ),
+            "royalty_currency": royalty_currency,
+            "period_start": period_start if period_start else None,
+            "period_end": period_end if period_end else None,
+        }
     except Exception as e:
-        print(f"Error storing product sales: {e}", flush=True)
+        print(f"Error parsing product sales: {e}", flush=True)
+        return None
 
 
-def store_product_impressions_with_mappings(
-    row: Dict[str, Any], product: Product, file_id: int, mappings: Dict[str, str]
-) -> None:
-    """Store product impressions using column mappings"""
+def parse_product_impressions_with_mappings(
+    row: Dict[str, Any], mappings: Dict[str, str]
+) -> Optional[Dict[str, Any]]:
+    """ProductImpressions field values of a row using column mappings"""
     try:
         # Get values using mappings
         impressions = row.get(mappings.get('impressions', ''))
@@ -135,18 +176,17 @@ def store_product_impressions_with_mappings(
         period_end = row.get(mappings.get('period_end', ''))
 
         if not impressions:
-            return
+            return None
 
-        ProductImpressions.objects.create(
-            product=product,
-            impressions=int(float(impressions)) if impressions else 0,
-            ecpm=Decimal(str(ecpm)) if ecpm else None,
-            period_start=period_start if period_start else None,
-            period_end=period_end if period_end else None,
-            from_file_id=file_id,
-        )
+        return {
+            "impressions": int(float(impressions)) if impressions else 0,
+            "ecpm": Decimal(str(ecpm)) if ecpm else None,
+            "period_start": period_start if period_start else None,
+            "period_end": period_end if period_end else None,
+        }
     except Exception as e:
-        print(f"Error storing product impressions: {e}", flush=True)
+        print(f"Error parsing product impressions: {e}", flush=True)
+        return None
 
 
 # Legacy functions for backward compatibility (if needed)
@@ -158,6 +198,7 @@ def process_report(file: BinaryIO, project_id: int, file_id: int) -> Dict[str, s
 
         data = read_csv(file)
         result = update_products(data, project_id, file_id)
+        refresh_file_rollups(file_id)
 
         return {
             "status": "success",
@@ -168,7 +209,7 @@ def process_report(file: BinaryIO, project_id: int, file_id: int) -> Dict[str, s
 
 
 def update_products(
-    data: List[Dict[str, str]], project_id: int, file_id: int
+    data: Iterable[Dict[str, str]], project_id: int, file_id: int
 ) -> Dict[str, int]:
     """Legacy function - updates products based on CSV data with hardcoded column names."""
     updated_count = 0
@@ -0,0 +1,224 @@
+"""
+Storage of the parsed rows of a statement import.
+
+BulkImportWriter inserts sales and impressions with bulk_create. On PostgreSQL
+CopyImportWriter streams them with COPY FROM STDIN into temporary staging
+tables keyed by product title instead, and merges each staged batch into
+product_sale and product_impressions with one INSERT ... SELECT that resolves
+the titles to product ids, skipping the statement parsing and parameter
+handling of large multi-row INSERTs. get_import_writer picks the writer for
+the database in use.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from apps.product.models import Product, ProductImpressions, ProductSale
+
+from .csv_stream import iter_batches
+
+# Columns of the fact tables filled from the parsed rows
+STAGED_COLUMNS = {
+    ProductSale: (
+        "type",
+        "unit_price",
+        "unit_price_currency",
+        "quantity",
+        "is_refund",
+        "royalty_amount",
+        "royalty_currency",
+        "period_start",
+        "period_end",
+    ),
+    ProductImpressions: ("impressions", "ecpm", "period_start", "period_end"),
+}
+
+# The staging table takes the column types of the fact table, and is dropped
+# with the import's transaction
+CREATE_STAGING_SQL = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS
+    SELECT ''::varchar(255) AS title, {columns} FROM {table} WITH NO DATA
+"""
+
+COPY_STAGING_SQL = "COPY {staging} (title, {columns}) FROM STDIN"
+
+# Rows of duplicate titles go to the oldest product, like in BulkImportWriter
+MERGE_STAGING_SQL = """
+    INSERT INTO {table} (
+        product_id, from_file_id, {columns}, created_at, updated_at, is_deleted
+    )
+    SELECT product.id, %s, {staged_columns}, now(), now(), false
+    FROM {staging} staged
+    JOIN (
+        SELECT title, MIN(id) AS id
+        FROM product
+        WHERE project_id = %s
+        GROUP BY title
+    ) product ON product.title = staged.title
+"""
+
+
+class BulkImportWriter:
+    """
+    Stores the parsed rows of an import with bulk inserts. Products are looked
+    up in a title to id map of the project loaded once, missing ones created
+    per batch of rows, and sales and impressions buffered and inserted
+    batch_size at a time.
+    """
+
+    def __init__(self, project_id: int, file_id: int, batch_size: Optional[int] = None):
+        self.project_id = project_id
+        self.file_id = file_id
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.product_ids: Dict[str, int] = {}
+        # Rows of duplicate titles go to the oldest product, as they always have
+        for product_id, title in (
+            Product.objects.filter(project_id=project_id)
+            .order_by("id")
+            .values_list("id", "title")
+        ):
+            self.product_ids.setdefault(title, product_id)
+        self.sales: List = []
+        self.impressions: List = []
+        # Sales and impressions that failed to parse or to be stored
+        self.failed = 0
+
+    def add(self, records: List[Dict[str, Any]]) -> None:
+        self.create_missing_products(record["title"] for record in records)
+        for record in records:
+            self.failed += record["failed"]
+            if record["sale"]:
+                self.sales.append(
+                    self.build(ProductSale, record["title"], record["sale"])
+                )
+            if record["impressions"]:
+                self.impressions.append(
+                    self.build(
+                        ProductImpressions, record["title"], record["impressions"]
+                    )
+                )
+        if len(self.sales) >= self.batch_size:
+            self.sales = self.insert(ProductSale, self.sales)
+        if len(self.impressions) >= self.batch_size:
+            self.impressions = self.insert(ProductImpressions, self.impressions)
+
+    def flush(self) -> None:
+        self.sales = self.insert(ProductSale, self.sales)
+        self.impressions = self.insert(ProductImpressions, self.impressions)
+
+    def create_missing_products(self, titles: Iterable[str]) -> None:
+        missing = [
+            title for title in dict.fromkeys(titles) if title not in self.product_ids
+        ]
+        if not missing:
+            return
+        products = Product.objects.bulk_create(
+            [Product(title=title, project_id=self.project_id) for title in missing]
+        )
+        for product in products:
+            self.product_ids[product.title] = product.id
+
+    def build(self, model, title: str, values: Dict[str, Any]):
+        """The buffered form of a row of the model."""
+        return model(
+            product_id=self.product_ids[title], from_file_id=self.file_id, **values
+        )
+
+    def insert(self, model, objects: List) -> List:
+        """
+        Insert the objects batch_size at a time. A batch the database rejects
+        is inserted one by one instead, skipping the rejected rows. Returns the
+        emptied buffer.
+        """
+        for batch in iter_batches(objects, self.batch_size):
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+            except Exception as e:
+                print(f"Error storing {model._meta.db_table} batch: {e}", flush=True)
+                for obj in batch:
+                    try:
+                        with transaction.atomic():
+                            obj.save()
+                    except Exception as e:
+                        print(f"Error storing {model._meta.db_table}: {e}", flush=True)
+                        self.failed += 1
+        return []
+
+
+class CopyImportWriter(BulkImportWriter):
+    """
+    Stores the parsed rows of an import through COPY and a staging table per
+    fact table, on PostgreSQL only. A batch that fails to copy or merge is
+    stored by BulkImportWriter instead, which skips the rejected rows.
+    """
+
+    def __init__(self, project_id: int, file_id: int, batch_size: Optional[int] = None):
+        super().__init__(
+            project_id, file_id, batch_size or settings.IMPORT_COPY_BATCH_SIZE
+        )
+
+    def build(self, model, title: str, values: Dict[str, Any]) -> Tuple:
+        return title, values
+
+    def insert(self, model, rows: List[Tuple]) -> List:
+        for batch in iter_batches(rows, self.batch_size):
+            try:
+                with transaction.atomic():
+                    self.copy(model, batch)
+            except Exception as e:
+                print(f"Error copying {model._meta.db_table} batch: {e}", flush=True)
+                super().insert(
+                    model,
+                    [
+                        BulkImportWriter.build(self, model, title, values)
+                        for title, values in batch
+                    ],
+                )
+        return []
+
+    def copy(self, model, rows: List[Tuple]) -> None:
+        table = model._meta.db_table
+        staging = f"import_{table}"
+        columns = STAGED_COLUMNS[model]
+        # Converted like the ORM does, e.g. naive datetimes made aware
+        fields = [model._meta.get_field(column) for column in columns]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                CREATE_STAGING_SQL.format(
+                    staging=staging, table=table, columns=", ".join(columns)
+                )
+            )
+            with cursor.copy(
+                COPY_STAGING_SQL.format(staging=staging, columns=", ".join(columns))
+            ) as copy:
+                for title, values in rows:
+                    copy.write_row(
+                        [title]
+                        + [
+                            field.get_db_prep_save(values[field.name], connection)
+                            for field in fields
+                        ]
+                    )
+            cursor.execute(
+                MERGE_STAGING_SQL.format(
+                    table=table,
+                    staging=staging,
+                    columns=", ".join(columns),
+                    staged_columns=", ".join(f"staged.{column}" for column in columns),
+                ),
+                [self.file_id, self.project_id],
+            )
+            cursor.execute(f"TRUNCATE {staging}")
+
+
+def get_import_writer(
+    project_id: int, file_id: int, batch_size: Optional[int] = None
+) -> BulkImportWriter:
+    """The fastest writer the database supports."""
+    if connection.vendor == "postgresql" and settings.IMPORT_USE_COPY:
+        return CopyImportWriter(project_id, file_id, batch_size)
+    return BulkImportWriter(project_id, file_id, batch_size)
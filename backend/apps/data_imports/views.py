@@ -1,3 +1,5 @@
+import io
+
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.parsers import FormParser, MultiPartParser
@@ -7,9 +9,21 @@ from rest_framework.views import APIView
 
 from apps.project.models import ProjectUser
 
-from .models import File
-from .serializers import FileSerializer
-from .services import confirm_column_mappings, create_file, delete_file
+from .jobs import cancel_import_job, resume_import_job
+from .models import File, ImportJob, Upload
+from .serializers import (
+    FileSerializer,
+    ImportJobSerializer,
+    UploadCreateSerializer,
+    UploadSerializer,
+)
+from .services import (
+    complete_file_upload,
+    confirm_column_mappings,
+    create_file,
+    delete_file,
+)
+from .uploads import abort_upload, start_upload, store_upload_part
 from .utils.column_mapping import get_expected_fields
 
 
@@ -97,7 +111,10 @@ class FileDetailView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        response_data = delete_file(pk)
+        try:
+            response_data = delete_file(pk)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(response_data, status=status.HTTP_200_OK)
 
 
@@ -105,7 +122,7 @@ class ColumnMappingView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, file_id):
-        """Confirm column mappings and process the file"""
+        """Confirm column mappings and queue the import of the file"""
         project_id = request.user.currently_selected_project_id
 
         # Check if user is owner of the project
@@ -118,8 +135,8 @@ class ColumnMappingView(APIView):
         mappings = request.data.get("mappings", {})
 
         try:
-            response_data = confirm_column_mappings(file_id, mappings)
-            return Response(response_data, status=status.HTTP_200_OK)
+            response_data = confirm_column_mappings(file_id, mappings, request.user)
+            return Response(response_data, status=status.HTTP_202_ACCEPTED)
 
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -131,6 +148,187 @@ class ColumnMappingView(APIView):
             )
 
 
+class ImportJobDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """Poll the progress of an import job"""
+        project_id = request.user.currently_selected_project_id
+
+        # Check if user is owner of the project
+        if not check_user_is_owner(request.user, project_id):
+            return Response(
+                {"error": "Only project owners can access manual import jobs."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        job = get_object_or_404(ImportJob, pk=pk, file__project_id=project_id)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class ImportJobCancelView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        """Cancel an import job, keeping the rows it already committed"""
+        project_id = request.user.currently_selected_project_id
+
+        # Check if user is owner of the project
+        if not check_user_is_owner(request.user, project_id):
+            return Response(
+                {"error": "Only project owners can cancel manual import jobs."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        job = get_object_or_404(ImportJob, pk=pk, file__project_id=project_id)
+        try:
+            job = cancel_import_job(job)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class ImportJobResumeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        """Resume a failed or cancelled import job from its last committed chunk"""
+        project_id = request.user.currently_selected_project_id
+
+        # Check if user is owner of the project
+        if not check_user_is_owner(request.user, project_id):
+            return Response(
+                {"error": "Only project owners can resume manual import jobs."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        job = get_object_or_404(ImportJob, pk=pk, file__project_id=project_id)
+        try:
+            job = resume_import_job(job)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class UploadCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Start a resumable upload of a large file, sent in parts"""
+        project_id = request.user.currently_selected_project_id
+
+        # Check if user is owner of the project
+        if not check_user_is_owner(request.user, project_id):
+            return Response(
+                {"error": "Only project owners can upload files manually."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        serializer = UploadCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = start_upload(project_id, request.user, **serializer.validated_data)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(UploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+class UploadDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """Get an upload with the parts it still misses"""
+        project_id = request.user.currently_selected_project_id
+
+        # Check if user is owner of the project
+        if not check_user_is_owner(request.user, project_id):
+            return Response(
+                {"error": "Only project owners can upload files manually."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        upload = get_object_or_404(Upload, pk=pk, project_id=project_id)
+        return Response(UploadSerializer(upload).data, status=status.HTTP_200_OK)
+
+    def delete(self, request, pk):
+        """Abort an upload and remove its parts"""
+        project_id = request.user.currently_selected_project_id
+
+        # Check if user is owner of the project
+        if not check_user_is_owner(request.user, project_id):
+            return Response(
+                {"error": "Only project owners can upload files manually."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        upload = get_object_or_404(Upload, pk=pk, project_id=project_id)
+        abort_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadPartView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, pk, number):
+        """
+        Store a part of an upload from the raw request body, optionally checked
+        against the SHA-256 in the X-Checksum-SHA256 header
+        """
+        project_id = request.user.currently_selected_project_id
+
+        # Check if user is owner of the project
+        if not check_user_is_owner(request.user, project_id):
+            return Response(
+                {"error": "Only project owners can upload files manually."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        upload = get_object_or_404(Upload, pk=pk, project_id=project_id)
+        # Read as it arrives, never through the parsers
+        stream = request.stream or io.BytesIO()
+        try:
+            part = store_upload_part(
+                upload, number, stream, request.headers.get("X-Checksum-SHA256")
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"number": part.number, "size": part.size, "checksum": part.checksum},
+            status=status.HTTP_200_OK,
+        )
+
+
+class UploadCompleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        """
+        Assemble an upload into a file. Given column mappings, the file's
+        import is queued right away
+        """
+        project_id = request.user.currently_selected_project_id
+
+        # Check if user is owner of the project
+        if not check_user_is_owner(request.user, project_id):
+            return Response(
+                {"error": "Only project owners can upload files manually."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        upload = get_object_or_404(Upload, pk=pk, project_id=project_id)
+        try:
+            response_data = complete_file_upload(
+                upload, request.data.get("mappings"), request.user
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if "job" in response_data:
+            return Response(response_data, status=status.HTTP_202_ACCEPTED)
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+
 class ExpectedFieldsView(APIView):
     permission_classes = [IsAuthenticated]
 
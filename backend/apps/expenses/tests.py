@@ -300,6 +300,17 @@ class ExpenseViewTests(TestCase):
         self.assertIn(self.owner.id, user_ids)
         self.assertIn(self.producer.id, user_ids)
 
+    def test_project_members_include_earnings(self):
+        """Test that every member is listed with their expense-based earnings"""
+        self.client.force_authenticate(user=self.owner)
+
+        response = self.client.get(self.members_url)
+
+        earnings = {member["id"]: member["earnings"] for member in response.data}
+        self.assertEqual(earnings[self.producer.id]["total_earnings"], 100.0)
+        self.assertEqual(earnings[self.producer.id]["expense_count"], 1)
+        self.assertFalse(earnings[self.owner.id]["has_expenses"])
+
     def test_get_project_products_as_owner(self):
         """Test getting project products as owner"""
         self.client.force_authenticate(user=self.owner)
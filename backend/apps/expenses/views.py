@@ -4,6 +4,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.analytics.cache import bump_project_data_version
+from apps.analytics.utils import calculate_project_earnings
 from apps.product.models import Product
 from apps.project.models import ProjectUser
 
@@ -71,6 +73,7 @@ class ExpenseListCreateView(APIView):
             serializer = ExpenseSerializer(data=data)
             if serializer.is_valid():
                 expense = serializer.save()
+                bump_project_data_version(expense.project_id)
                 return Response(
                     ExpenseSerializer(expense).data, 
                     status=status.HTTP_201_CREATED
@@ -150,6 +153,7 @@ class ExpenseDetailView(APIView):
         serializer = ExpenseSerializer(expense, data=data, partial=True)
         if serializer.is_valid():
             updated_expense = serializer.save()
+            bump_project_data_version(updated_expense.project_id)
             return Response(
                 ExpenseSerializer(updated_expense).data, 
                 status=status.HTTP_200_OK
@@ -164,6 +168,7 @@ class ExpenseDetailView(APIView):
         
         expense.is_deleted = True
         expense.save()
+        bump_project_data_version(expense.project_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -193,13 +198,18 @@ class ProjectMembersView(APIView):
                 project_id=request.user.currently_selected_project_id
             ).select_related('user')
             
+            earnings = calculate_project_earnings(
+                request.user.currently_selected_project_id
+            )
+
             members = []
             for pu in project_users:
                 members.append({
                     'id': pu.user.id,
                     'name': pu.user.name,
                     'email': pu.user.email,
-                    'role': pu.role
+                    'role': pu.role,
+                    'earnings': earnings[pu.user_id]
                 })
             
             return Response(members, status=status.HTTP_200_OK)
@@ -55,6 +55,7 @@ class InviteService:
     def accept_invite(invite, user):
         """Accept invite and create project membership"""
         from apps.project.models import ProducerProductAccess, ProjectUser
+        from apps.project.visibility import invalidate_product_visibility
 
         # Validate email matches
         if user.email != invite.email:
@@ -80,6 +81,7 @@ class InviteService:
         project_user = ProjectUser.objects.create(
             project=invite.project, user=user, role=invite.role
         )
+        invalidate_product_visibility(invite.project_id, user.id)
 
         # Transfer product access for producers
         if invite.role == "producer":
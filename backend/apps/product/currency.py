@@ -0,0 +1,168 @@
+"""
+Conversion of royalty amounts to a project's reporting currency.
+
+ExchangeRate rows hold how many units of a currency one unit of
+settings.FX_BASE_CURRENCY bought on a day, so an amount converts from currency
+C to currency R on day d as amount * rate(R, d) / rate(C, d). The latest rate
+on or before d is used, or the earliest one for days before the first rate.
+The base currency needs no rows, and a currency without any rate is counted
+as is, which is what every amount was before rates were loaded.
+
+Conversion is an SQL expression applied inside the aggregation queries, so
+amounts are never converted row by row in Python. refresh_daily_rollups
+converts while grouping the sales per product, day and currency, which makes
+the rollups, and everything aggregated from them, reporting currency figures.
+"""
+
+import csv
+import io
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+from typing import IO, Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db.models import (
+    Case,
+    DecimalField,
+    Expression,
+    F,
+    Min,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import ExchangeRate, ProductSale
+
+RATE_FIELD = DecimalField(max_digits=40, decimal_places=20)
+RATE_BATCH_SIZE = 1000
+RATE_COLUMNS = ("date", "currency", "rate")
+
+
+def rate_on(currency: str, day: str) -> Expression:
+    """
+    Rate of the currency in the outer query's `currency` field on the day in
+    its `day` field, 1 when there is none.
+    """
+    rates = ExchangeRate.objects.filter(currency=OuterRef(currency)).values("rate")
+    return Coalesce(
+        Subquery(rates.filter(date__lte=OuterRef(day)).order_by("-date")[:1]),
+        Subquery(rates.order_by("date")[:1]),
+        Value(Decimal("1")),
+        output_field=RATE_FIELD,
+    )
+
+
+def conversion_rate(currency: str, target_currency: str, day: str) -> Expression:
+    """
+    Factor converting an amount of the outer query from the currency in its
+    `currency` field to the one in `target_currency`, on the day in `day`.
+    """
+    return Case(
+        When(Q(**{currency: F(target_currency)}), then=Value(Decimal("1"))),
+        default=rate_on(target_currency, day) / rate_on(currency, day),
+        output_field=RATE_FIELD,
+    )
+
+
+def read_exchange_rates(file: IO[bytes]) -> List[ExchangeRate]:
+    """
+    Parse a CSV rate file with date, currency and rate columns, in any order.
+    Raises ValueError naming the offending line.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig"))
+    missing = set(RATE_COLUMNS) - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+
+    rates = []
+    for row in reader:
+        try:
+            day = parse_date(row["date"].strip())
+            rate = Decimal(row["rate"].strip())
+        except (ValueError, InvalidOperation):
+            day = rate = None
+        currency = row["currency"].strip().upper()
+        if day is None or rate is None or rate <= 0 or not currency:
+            raise ValueError(f"Invalid exchange rate on line {reader.line_num}")
+        rates.append(ExchangeRate(currency=currency, date=day, rate=rate))
+    return rates
+
+
+def save_exchange_rates(rates: List[ExchangeRate]) -> Dict[str, Optional[date]]:
+    """
+    Insert or update the rates. Returns per currency the first day whose
+    conversions may have changed, None when all of them may have: rates before
+    a currency's earliest one also stand in for the days before it.
+    """
+    first_days = {}
+    for rate in rates:
+        if rate.currency not in first_days or rate.date < first_days[rate.currency]:
+            first_days[rate.currency] = rate.date
+
+    earliest = dict(
+        ExchangeRate.objects.filter(currency__in=first_days)
+        .values("currency")
+        .annotate(first=Min("date"))
+        .values_list("currency", "first")
+    )
+    for currency, day in first_days.items():
+        if currency not in earliest or day <= earliest[currency]:
+            first_days[currency] = None
+
+    ExchangeRate.objects.bulk_create(
+        rates,
+        batch_size=RATE_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["currency", "date"],
+        update_fields=["rate"],
+    )
+    return first_days
+
+
+def get_affected_sales(first_days: Dict[str, Optional[date]]) -> QuerySet:
+    """Sales whose conversion depends on rates changed from these days on."""
+    affected = Q(pk__in=[])
+    for currency, day in first_days.items():
+        currency_sales = Q(royalty_currency=currency) | Q(
+            product__project__reporting_currency=currency
+        )
+        if day:
+            currency_sales &= Q(
+                period_start__gte=timezone.make_aware(datetime.combine(day, time.min))
+            )
+        affected |= currency_sales
+    return ProductSale.objects.filter(affected)
+
+
+def get_unconvertible_currencies() -> Set[Tuple[int, str]]:
+    """
+    (project id, currency) pairs of sales counted unconverted, because the
+    currency of one side of their conversion has no rates.
+    """
+    known = set(ExchangeRate.objects.values_list("currency", flat=True).distinct())
+    known.add(settings.FX_BASE_CURRENCY)
+    pairs = (
+        ProductSale.objects.exclude(
+            royalty_currency=F("product__project__reporting_currency")
+        )
+        .values_list(
+            "product__project_id",
+            "royalty_currency",
+            "product__project__reporting_currency",
+        )
+        .order_by()
+        .distinct()
+    )
+    return {
+        (project_id, currency)
+        for project_id, *currencies in pairs
+        for currency in currencies
+        if currency not in known
+    }
@@ -0,0 +1,77 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from apps.analytics.benchmarks import compare_benchmark_results, run_benchmarks
+from apps.project.models import Project
+
+
+class Command(BaseCommand):
+    help = (
+        "Time analytics, per-source analytics, report generation and the "
+        "top-content endpoints on the given projects (by default the synthetic "
+        "tenants) and write the timings and query counts to a JSON file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project", type=int, action="append", dest="project_ids", default=[]
+        )
+        parser.add_argument(
+            "--name-prefix",
+            default="Synthetic tenant",
+            help="Benchmark the projects with this name prefix when no --project "
+            "is given.",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--output", default="analytics-benchmark.json")
+        parser.add_argument(
+            "--use-cache",
+            action="store_true",
+            help="Keep the analytics cache enabled instead of measuring the queries.",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Results of an earlier run to fail on regressions against.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed growth of median timings against the baseline.",
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+
+        if options["project_ids"]:
+            projects = Project.objects.filter(id__in=options["project_ids"])
+        else:
+            projects = Project.objects.filter(name__startswith=options["name_prefix"])
+        projects = list(projects.order_by("id"))
+        if not projects:
+            raise CommandError("No projects to benchmark.")
+
+        results = run_benchmarks(projects, options["repeat"], options["use_cache"])
+
+        with open(options["output"], "w") as output:
+            json.dump(results, output, cls=DjangoJSONEncoder, indent=2)
+
+        for row in results["results"]:
+            self.stdout.write(
+                f"{row['project']} / {row['case']} ({row['role']}): "
+                f"median {row['median_ms']} ms, {row['queries']} queries"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline:
+                regressions = compare_benchmark_results(
+                    results, json.load(baseline), options["tolerance"]
+                )
+            if regressions:
+                raise CommandError(
+                    "Performance regressions:\n" + "\n".join(regressions)
+                )
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.product.currency import (
+    get_unconvertible_currencies,
+    read_exchange_rates,
+    save_exchange_rates,
+)
+from apps.product.services import refresh_converted_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates from CSV files with date, currency and rate columns, "
+        "rates being units of the currency per unit of FX_BASE_CURRENCY, and "
+        "refresh the rollups whose conversion changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+")
+
+    def handle(self, *args, **options):
+        rates = []
+        for path in options["paths"]:
+            try:
+                with open(path, "rb") as file:
+                    rates.extend(read_exchange_rates(file))
+            except (OSError, ValueError) as e:
+                raise CommandError(f"{path}: {e}")
+
+        with transaction.atomic():
+            first_days = save_exchange_rates(rates)
+            refreshed = refresh_converted_rollups(first_days)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Loaded {len(rates)} rates against {settings.FX_BASE_CURRENCY} "
+                f"for {len(first_days)} currencies, refreshed {refreshed} rollups."
+            )
+        )
+        for project_id, currency in sorted(get_unconvertible_currencies()):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Project {project_id}: no rates for {currency}, its amounts "
+                    "are counted unconverted."
+                )
+            )
@@ -0,0 +1,195 @@
+import random
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.product.models import Product
+from apps.product.partitions import ensure_fact_partitions
+from apps.product.services import refresh_daily_rollups
+from apps.project.models import ProducerProductAccess, Project, ProjectUser
+from apps.report.models import ReportTemplates
+from apps.sources.models import Source
+from apps.user.models import User
+
+SYNTHETIC_EMAIL_DOMAIN = "synthetic.royaltyx.test"
+SYNTHETIC_PASSWORD = "synthetic-tenant"
+
+# One row per product and day, at a random hour of the day
+INSERT_IMPRESSIONS_SQL = """
+    INSERT INTO product_impressions (
+        product_id, impressions, ecpm, period_start, period_end,
+        created_at, updated_at, is_deleted
+    )
+    SELECT p.id,
+           (50 + random() * 950)::int,
+           round((0.5 + random() * 9.5)::numeric, 4),
+           t.at, t.at, now(), now(), false
+    FROM unnest(%s::bigint[]) AS p(id)
+    CROSS JOIN generate_series(%s::timestamp, %s::timestamp, interval '1 day') AS d(day)
+    CROSS JOIN LATERAL (
+        SELECT (d.day + floor(random() * 24) * interval '1 hour')
+            AT TIME ZONE 'UTC' AS at
+    ) t
+"""
+
+# Sales only happen on a share of the days
+INSERT_SALES_SQL = """
+    INSERT INTO product_sale (
+        product_id, type, unit_price, unit_price_currency, quantity, is_refund,
+        royalty_amount, royalty_currency, period_start, period_end,
+        created_at, updated_at, is_deleted
+    )
+    SELECT s.product_id, s.type, s.unit_price, 'USD', s.quantity, s.is_refund,
+           round(s.unit_price * s.quantity * 0.7, 2), 'USD', s.at, s.at,
+           now(), now(), false
+    FROM (
+        SELECT p.id AS product_id,
+               CASE WHEN random() < 0.4 THEN 'rental' ELSE 'purchase' END AS type,
+               round((1.99 + random() * 18)::numeric, 2) AS unit_price,
+               1 + floor(random() * 5)::int AS quantity,
+               random() < 0.02 AS is_refund,
+               t.at
+        FROM unnest(%s::bigint[]) AS p(id)
+        CROSS JOIN generate_series(
+            %s::timestamp, %s::timestamp, interval '1 day'
+        ) AS d(day)
+        CROSS JOIN LATERAL (
+            SELECT (d.day + floor(random() * 24) * interval '1 hour')
+                AT TIME ZONE 'UTC' AS at
+        ) t
+        WHERE random() < %s
+    ) s
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Create synthetic projects with products, sources, producers and years of "
+        "daily sales and impressions, for benchmarking analytics."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=1)
+        parser.add_argument("--products", type=int, default=100)
+        parser.add_argument("--sources", type=int, default=3)
+        parser.add_argument("--producers", type=int, default=2)
+        parser.add_argument(
+            "--producer-share",
+            type=float,
+            default=0.1,
+            help="Share of the products each producer has access to.",
+        )
+        parser.add_argument("--years", type=int, default=1)
+        parser.add_argument(
+            "--sale-probability",
+            type=float,
+            default=0.3,
+            help="Chance of a product having a sale on a given day.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of products whose history is inserted per statement.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--name-prefix", default="Synthetic tenant")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Synthetic tenants can only be generated on PostgreSQL.")
+        if options["products"] < 1 or options["years"] < 1:
+            raise CommandError("--products and --years must be at least 1.")
+
+        rng = random.Random(options["seed"])
+        with connection.cursor() as cursor:
+            # Makes random() in the insert statements repeatable as well
+            cursor.execute("SELECT setseed(%s)", [rng.uniform(-1, 1)])
+
+        last_day = date.today() - timedelta(days=1)
+        first_day = last_day - timedelta(days=365 * options["years"] - 1)
+        ensure_fact_partitions(first_day.replace(day=1), last_day.replace(day=1))
+
+        for number in range(1, options["projects"] + 1):
+            # Stable names let benchmark results be compared across databases
+            name = f"{options['name_prefix']} {number}"
+            project = self.create_project(name, rng, first_day, last_day, options)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Created project {project.id} ({project.name}) with "
+                    f"{options['products']} products from {first_day} to {last_day}"
+                )
+            )
+
+    def create_project(self, name, rng, first_day, last_day, options):
+        with transaction.atomic():
+            project = Project.objects.create(
+                name=name, description="Synthetic data for analytics benchmarks"
+            )
+
+            owner = self.add_member(
+                project, "owner", ProjectUser.PROJECT_USER_ROLE_OWNER
+            )
+            ReportTemplates.objects.create(
+                template_name="Synthetic report", project=project, created_by=owner.user
+            )
+
+            platforms = [platform for platform, _ in Source.PLATFORMS]
+            sources = Source.objects.bulk_create(
+                Source(
+                    project=project,
+                    account_name=f"Synthetic source {index + 1}",
+                    platform=platforms[index % len(platforms)],
+                )
+                for index in range(options["sources"])
+            )
+            products = Product.objects.bulk_create(
+                [
+                    Product(
+                        project=project,
+                        source=sources[index % len(sources)] if sources else None,
+                        external_id=f"synthetic-{index + 1}",
+                        title=f"Synthetic product {index + 1}",
+                        statement_frequency="Monthly",
+                    )
+                    for index in range(options["products"])
+                ],
+                batch_size=1000,
+            )
+            product_ids = [product.id for product in products]
+
+            access_count = max(1, round(len(product_ids) * options["producer_share"]))
+            for index in range(options["producers"]):
+                producer = self.add_member(
+                    project,
+                    f"producer{index + 1}",
+                    ProjectUser.PROJECT_USER_ROLE_PRODUCER,
+                )
+                ProducerProductAccess.objects.bulk_create(
+                    ProducerProductAccess(project_user=producer, product_id=product_id)
+                    for product_id in rng.sample(product_ids, access_count)
+                )
+
+        batch_size = options["batch_size"]
+        for offset in range(0, len(product_ids), batch_size):
+            batch = product_ids[offset : offset + batch_size]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(INSERT_IMPRESSIONS_SQL, [batch, first_day, last_day])
+                cursor.execute(
+                    INSERT_SALES_SQL,
+                    [batch, first_day, last_day, options["sale_probability"]],
+                )
+                refresh_daily_rollups(batch, first_day, last_day)
+
+        return project
+
+    def add_member(self, project, name, role):
+        user = User.objects.create_user(
+            email=f"{name}+{project.id}@{SYNTHETIC_EMAIL_DOMAIN}",
+            name=f"Synthetic {name}",
+            password=SYNTHETIC_PASSWORD,
+        )
+        user.currently_selected_project = project
+        user.save(update_fields=["currently_selected_project"])
+        return ProjectUser.objects.create(project=project, user=user, role=role)
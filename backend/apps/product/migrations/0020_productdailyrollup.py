@@ -0,0 +1,79 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BACKFILL_DAILY_ROLLUPS = """
+INSERT INTO product_daily_rollup (
+    product_id, period_start, period_end, impressions, impression_revenue,
+    royalty_revenue, sales_count, rentals_count, rentals_revenue,
+    purchases_count, purchases_revenue, refunds_count, refunds_revenue,
+    updated_at
+)
+SELECT
+    product_id, period_start, period_end,
+    SUM(impressions), SUM(impression_revenue), SUM(royalty_revenue),
+    SUM(sales_count), SUM(rentals_count), SUM(rentals_revenue),
+    SUM(purchases_count), SUM(purchases_revenue),
+    SUM(refunds_count), SUM(refunds_revenue),
+    NOW()
+FROM (
+    SELECT
+        product_id, period_start, period_end,
+        COALESCE(impressions, 0) AS impressions,
+        COALESCE(impressions * ecpm / 1000, 0) AS impression_revenue,
+        0 AS royalty_revenue, 0 AS sales_count,
+        0 AS rentals_count, 0 AS rentals_revenue,
+        0 AS purchases_count, 0 AS purchases_revenue,
+        0 AS refunds_count, 0 AS refunds_revenue
+    FROM product_impressions
+    UNION ALL
+    SELECT
+        product_id, period_start, period_end,
+        0, 0, royalty_amount, 1,
+        CASE WHEN type = 'rental' THEN 1 ELSE 0 END,
+        CASE WHEN type = 'rental' THEN royalty_amount ELSE 0 END,
+        CASE WHEN type = 'purchase' THEN 1 ELSE 0 END,
+        CASE WHEN type = 'purchase' THEN royalty_amount ELSE 0 END,
+        CASE WHEN is_refund THEN 1 ELSE 0 END,
+        CASE WHEN is_refund THEN royalty_amount ELSE 0 END
+    FROM product_sale
+) AS facts
+GROUP BY product_id, period_start, period_end
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0019_merge_20250728_1825'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('impressions', models.BigIntegerField(default=0)),
+                ('impression_revenue', models.DecimalField(decimal_places=18, default=0, max_digits=40)),
+                ('royalty_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=40)),
+                ('sales_count', models.IntegerField(default=0)),
+                ('rentals_count', models.IntegerField(default=0)),
+                ('rentals_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=40)),
+                ('purchases_count', models.IntegerField(default=0)),
+                ('purchases_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=40)),
+                ('refunds_count', models.IntegerField(default=0)),
+                ('refunds_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=40)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='product.product')),
+            ],
+            options={
+                'db_table': 'product_daily_rollup',
+                'indexes': [models.Index(fields=['period_start'], name='product_dai_period__5d7c42_idx')],
+                'unique_together': {('product', 'period_start', 'period_end')},
+            },
+        ),
+        migrations.RunSQL(BACKFILL_DAILY_ROLLUPS, migrations.RunSQL.noop),
+    ]
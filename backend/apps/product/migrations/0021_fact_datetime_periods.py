@@ -0,0 +1,81 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:03
+
+import json
+
+from django.db import migrations, models
+
+from apps.product.partitions import (
+    PARTITIONED_FACT_TABLES,
+    partition_fact_table,
+    unpartition_fact_table,
+)
+
+
+def partition_fact_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in PARTITIONED_FACT_TABLES:
+        partition_fact_table(schema_editor.connection, table)
+
+
+def unpartition_fact_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in PARTITIONED_FACT_TABLES:
+        unpartition_fact_table(schema_editor.connection, table)
+
+
+def create_periodic_task(apps, schema_editor):
+    IntervalSchedule = apps.get_model("django_celery_beat", "IntervalSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+
+    schedule, _ = IntervalSchedule.objects.get_or_create(every=24, period="hours")
+
+    PeriodicTask.objects.get_or_create(
+        name="Maintain Fact Table Partitions",
+        defaults={
+            "interval": schedule,
+            "task": "apps.product.tasks.task_maintain_fact_partitions",
+            "args": json.dumps([]),
+        },
+    )
+
+
+def delete_periodic_task(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name="Maintain Fact Table Partitions").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0020_productdailyrollup'),
+        ('django_celery_beat', '0001_initial'),
+        ('data_imports', '0003_alter_file_table'),
+    ]
+
+    operations = [
+        # Existing dates become midnight UTC, i.e. the start of their day
+        migrations.AlterField(
+            model_name='productimpressions',
+            name='period_end',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='productimpressions',
+            name='period_start',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='productsale',
+            name='period_end',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='productsale',
+            name='period_start',
+            field=models.DateTimeField(),
+        ),
+        migrations.RunPython(partition_fact_tables, unpartition_fact_tables),
+        migrations.RunPython(create_periodic_task, delete_periodic_task),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:02
+
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_periodic_task(apps, schema_editor):
+    CrontabSchedule = apps.get_model("django_celery_beat", "CrontabSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+
+    schedule, _ = CrontabSchedule.objects.get_or_create(
+        minute="0",
+        hour="3",
+        day_of_week="*",
+        day_of_month="*",
+        month_of_year="*",
+    )
+
+    PeriodicTask.objects.get_or_create(
+        name="Refresh Revenue Forecasts",
+        defaults={
+            "crontab": schedule,
+            "task": "apps.product.tasks.task_refresh_revenue_forecasts",
+            "args": json.dumps([]),
+        },
+    )
+
+
+def delete_periodic_task(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name="Refresh Revenue Forecasts").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0022_exchange_rates'),
+        ('project', '0013_project_reporting_currency'),
+        ('django_celery_beat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_version', models.IntegerField()),
+                ('first_month', models.DateField()),
+                ('products', models.JSONField(default=dict)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_forecast', to='project.project')),
+            ],
+            options={
+                'db_table': 'revenue_forecast',
+            },
+        ),
+        migrations.RunPython(create_periodic_task, delete_periodic_task),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0023_revenue_forecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimpressions',
+            name='is_quarantined',
+            field=models.BooleanField(db_default=False, default=False),
+        ),
+    ]
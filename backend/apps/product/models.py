@@ -1,5 +1,6 @@
 from django.db import models
 from django.db.models import Sum
+from django.db.models.functions import Round, TruncDate
 
 from apps.data_imports.models import File
 from apps.project.models import Project
@@ -39,16 +40,38 @@ class Product(BaseModel):
         db_table = "product"
 
     def total_royalty_earnings(self, period_start=None, period_end=None):
+        """Royalties in the project's reporting currency."""
+        from .currency import conversion_rate
+
         filters = {"is_refund": False}
 
         if period_start and period_end:
             filters["period_start__gte"] = period_start
             filters["period_end__lte"] = period_end
 
+        # Grouped rather than aggregate(), which would move the annotations
+        # the conversion refers to into a subquery
         return (
-            self.productsale_set.filter(**filters).aggregate(
-                total_royalty=Sum("royalty_amount")
-            )["total_royalty"]
+            self.productsale_set.filter(**filters)
+            .annotate(
+                day=TruncDate("period_start"),
+                reporting_currency=models.F("product__project__reporting_currency"),
+            )
+            .values("product_id")
+            .annotate(
+                total_royalty=Round(
+                    Sum(
+                        models.F("royalty_amount")
+                        * conversion_rate(
+                            "royalty_currency", "reporting_currency", "day"
+                        )
+                    ),
+                    2,
+                )
+            )
+            .values_list("total_royalty", flat=True)
+            .order_by("product_id")
+            .first()
             or 0
         )
 
@@ -95,8 +118,9 @@ class ProductSale(BaseModel):
     is_refund = models.BooleanField(default=False)
     royalty_amount = models.DecimalField(decimal_places=2, max_digits=40)
     royalty_currency = models.CharField(max_length=10)
-    period_start = models.DateField()
-    period_end = models.DateField()
+    # Stored in monthly range partitions on period_start, see partitions.py
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
 
     class Meta:
         db_table = "product_sale"
@@ -107,8 +131,81 @@ class ProductImpressions(BaseModel):
     impressions = models.IntegerField(null=True)
     from_file = models.ForeignKey(File, on_delete=models.CASCADE, null=True)
     ecpm = models.DecimalField(max_digits=30, decimal_places=18, null=True, blank=True)
+    # Stored in monthly range partitions on period_start, see partitions.py
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    # Suspect synced counts left out of the rollups, see sources/utils/anomalies.py
+    is_quarantined = models.BooleanField(default=False, db_default=False)
+
+    class Meta:
+        db_table = "product_impressions"
+
+
+class ProductDailyRollup(models.Model):
+    """
+    Per-product, per-day aggregate of ProductSale and ProductImpressions rows.
+    Kept up to date by apps.product.services.refresh_daily_rollups whenever the
+    raw fact tables change, so analytics only scans raw rows for hourly stats.
+    Days are the fact rows' period dates in settings.TIME_ZONE.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="daily_rollups"
+    )
     period_start = models.DateField()
     period_end = models.DateField()
+    impressions = models.BigIntegerField(default=0)
+    impression_revenue = models.DecimalField(
+        max_digits=40, decimal_places=18, default=0
+    )
+    royalty_revenue = models.DecimalField(max_digits=40, decimal_places=2, default=0)
+    sales_count = models.IntegerField(default=0)
+    rentals_count = models.IntegerField(default=0)
+    rentals_revenue = models.DecimalField(max_digits=40, decimal_places=2, default=0)
+    purchases_count = models.IntegerField(default=0)
+    purchases_revenue = models.DecimalField(
+        max_digits=40, decimal_places=2, default=0
+    )
+    refunds_count = models.IntegerField(default=0)
+    refunds_revenue = models.DecimalField(max_digits=40, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        db_table = "product_impressions"
+        db_table = "product_daily_rollup"
+        unique_together = ("product", "period_start", "period_end")
+        indexes = [models.Index(fields=["period_start"])]
+
+
+class ExchangeRate(models.Model):
+    """
+    Units of `currency` that one unit of settings.FX_BASE_CURRENCY bought on
+    `date`. Loaded from CSV rate files, see apps.product.currency.
+    """
+
+    currency = models.CharField(max_length=10)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=24, decimal_places=10)
+
+    class Meta:
+        db_table = "exchange_rate"
+        unique_together = ("currency", "date")
+
+
+class RevenueForecast(models.Model):
+    """
+    Monthly revenue forecast of every product of a project, from
+    `first_month` on, as fitted for the project's `data_version`. Refreshed
+    nightly, see apps.analytics.forecast.
+    """
+
+    project = models.OneToOneField(
+        Project, on_delete=models.CASCADE, related_name="revenue_forecast"
+    )
+    data_version = models.IntegerField()
+    first_month = models.DateField()
+    # {product id: {"royalty_revenue": [...], "impression_revenue": [...]}}
+    products = models.JSONField(default=dict)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "revenue_forecast"
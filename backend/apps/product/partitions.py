@@ -0,0 +1,290 @@
+"""
+Monthly range partitioning of the fact tables on PostgreSQL.
+
+product_sale and product_impressions are declaratively partitioned by RANGE on
+period_start, one partition per calendar month (UTC) plus a DEFAULT partition
+that catches rows for months without a partition yet. Queries bounded on
+period_start, like hourly analytics over a day, are pruned to the partitions of
+the months they cover.
+
+maintain_fact_partitions keeps partitions created ahead of time and moves rows
+that landed in the DEFAULT partition (e.g. imports of old statements) into
+their own month partitions.
+"""
+
+from datetime import date
+from typing import Iterable, List, Optional
+
+from django.db import connection as default_connection
+from django.db import transaction
+
+PARTITIONED_FACT_TABLES = ("product_sale", "product_impressions")
+PARTITION_MONTHS_AHEAD = 12
+
+
+def add_months(month: date, months: int) -> date:
+    number = month.year * 12 + month.month - 1 + months
+    return date(number // 12, number % 12 + 1, 1)
+
+
+def month_range(first_month: date, last_month: date) -> List[date]:
+    months = []
+    month = first_month.replace(day=1)
+    while month <= last_month:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def month_partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def month_bound(month: date) -> str:
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def is_partitioned(cursor, table: str) -> bool:
+    cursor.execute(
+        "SELECT relkind FROM pg_class WHERE relname = %s AND relkind = 'p'", [table]
+    )
+    return cursor.fetchone() is not None
+
+
+def get_partition_names(cursor, table: str) -> List[str]:
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        """,
+        [table],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def get_data_months(cursor, table: str) -> List[date]:
+    """Months (UTC) that currently have rows in the given table."""
+    cursor.execute(
+        f"""
+        SELECT DISTINCT date_trunc('month', period_start AT TIME ZONE 'UTC')::date
+        FROM {table}
+        """
+    )
+    return sorted(row[0] for row in cursor.fetchall())
+
+
+def add_fact_constraints(cursor, table: str, primary_key: Iterable[str]) -> None:
+    """Primary key, foreign keys and indexes shared by both table layouts."""
+    cursor.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey "
+        f"PRIMARY KEY ({', '.join(primary_key)})"
+    )
+    cursor.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_product_id_fk "
+        "FOREIGN KEY (product_id) REFERENCES product (id) "
+        "DEFERRABLE INITIALLY DEFERRED"
+    )
+    cursor.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_from_file_id_fk "
+        "FOREIGN KEY (from_file_id) REFERENCES file (id) "
+        "DEFERRABLE INITIALLY DEFERRED"
+    )
+    cursor.execute(
+        f"CREATE INDEX {table}_product_period_idx ON {table} (product_id, period_start)"
+    )
+    cursor.execute(f"CREATE INDEX {table}_from_file_id_idx ON {table} (from_file_id)")
+
+
+def partition_fact_table(
+    connection, table: str, months_ahead: int = PARTITION_MONTHS_AHEAD
+) -> None:
+    """
+    Rebuild an existing fact table as a partitioned table, with a partition for
+    every month that has data and for the next `months_ahead` months.
+
+    The primary key becomes (id, period_start) since PostgreSQL requires the
+    partition key in it; ids keep coming from a single sequence, so they stay
+    unique.
+    """
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return
+
+        old_table = f"{table}_unpartitioned"
+        this_month = date.today().replace(day=1)
+        months = set(get_data_months(cursor, table))
+        months.update(month_range(this_month, add_months(this_month, months_ahead)))
+
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {old_table}")
+        cursor.execute(
+            f"""
+            CREATE TABLE {table} (
+                LIKE {old_table}
+                INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE
+            ) PARTITION BY RANGE (period_start)
+            """
+        )
+        # The sequence is left behind by unpartition_fact_table, if it ran before
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {table}_id_seq")
+        cursor.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        cursor.execute(
+            f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')"
+        )
+        cursor.execute(
+            f"CREATE TABLE {default_partition_name(table)} PARTITION OF {table} DEFAULT"
+        )
+        for month in sorted(months):
+            create_month_partition(cursor, table, month)
+
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {old_table}")
+        cursor.execute(
+            f"SELECT setval('{table}_id_seq', COALESCE(MAX(id), 0) + 1, false) "
+            f"FROM {table}"
+        )
+        cursor.execute(f"DROP TABLE {old_table}")
+        add_fact_constraints(cursor, table, ["id", "period_start"])
+
+
+def unpartition_fact_table(connection, table: str) -> None:
+    """Turn a partitioned fact table back into a plain table."""
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            return
+
+        old_table = f"{table}_partitioned"
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {old_table}")
+        cursor.execute(
+            f"""
+            CREATE TABLE {table} (
+                LIKE {old_table}
+                INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE
+            )
+            """
+        )
+        cursor.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {old_table}")
+        cursor.execute(f"DROP TABLE {old_table} CASCADE")
+        add_fact_constraints(cursor, table, ["id"])
+
+
+def create_month_partition(cursor, table: str, month: date) -> None:
+    cursor.execute(
+        f"""
+        CREATE TABLE {month_partition_name(table, month)} PARTITION OF {table}
+        FOR VALUES FROM ({month_bound(month)}) TO ({month_bound(add_months(month, 1))})
+        """
+    )
+
+
+def split_month_from_default(cursor, table: str, month: date) -> None:
+    """
+    Create the partition of a month whose rows may currently sit in the DEFAULT
+    partition, moving them over before attaching it.
+    """
+    partition = month_partition_name(table, month)
+    lower, upper = month_bound(month), month_bound(add_months(month, 1))
+
+    cursor.execute(
+        f"""
+        CREATE TABLE {partition} (
+            LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE
+        )
+        """
+    )
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {default_partition_name(table)}
+            WHERE period_start >= {lower} AND period_start < {upper}
+            RETURNING *
+        )
+        INSERT INTO {partition} SELECT * FROM moved
+        """
+    )
+    cursor.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+        f"FOR VALUES FROM ({lower}) TO ({upper})"
+    )
+
+
+def add_month_partitions(
+    cursor, table: str, months: Iterable[date], default_months: Iterable[date] = ()
+) -> int:
+    """
+    Create the missing partitions of the given months, splitting off the rows
+    of those among `default_months` that currently sit in the DEFAULT partition.
+    """
+    existing = set(get_partition_names(cursor, table))
+    default_months = set(default_months)
+    created = 0
+
+    for month in sorted(set(months)):
+        if month_partition_name(table, month) in existing:
+            continue
+        if month in default_months:
+            split_month_from_default(cursor, table, month)
+        else:
+            create_month_partition(cursor, table, month)
+        created += 1
+
+    return created
+
+
+def ensure_fact_partitions(first_month: date, last_month: date) -> int:
+    """
+    Make sure every fact table has a partition for each month in the range,
+    e.g. before bulk loading history that would otherwise land in DEFAULT.
+
+    Returns the number of partitions created.
+    """
+    if default_connection.vendor != "postgresql":
+        return 0
+
+    months = month_range(first_month, last_month)
+    created = 0
+
+    with transaction.atomic(), default_connection.cursor() as cursor:
+        for table in PARTITIONED_FACT_TABLES:
+            if not is_partitioned(cursor, table):
+                continue
+            default_months = get_data_months(cursor, default_partition_name(table))
+            created += add_month_partitions(cursor, table, months, default_months)
+
+    return created
+
+
+def maintain_fact_partitions(
+    months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None
+) -> int:
+    """
+    Make sure every fact table has partitions up to `months_ahead` months from
+    now and for every month with rows in its DEFAULT partition.
+
+    Returns the number of partitions created. Does nothing on databases other
+    than PostgreSQL or on tables that are not partitioned.
+    """
+    if default_connection.vendor != "postgresql":
+        return 0
+
+    this_month = (today or date.today()).replace(day=1)
+    created = 0
+
+    with transaction.atomic(), default_connection.cursor() as cursor:
+        for table in PARTITIONED_FACT_TABLES:
+            if not is_partitioned(cursor, table):
+                continue
+
+            default_months = get_data_months(cursor, default_partition_name(table))
+            months = set(default_months) | set(
+                month_range(this_month, add_months(this_month, months_ahead))
+            )
+            created += add_month_partitions(cursor, table, months, default_months)
+
+    return created
@@ -1,5 +1,7 @@
+from django.db.models import Count, Prefetch
 from rest_framework import serializers
 
+from apps.sources.models import Source
 from apps.sources.serializers import SourceSerializer
 
 from .models import Product, ProductImpressions, ProductSale
@@ -27,3 +29,14 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = "__all__"
+
+
+def with_serialized_relations(products):
+    """Load what ProductSerializer nests in a fixed number of queries."""
+    return products.prefetch_related(
+        Prefetch(
+            "source", queryset=Source.objects.annotate(product_count=Count("product"))
+        ),
+        "productsale_set",
+        "productimpressions_set",
+    )
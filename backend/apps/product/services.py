@@ -0,0 +1,244 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
+
+from django.db import transaction
+from django.db.models import (
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Max,
+    Min,
+    Q,
+    QuerySet,
+    Sum,
+)
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.analytics.cache import bump_product_data_version
+
+from .currency import conversion_rate, get_affected_sales
+from .models import Product, ProductDailyRollup, ProductImpressions, ProductSale
+
+ROLLUP_BATCH_SIZE = 1000
+
+
+def get_rollup_scope(
+    *querysets: QuerySet,
+) -> Tuple[Set[int], Optional[date], Optional[date]]:
+    """
+    Return the product ids and period_start window touched by the given fact
+    querysets, i.e. the part of the rollup table that has to be refreshed
+    after those rows are created or deleted.
+    """
+    product_ids = set()
+    window_start = None
+    window_end = None
+
+    for queryset in querysets:
+        product_ids.update(
+            queryset.order_by().values_list("product_id", flat=True).distinct()
+        )
+        bounds = queryset.aggregate(
+            first=Min("period_start"), last=Max("period_start")
+        )
+        if bounds["first"] and (window_start is None or bounds["first"] < window_start):
+            window_start = bounds["first"]
+        if bounds["last"] and (window_end is None or bounds["last"] > window_end):
+            window_end = bounds["last"]
+
+    return product_ids, to_local_date(window_start), to_local_date(window_end)
+
+
+def to_local_date(value: Union[None, str, date, datetime]) -> Optional[date]:
+    """Day of a fact period value in the current time zone."""
+    if isinstance(value, str):
+        value = parse_datetime(value) or parse_date(value)
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def refresh_daily_rollups(
+    product_ids: Iterable[int],
+    period_start: Optional[date] = None,
+    period_end: Optional[date] = None,
+) -> int:
+    """
+    Recompute the rollup rows of the given products from the raw fact tables.
+
+    When a window is given, only rollup rows whose period_start falls inside
+    it are rebuilt, which keeps the refresh proportional to the imported or
+    synced data rather than to the product's full history.
+
+    The cached analytics of the affected projects are invalidated as well.
+
+    Returns the number of rollup rows written.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+
+    period_start = to_local_date(period_start)
+    period_end = to_local_date(period_end)
+
+    # Rollup rows are keyed by day while fact rows carry full timestamps
+    window = Q(product_id__in=product_ids)
+    facts_window = Q(product_id__in=product_ids)
+    if period_start:
+        window &= Q(period_start__gte=period_start)
+        facts_window &= Q(period_start__gte=day_start(period_start))
+    if period_end:
+        window &= Q(period_start__lte=period_end)
+        facts_window &= Q(period_start__lt=day_start(period_end + timedelta(days=1)))
+
+    impression_rows = (
+        ProductImpressions.objects.filter(facts_window, is_quarantined=False)
+        .annotate(day_start=TruncDate("period_start"), day_end=TruncDate("period_end"))
+        .values("product_id", "day_start", "day_end")
+        .annotate(
+            impressions_sum=Sum("impressions"),
+            impression_revenue_sum=Sum(
+                ExpressionWrapper(
+                    F("impressions") * F("ecpm") / 1000,
+                    output_field=DecimalField(max_digits=30, decimal_places=18),
+                )
+            ),
+        )
+        .order_by()
+    )
+
+    rentals = Q(type=ProductSale.TYPE_RENTAL)
+    purchases = Q(type=ProductSale.TYPE_PURCHASE)
+    refunds = Q(is_refund=True)
+    # Revenue is summed per currency and converted to the project's reporting
+    # currency at the day's rate, see currency.py
+    rate = conversion_rate("royalty_currency", "reporting_currency", "day_start")
+    sales_rows = (
+        ProductSale.objects.filter(facts_window)
+        .annotate(
+            day_start=TruncDate("period_start"),
+            day_end=TruncDate("period_end"),
+            reporting_currency=F("product__project__reporting_currency"),
+        )
+        .values(
+            "product_id",
+            "day_start",
+            "day_end",
+            "royalty_currency",
+            "reporting_currency",
+        )
+        .annotate(
+            royalty_revenue_sum=Sum("royalty_amount") * rate,
+            sales=Count("id"),
+            rentals=Count("id", filter=rentals),
+            rentals_revenue_sum=Sum("royalty_amount", filter=rentals) * rate,
+            purchases=Count("id", filter=purchases),
+            purchases_revenue_sum=Sum("royalty_amount", filter=purchases) * rate,
+            refunds=Count("id", filter=refunds),
+            refunds_revenue_sum=Sum("royalty_amount", filter=refunds) * rate,
+        )
+        .order_by()
+    )
+
+    rollups = {}
+
+    def rollup_for(row):
+        key = (row["product_id"], row["day_start"], row["day_end"])
+        if key not in rollups:
+            rollups[key] = ProductDailyRollup(
+                product_id=key[0], period_start=key[1], period_end=key[2]
+            )
+        return rollups[key]
+
+    with transaction.atomic():
+        # Serialize concurrent refreshes of the same products (imports and
+        # syncs can overlap) so the delete/insert below cannot interleave.
+        list(
+            Product.objects.select_for_update()
+            .filter(id__in=product_ids)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        for row in impression_rows:
+            rollup = rollup_for(row)
+            rollup.impressions = row["impressions_sum"] or 0
+            rollup.impression_revenue = row["impression_revenue_sum"] or Decimal("0")
+
+        # A day has a row per currency sold in
+        for row in sales_rows:
+            rollup = rollup_for(row)
+            rollup.royalty_revenue += row["royalty_revenue_sum"] or Decimal("0")
+            rollup.sales_count += row["sales"]
+            rollup.rentals_count += row["rentals"]
+            rollup.rentals_revenue += row["rentals_revenue_sum"] or Decimal("0")
+            rollup.purchases_count += row["purchases"]
+            rollup.purchases_revenue += row["purchases_revenue_sum"] or Decimal("0")
+            rollup.refunds_count += row["refunds"]
+            rollup.refunds_revenue += row["refunds_revenue_sum"] or Decimal("0")
+
+        ProductDailyRollup.objects.filter(window).delete()
+        ProductDailyRollup.objects.bulk_create(
+            rollups.values(), batch_size=ROLLUP_BATCH_SIZE
+        )
+        bump_product_data_version(product_ids, period_start, period_end)
+
+    return len(rollups)
+
+
+def refresh_file_rollups(file_id: int) -> int:
+    """Refresh the rollups touched by the fact rows imported from a file."""
+    return refresh_daily_rollups(
+        *get_rollup_scope(
+            ProductImpressions.objects.filter(from_file_id=file_id),
+            ProductSale.objects.filter(from_file_id=file_id),
+        )
+    )
+
+
+# Ranking annotation of the top performing content per metric
+TOP_CONTENT_METRICS = {
+    "impressions": ("total_impressions", Sum("productimpressions__impressions")),
+    "sales": ("total_sales", Sum("productsale__royalty_amount")),
+}
+
+
+def top_performing_products(
+    products: QuerySet, metric: str, limit: int = 10
+) -> QuerySet:
+    """The products with the highest non-zero total of a TOP_CONTENT_METRICS."""
+    total, aggregate = TOP_CONTENT_METRICS[metric]
+    return (
+        products.annotate(**{total: aggregate})
+        .filter(**{f"{total}__gt": 0})
+        .order_by(f"-{total}")[:limit]
+    )
+
+
+def refresh_converted_rollups(first_days: Dict[str, Optional[date]]) -> int:
+    """
+    Refresh the rollups whose currency conversion changed with exchange rates
+    loaded from the given first days on, see currency.save_exchange_rates.
+    """
+    if not first_days:
+        return 0
+    product_ids, _, _ = get_rollup_scope(get_affected_sales(first_days))
+    days = first_days.values()
+    return refresh_daily_rollups(product_ids, None if None in days else min(days))
+
+
+def refresh_project_rollups(project_id: int) -> int:
+    """Rebuild every rollup of a project, e.g. for a new reporting currency."""
+    return refresh_daily_rollups(
+        Product.objects.filter(project_id=project_id).values_list("id", flat=True)
+    )
@@ -0,0 +1,18 @@
+from celery import shared_task
+
+from apps.analytics.forecast import refresh_revenue_forecasts
+from apps.product.partitions import maintain_fact_partitions
+
+
+@shared_task
+def task_maintain_fact_partitions():
+    print("Running task for maintaining fact table partitions.", flush=True)
+    created = maintain_fact_partitions()
+    print(f"Created {created} fact table partitions.", flush=True)
+
+
+@shared_task
+def task_refresh_revenue_forecasts():
+    print("Running task for refreshing revenue forecasts.", flush=True)
+    refreshed = refresh_revenue_forecasts()
+    print(f"Refreshed the revenue forecasts of {refreshed} projects.", flush=True)
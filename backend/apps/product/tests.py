@@ -0,0 +1,263 @@
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.analytics.utils import calculate_analytics
+from apps.product.currency import read_exchange_rates
+from apps.product.models import (
+    ExchangeRate,
+    Product,
+    ProductDailyRollup,
+    ProductImpressions,
+    ProductSale,
+)
+from apps.product.services import refresh_daily_rollups
+from apps.project.models import ProducerProductAccess, Project, ProjectUser
+from apps.sources.models import Source
+from common.testing import QueryBudgetMixin
+
+User = get_user_model()
+
+# Queries the product endpoints may run, independent of the number of products
+PRODUCT_LIST_QUERY_BUDGET = 6
+TOP_CONTENT_QUERY_BUDGET = 6
+
+
+class ProductQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Tests that the product endpoints don't run queries per product"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="owner@test.com", name="Owner", password="TestPassword123_"
+        )
+        self.project = Project.objects.create(name="Test Project")
+        self.project_user = ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.user.currently_selected_project = self.project
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+
+        source = Source.objects.create(
+            project=self.project,
+            account_name="Channel",
+            platform=Source.PLATFORM_YOUTUBE,
+        )
+        moment = timezone.make_aware(datetime(2024, 3, 1, 12))
+        for index in range(10):
+            product = Product.objects.create(
+                project=self.project, source=source, title=f"Product {index}"
+            )
+            ProductSale.objects.create(
+                product=product,
+                type=ProductSale.TYPE_PURCHASE,
+                unit_price=Decimal("9.99"),
+                unit_price_currency="USD",
+                quantity=1,
+                royalty_amount=Decimal("5.00"),
+                royalty_currency="USD",
+                period_start=moment,
+                period_end=moment,
+            )
+            ProductImpressions.objects.create(
+                product=product,
+                impressions=100,
+                ecpm=Decimal("2.00"),
+                period_start=moment,
+                period_end=moment,
+            )
+
+    def test_product_list_query_budget(self):
+        """The product list with nested sales, impressions and source"""
+        response = self.assertEndpointQueryBudget(
+            "get", reverse("product_list_create"), PRODUCT_LIST_QUERY_BUDGET
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(response.data[0]["sales"]), 1)
+        self.assertEqual(response.data[0]["source"]["account_name"], "Channel")
+
+    def test_producer_product_list_query_budget(self):
+        """Producers only get their accessible products, within the same budget"""
+        self.project_user.role = ProjectUser.PROJECT_USER_ROLE_PRODUCER
+        self.project_user.save()
+        for product in self.project.product_set.all()[:3]:
+            ProducerProductAccess.objects.create(
+                project_user=self.project_user, product=product
+            )
+
+        response = self.assertEndpointQueryBudget(
+            "get", reverse("product_list_create"), PRODUCT_LIST_QUERY_BUDGET
+        )
+
+        self.assertEqual(len(response.data), 3)
+
+    def test_top_performing_content_query_budget(self):
+        """Both top content endpoints"""
+        for url in (
+            "/products/top-performing-by-impressions/",
+            "/products/top-performing-by-sales/",
+        ):
+            response = self.assertEndpointQueryBudget(
+                "get", url, TOP_CONTENT_QUERY_BUDGET
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data), 10)
+
+    def test_budget_failure_lists_repeated_queries(self):
+        """An N+1 fails the budget with the repeated statement"""
+        with self.assertRaisesMessage(AssertionError, "Repeated queries"):
+            with self.assertQueryBudget(5):
+                for product in Product.objects.all():
+                    list(product.productsale_set.all())
+
+    @override_settings(DEBUG=True, QUERY_STATS_ENABLED=True)
+    def test_query_headers_in_debug(self):
+        """In DEBUG responses carry the request's query statistics"""
+        response = self.client.get(reverse("product_list_create"))
+
+        self.assertGreater(int(response["X-Query-Count"]), 0)
+        self.assertIn("X-Query-Time-Ms", response)
+        self.assertIn("X-Query-Slowest-Ms", response)
+        self.assertEqual(response["X-Query-Duplicates"], "0")
+
+    def test_no_query_headers_without_debug(self):
+        response = self.client.get(reverse("product_list_create"))
+
+        self.assertNotIn("X-Query-Count", response)
+
+
+class CurrencyConversionTests(TestCase):
+    """Tests for converting royalties to the project's reporting currency"""
+
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project", reporting_currency="EUR"
+        )
+        self.product = Product.objects.create(project=self.project, title="Film")
+        self.moment = timezone.make_aware(datetime(2024, 3, 5, 12))
+        for currency in ("EUR", "USD", "GBP"):
+            self.add_sale(currency, self.moment)
+        ExchangeRate.objects.create(
+            currency="EUR", date=date(2024, 3, 1), rate=Decimal("0.9")
+        )
+        ExchangeRate.objects.create(
+            currency="GBP", date=date(2024, 3, 1), rate=Decimal("0.8")
+        )
+
+    def add_sale(self, currency, moment, amount="10.00"):
+        ProductSale.objects.create(
+            product=self.product,
+            type=ProductSale.TYPE_PURCHASE,
+            unit_price=Decimal(amount),
+            unit_price_currency=currency,
+            quantity=1,
+            royalty_amount=Decimal(amount),
+            royalty_currency=currency,
+            period_start=moment,
+            period_end=moment,
+        )
+
+    def royalty_revenue(self):
+        return ProductDailyRollup.objects.get(product=self.product).royalty_revenue
+
+    def test_rollups_are_converted_at_the_days_rate(self):
+        refresh_daily_rollups([self.product.id])
+
+        # 10 EUR + 10 USD * 0.9 + 10 GBP * 0.9 / 0.8
+        self.assertEqual(self.royalty_revenue(), Decimal("30.25"))
+        rollup = ProductDailyRollup.objects.get(product=self.product)
+        self.assertEqual(rollup.sales_count, 3)
+        self.assertEqual(rollup.purchases_revenue, Decimal("30.25"))
+
+    def test_latest_earlier_rate_is_used(self):
+        ExchangeRate.objects.create(
+            currency="GBP", date=date(2024, 3, 10), rate=Decimal("0.5")
+        )
+        refresh_daily_rollups([self.product.id])
+
+        self.assertEqual(self.royalty_revenue(), Decimal("30.25"))
+
+    def test_analytics_totals_are_in_the_reporting_currency(self):
+        refresh_daily_rollups([self.product.id])
+
+        data = calculate_analytics(
+            self.project.id,
+            {},
+            date(2024, 3, 1),
+            date(2024, 3, 31),
+            granularity="daily",
+        )
+        self.assertEqual(data["currency"], "EUR")
+        self.assertEqual(data["total_royalty_revenue"], Decimal("30.25"))
+
+        hourly = calculate_analytics(
+            self.project.id,
+            {
+                "period_start__gte": timezone.make_aware(datetime(2024, 3, 5)),
+                "period_end__lte": timezone.make_aware(datetime(2024, 3, 5, 23)),
+            },
+            date(2024, 3, 5),
+            date(2024, 3, 5),
+            granularity="hourly",
+        )
+        self.assertEqual(hourly["time_stats"][12]["royalty_revenue"], 30.25)
+
+    def test_load_exchange_rates_refreshes_converted_rollups(self):
+        refresh_daily_rollups([self.product.id])
+        content = "date,currency,rate\n2024-03-04,GBP,0.6\n2024-03-04,JPY,150\n"
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        self.add_sale("SEK", self.moment, "0.00")
+
+        out = StringIO()
+        call_command("load_exchange_rates", file.name, stdout=out)
+
+        # 10 EUR + 10 USD * 0.9 + 10 GBP * 0.9 / 0.6
+        self.assertEqual(self.royalty_revenue(), Decimal("34.00"))
+        self.assertIn(f"Project {self.project.id}: no rates for SEK", out.getvalue())
+
+    def test_reporting_currency_change_refreshes_rollups(self):
+        refresh_daily_rollups([self.product.id])
+        user = User.objects.create_user(
+            email="owner@test.com", name="Owner", password="TestPassword123_"
+        )
+        user.currently_selected_project = self.project
+        user.save()
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        response = client.put(
+            "/projects/update/",
+            {"name": "Test Project", "reporting_currency": "gbp"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["reporting_currency"], "GBP")
+        # 10 EUR * 0.8 / 0.9 + 10 USD * 0.8 + 10 GBP
+        self.assertEqual(self.royalty_revenue(), Decimal("26.89"))
+
+    def test_invalid_rate_files_are_rejected(self):
+        with self.assertRaisesMessage(ValueError, "Missing columns: rate"):
+            read_exchange_rates(BytesIO(b"date,currency\n2024-03-01,EUR\n"))
+        with self.assertRaisesMessage(ValueError, "line 3"):
+            read_exchange_rates(
+                BytesIO(b"currency,date,rate\nEUR,2024-03-01,0.9\nEUR,2024-03-02,x\n")
+            )
@@ -1,14 +1,18 @@
-from django.db.models import Sum
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.project.models import ProducerProductAccess, ProjectUser
+from apps.analytics.cache import (
+    bump_project_data_version,
+    record_project_data_change,
+)
+from apps.project.visibility import resolve_product_visibility
 
 from .models import Product
-from .serializers import ProductSerializer
+from .serializers import ProductSerializer, with_serialized_relations
+from .services import top_performing_products
 
 
 class ProductListCreateAPIView(APIView):
@@ -16,36 +20,26 @@ class ProductListCreateAPIView(APIView):
 
     def get(self, request):
         user = request.user
-        currently_selected_project_id = user.currently_selected_project_id
-
-        try:
-            project_user = ProjectUser.objects.get(
-                project_id=currently_selected_project_id, user=user
-            )
-        except ProjectUser.DoesNotExist:
+        visibility = resolve_product_visibility(
+            user.currently_selected_project_id, user
+        )
+        if not visibility.is_member:
             return Response(
                 {"error": "User is not part of this project."},
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        if project_user.role == ProjectUser.PROJECT_USER_ROLE_OWNER:
-            products = Product.objects.filter(project_id=currently_selected_project_id)
-        elif project_user.role == ProjectUser.PROJECT_USER_ROLE_PRODUCER:
-            # Producers can only see products they have been given access to
-            accessible_product_ids = ProducerProductAccess.objects.filter(
-                project_user=project_user
-            ).values_list('product_id', flat=True)
-            products = Product.objects.filter(id__in=accessible_product_ids)
-        else:
-            products = Product.objects.none()
-
-        serializer = ProductSerializer(products, many=True)
+        # Producers can only see products they have been given access to
+        products = visibility.products()
+
+        serializer = ProductSerializer(with_serialized_relations(products), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def post(self, request):
         serializer = ProductSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            product = serializer.save()
+            bump_project_data_version(product.project_id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -73,6 +67,10 @@ def product_detail(request, product_id):
 
     elif request.method == "DELETE":
         product.delete()
+        # Every bucket the product had data in changed
+        record_project_data_change(
+            [product.project_id], bump_project_data_version(product.project_id)
+        )
         return Response(
             {"message": "Product deleted successfully"},
             status=status.HTTP_204_NO_CONTENT,
@@ -83,38 +81,17 @@ def product_detail(request, product_id):
 @permission_classes([IsAuthenticated])
 def getTopPerformingContentByImpressions(request):
     user = request.user
-    currently_selected_project_id = user.currently_selected_project_id
-
-    try:
-        project_user = ProjectUser.objects.get(
-            project_id=currently_selected_project_id, user=user
-        )
-    except ProjectUser.DoesNotExist:
+    visibility = resolve_product_visibility(user.currently_selected_project_id, user)
+    if not visibility.is_member:
         return Response(
             {"error": "User is not part of this project."},
             status=status.HTTP_403_FORBIDDEN,
         )
 
     # Apply role-based filtering
-    if project_user.role == ProjectUser.PROJECT_USER_ROLE_OWNER:
-        products = Product.objects.filter(project_id=currently_selected_project_id)
-    elif project_user.role == ProjectUser.PROJECT_USER_ROLE_PRODUCER:
-        # Producers can only see products they have been given access to
-        accessible_product_ids = ProducerProductAccess.objects.filter(
-            project_user=project_user
-        ).values_list('product_id', flat=True)
-        products = Product.objects.filter(id__in=accessible_product_ids)
-    else:
-        products = Product.objects.none()
-
-    products = (
-        products
-        .annotate(total_impressions=Sum("productimpressions__impressions"))
-        .filter(total_impressions__gt=0)
-        .order_by("-total_impressions")[:10]
-    )
-    
-    serializer = ProductSerializer(products, many=True)
+    products = top_performing_products(visibility.products(), "impressions")
+
+    serializer = ProductSerializer(with_serialized_relations(products), many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -122,36 +99,15 @@ def getTopPerformingContentByImpressions(request):
 @permission_classes([IsAuthenticated])
 def getTopPerformingContentBySales(request):
     user = request.user
-    currently_selected_project_id = user.currently_selected_project_id
-
-    try:
-        project_user = ProjectUser.objects.get(
-            project_id=currently_selected_project_id, user=user
-        )
-    except ProjectUser.DoesNotExist:
+    visibility = resolve_product_visibility(user.currently_selected_project_id, user)
+    if not visibility.is_member:
         return Response(
             {"error": "User is not part of this project."},
             status=status.HTTP_403_FORBIDDEN,
         )
 
     # Apply role-based filtering
-    if project_user.role == ProjectUser.PROJECT_USER_ROLE_OWNER:
-        products = Product.objects.filter(project_id=currently_selected_project_id)
-    elif project_user.role == ProjectUser.PROJECT_USER_ROLE_PRODUCER:
-        # Producers can only see products they have been given access to
-        accessible_product_ids = ProducerProductAccess.objects.filter(
-            project_user=project_user
-        ).values_list('product_id', flat=True)
-        products = Product.objects.filter(id__in=accessible_product_ids)
-    else:
-        products = Product.objects.none()
-
-    products = (
-        products
-        .annotate(total_sales=Sum("productsale__royalty_amount"))
-        .filter(total_sales__gt=0)
-        .order_by("-total_sales")[:10]
-    )
-    
-    serializer = ProductSerializer(products, many=True)
+    products = top_performing_products(visibility.products(), "sales")
+
+    serializer = ProductSerializer(with_serialized_relations(products), many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
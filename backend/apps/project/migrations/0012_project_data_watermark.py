@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0011_project_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='data_updated_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProjectDataChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField(null=True)),
+                ('period_end', models.DateField(null=True)),
+                ('changed_at', models.DateTimeField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='data_changes', to='project.project')),
+            ],
+            options={
+                'db_table': 'project_data_change',
+                'indexes': [models.Index(fields=['project', 'changed_at'], name='project_dat_project_4252c9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0012_project_data_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='reporting_currency',
+            field=models.CharField(default='USD', max_length=10),
+        ),
+    ]
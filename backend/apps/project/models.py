@@ -5,6 +5,15 @@ class Project(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     members_can_see_other_members = models.BooleanField(default=True)
+    # ISO 4217 code every royalty amount is converted to, see
+    # apps/product/currency.py
+    reporting_currency = models.CharField(max_length=10, default="USD")
+    # Incremented whenever the project's analytics inputs change; part of every
+    # analytics cache key, so bumping it invalidates all cached responses.
+    data_version = models.PositiveIntegerField(default=0, editable=False)
+    # When data_version was last bumped; the watermark of conditional and
+    # delta analytics requests.
+    data_updated_at = models.DateTimeField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -15,6 +24,26 @@ class Project(models.Model):
         db_table = "project"
 
 
+class ProjectDataChange(models.Model):
+    """
+    A change to the analytics series of a project, covering the days from
+    period_start to period_end (unbounded when null). Recorded by
+    apps.analytics.cache so analytics can answer with only the buckets that
+    changed since a watermark.
+    """
+
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="data_changes"
+    )
+    period_start = models.DateField(null=True)
+    period_end = models.DateField(null=True)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "project_data_change"
+        indexes = [models.Index(fields=["project", "changed_at"])]
+
+
 class ProjectUser(models.Model):
     PROJECT_USER_ROLE_OWNER = "owner"
     PROJECT_USER_ROLE_PRODUCER = "producer"
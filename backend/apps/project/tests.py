@@ -2,12 +2,18 @@ import random
 import string
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from apps.project.models import Project, ProjectUser
+from apps.product.models import Product
+from apps.project.models import ProducerProductAccess, Project, ProjectUser
+from apps.project.visibility import (
+    invalidate_product_visibility,
+    resolve_product_visibility,
+)
 
 User = get_user_model()
 
@@ -196,3 +202,105 @@ class ProjectUserViewDeleteTests(TestCase):
         response = self.client.delete(delete_url)
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class ProductVisibilityTests(TestCase):
+    """Tests for resolving and caching the products a member may see"""
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(name="Test Project")
+        self.products = [
+            Product.objects.create(project=self.project, title=f"Product {index}")
+            for index in range(3)
+        ]
+        self.owner = User.objects.create_user(
+            email="owner@test.com", name="Owner", password="TestPassword123_"
+        )
+        ProjectUser.objects.create(
+            project=self.project,
+            user=self.owner,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.producer = User.objects.create_user(
+            email="producer@test.com", name="Producer", password="TestPassword123_"
+        )
+        self.producer_membership = ProjectUser.objects.create(
+            project=self.project,
+            user=self.producer,
+            role=ProjectUser.PROJECT_USER_ROLE_PRODUCER,
+        )
+        ProducerProductAccess.objects.create(
+            project_user=self.producer_membership, product=self.products[0]
+        )
+
+    def visible_titles(self, user):
+        visibility = resolve_product_visibility(self.project.id, user)
+        return sorted(visibility.products().values_list("title", flat=True))
+
+    def test_products_by_role(self):
+        outsider = User.objects.create_user(
+            email="outsider@test.com", name="Outsider", password="TestPassword123_"
+        )
+
+        self.assertEqual(len(self.visible_titles(self.owner)), 3)
+        self.assertEqual(self.visible_titles(self.producer), ["Product 0"])
+        self.assertEqual(self.visible_titles(outsider), [])
+        self.assertFalse(
+            resolve_product_visibility(self.project.id, outsider).is_member
+        )
+
+    def test_producer_access_is_a_subquery(self):
+        visibility = resolve_product_visibility(self.project.id, self.producer)
+
+        sql = str(visibility.products().query)
+
+        self.assertIn('FROM "producer_product_access"', sql)
+        self.assertIsNone(
+            resolve_product_visibility(self.project.id, self.owner).product_ids
+        )
+
+    def test_access_changes_apply_without_invalidation(self):
+        self.assertEqual(self.visible_titles(self.producer), ["Product 0"])
+
+        ProducerProductAccess.objects.create(
+            project_user=self.producer_membership, product=self.products[1]
+        )
+
+        self.assertEqual(
+            self.visible_titles(self.producer), ["Product 0", "Product 1"]
+        )
+
+    def test_membership_is_resolved_once_per_request_and_cached(self):
+        resolve_product_visibility(self.project.id, self.producer)
+        with self.assertNumQueries(0):
+            resolve_product_visibility(self.project.id, self.producer)
+
+        # A later request gets a fresh user object but the cached membership
+        fresh_user = User.objects.get(id=self.producer.id)
+        with self.assertNumQueries(0):
+            visibility = resolve_product_visibility(self.project.id, fresh_user)
+        self.assertEqual(visibility.role, ProjectUser.PROJECT_USER_ROLE_PRODUCER)
+
+        invalidate_product_visibility(self.project.id, self.producer.id)
+        fresh_user = User.objects.get(id=self.producer.id)
+        with self.assertNumQueries(1):
+            resolve_product_visibility(self.project.id, fresh_user)
+
+    def test_role_change_invalidates_the_cached_membership(self):
+        resolve_product_visibility(self.project.id, self.producer)
+        client = APIClient()
+        client.force_authenticate(user=self.owner)
+
+        response = client.put(
+            reverse("project-user-update", args=[self.producer_membership.id]),
+            {"role": ProjectUser.PROJECT_USER_ROLE_OWNER},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        fresh_user = User.objects.get(id=self.producer.id)
+        self.assertEqual(len(self.visible_titles(fresh_user)), 3)
@@ -5,14 +5,20 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.analytics.cache import (
+    bump_project_data_version,
+    record_project_data_change,
+)
 from apps.product.models import Product
 from apps.product.serializers import ProductSerializer
+from apps.product.services import refresh_project_rollups
 
 from .models import ProducerProductAccess, Project, ProjectUser
 from .serializers import (
     ProjectSerializer,
     ProjectUserSerializer,
 )
+from .visibility import invalidate_product_visibility
 
 
 class ProjectListCreateView(APIView):
@@ -66,6 +72,9 @@ class ProjectUserListView(APIView):
         serializer = ProjectUserSerializer(data=data)
         if serializer.is_valid():
             project_user = serializer.save()
+            invalidate_product_visibility(
+                project_user.project_id, project_user.user_id
+            )
             return Response(
                 ProjectUserSerializer(project_user).data, status=status.HTTP_201_CREATED
             )
@@ -85,6 +94,7 @@ class ProjectUserView(APIView):
         """Delete a ProjectUser by ID."""
         project_user = get_object_or_404(ProjectUser, id=id)
         project_user.delete()
+        invalidate_product_visibility(project_user.project_id, project_user.user_id)
         return Response(
             {"message": "ProjectUser deleted successfully"},
             status=status.HTTP_204_NO_CONTENT,
@@ -137,9 +147,13 @@ def updateProject(request):
             {"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND
         )
 
+    reporting_currency = project.reporting_currency
     serializer = ProjectSerializer(project, data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        project = serializer.save()
+        if project.reporting_currency != reporting_currency:
+            # Rollup revenue is stored converted to the reporting currency
+            refresh_project_rollups(project.id)
         return Response(serializer.data)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -180,6 +194,14 @@ class ProjectProductsView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+def invalidate_visible_analytics(project_id):
+    """
+    A member's visible products changed, so their analytics changed entirely;
+    make sure no conditional or `since` request is answered from before.
+    """
+    record_project_data_change([project_id], bump_project_data_version(project_id))
+
+
 class ProducerProductAccessView(APIView):
     """Manage producer product access."""
 
@@ -219,6 +241,7 @@ class ProducerProductAccessView(APIView):
                 continue
 
         ProducerProductAccess.objects.bulk_create(access_objects)
+        invalidate_visible_analytics(project_user.project_id)
 
         return Response(
             {"message": "Product access updated successfully"},
@@ -272,5 +295,9 @@ class ProjectUserUpdateView(APIView):
             # Clear product access for owners (they have access to all)
             ProducerProductAccess.objects.filter(project_user=project_user).delete()
 
+        if new_role:
+            invalidate_product_visibility(project_user.project_id, project_user.user_id)
+            invalidate_visible_analytics(project_user.project_id)
+
         serializer = ProjectUserSerializer(project_user)
         return Response(serializer.data, status=status.HTTP_200_OK)
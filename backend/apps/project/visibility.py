@@ -0,0 +1,126 @@
+"""
+Which products of a project a user may see.
+
+Owners see every product of the project, producers the products they have been
+given access to and non-members none. The membership is resolved once per
+request and cached across requests; the accessible products are never loaded,
+they are applied as a subquery on ProducerProductAccess, so a producer with
+thousands of products costs the same as one with a handful.
+
+Because the subquery reads the access rows when the filtered query runs, only
+membership changes (joining, leaving, a new role) need to invalidate the cache.
+"""
+
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import QuerySet
+
+from apps.product.models import Product
+
+from .models import ProducerProductAccess, ProjectUser
+
+PRODUCT_VISIBILITY_CACHE_PREFIX = "product_visibility"
+
+
+class ProductVisibility:
+    """A user's membership of a project and the products it lets them see."""
+
+    def __init__(
+        self, project_id: int, project_user_id: Optional[int], role: Optional[str]
+    ):
+        self.project_id = project_id
+        self.project_user_id = project_user_id
+        self.role = role
+
+    @property
+    def is_member(self) -> bool:
+        return self.project_user_id is not None
+
+    @property
+    def sees_all_products(self) -> bool:
+        return self.role == ProjectUser.PROJECT_USER_ROLE_OWNER
+
+    @property
+    def product_ids(self) -> Optional[QuerySet]:
+        """
+        Subquery of the visible product ids, for `__in` lookups, or None when
+        every product of the project is visible.
+        """
+        if self.sees_all_products:
+            return None
+        access = ProducerProductAccess.objects.values("product_id")
+        if self.role == ProjectUser.PROJECT_USER_ROLE_PRODUCER:
+            return access.filter(project_user_id=self.project_user_id)
+        return access.none()
+
+    @property
+    def cache_token(self) -> Optional[str]:
+        """
+        Identifies the visible products in cache keys: None for owners, who
+        share entries. Access changes bump the project's data version, so the
+        producer's membership is enough to tell their product sets apart.
+        """
+        if self.sees_all_products:
+            return None
+        if self.role == ProjectUser.PROJECT_USER_ROLE_PRODUCER:
+            return f"producer:{self.project_user_id}"
+        return "none"
+
+    def filter_products(self, products: QuerySet, field: str = "id") -> QuerySet:
+        """Restrict a queryset to the visible products, through `field`."""
+        product_ids = self.product_ids
+        if product_ids is None:
+            return products
+        return products.filter(**{f"{field}__in": product_ids})
+
+    def products(self) -> QuerySet:
+        return self.filter_products(Product.objects.filter(project_id=self.project_id))
+
+
+def get_visibility_cache_key(project_id: int, user_id: int) -> str:
+    return f"{PRODUCT_VISIBILITY_CACHE_PREFIX}:{project_id}:{user_id}"
+
+
+def resolve_product_visibility(project_id: int, user) -> ProductVisibility:
+    """
+    Resolve the user's visibility in the project, at most once per request:
+    the result is kept on the user object, which DRF shares across the request.
+    """
+    resolved = getattr(user, "_product_visibility", None)
+    if resolved is None:
+        resolved = user._product_visibility = {}
+    if project_id not in resolved:
+        resolved[project_id] = load_product_visibility(project_id, user.id)
+    return resolved[project_id]
+
+
+def load_product_visibility(project_id: int, user_id: int) -> ProductVisibility:
+    cache_key = get_visibility_cache_key(project_id, user_id)
+    try:
+        membership = cache.get(cache_key)
+    except Exception as e:
+        print(f"Product visibility cache read failed: {e}")
+        membership = None
+
+    if membership is None:
+        membership = (
+            ProjectUser.objects.filter(project_id=project_id, user_id=user_id)
+            .values_list("id", "role")
+            .first()
+        ) or (None, None)
+        try:
+            cache.set(cache_key, membership, settings.PRODUCT_VISIBILITY_CACHE_TIMEOUT)
+        except Exception as e:
+            print(f"Product visibility cache write failed: {e}")
+
+    return ProductVisibility(project_id, *membership)
+
+
+def invalidate_product_visibility(project_id: int, user_id: int) -> None:
+    """Call whenever the user joins or leaves the project or changes role."""
+    try:
+        cache.delete(get_visibility_cache_key(project_id, user_id))
+    except Exception as e:
+        print(f"Product visibility cache invalidation failed: {e}")
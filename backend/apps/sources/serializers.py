@@ -33,6 +33,9 @@ class SourceSerializer(serializers.ModelSerializer):
         return instance
 
     def get_imported_video_count(self, obj):
+        # Sources loaded for many products come annotated with their count
+        if hasattr(obj, "product_count"):
+            return obj.product_count
         return Product.objects.filter(source=obj).count()
 
     def to_representation(self, instance):
@@ -0,0 +1,164 @@
+import warnings
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.notifications.models import Notification
+from apps.product.models import Product, ProductDailyRollup, ProductImpressions
+from apps.product.services import day_start, refresh_daily_rollups
+from apps.project.models import Project, ProjectUser
+from apps.sources.models import Source
+from apps.sources.utils.anomalies import (
+    detect_impression_anomalies,
+    flag_impression_anomalies,
+    score_impression_anomalies,
+)
+from apps.sources.utils.youtube import fetch_youtube_stats
+
+
+class ImpressionAnomalyTests(TestCase):
+    """Tests for the spike and reset detection of synced impressions"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="anomalies@test.com", name="Owner", password="Testaccount1_"
+        )
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        ProjectUser.objects.create(
+            project=self.project,
+            user=self.user,
+            role=ProjectUser.PROJECT_USER_ROLE_OWNER,
+        )
+        self.source = Source.objects.create(
+            project=self.project,
+            platform=Source.PLATFORM_YOUTUBE,
+            account_name="Channel",
+        )
+        self.day = date(2024, 3, 1)
+        self.products = [
+            Product.objects.create(
+                project=self.project, source=self.source, title=title
+            )
+            for title in ("Steady", "Spiking", "Reset")
+        ]
+        for product in self.products:
+            for days_ago in range(1, 15):
+                self.add_impressions(product, self.day - timedelta(days=days_ago), 100)
+        for product, impressions in zip(self.products, (110, 5000, -900)):
+            self.add_impressions(product, self.day, impressions)
+
+    def add_impressions(self, product, day, impressions):
+        moment = timezone.make_aware(datetime.combine(day, time.min))
+        ProductImpressions.objects.create(
+            product=product,
+            impressions=impressions,
+            ecpm=0,
+            period_start=moment,
+            period_end=moment,
+        )
+
+    def product_ids(self):
+        return [product.id for product in self.products]
+
+    def test_spikes_and_resets_are_detected(self):
+        anomalies = detect_impression_anomalies(self.product_ids(), self.day)
+
+        by_product = {anomaly["product_id"]: anomaly for anomaly in anomalies}
+        self.assertEqual(set(by_product), {self.products[1].id, self.products[2].id})
+        self.assertEqual(by_product[self.products[1].id]["expected"], 100.0)
+        self.assertEqual(by_product[self.products[2].id]["impressions"], -900)
+
+    def test_history_is_loaded_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            detect_impression_anomalies(self.product_ids(), self.day)
+
+        self.assertEqual(len(queries), 1)
+
+    def test_short_histories_only_flag_negative_counts(self):
+        history = np.array(
+            [[np.nan] * 12 + [100, 100, 9000], [np.nan] * 14 + [-5]], dtype=float
+        )
+
+        scores = score_impression_anomalies(history)
+
+        self.assertEqual(scores["anomalous"].tolist(), [False, True])
+
+    def test_owners_are_notified(self):
+        flag_impression_anomalies(self.source, self.product_ids(), self.day)
+
+        notification = Notification.objects.get(user=self.user)
+        self.assertIn("Spiking", notification.title)
+        self.assertIn("Reset", notification.title)
+        self.assertNotIn("left out", notification.title)
+        self.assertFalse(
+            ProductImpressions.objects.filter(is_quarantined=True).exists()
+        )
+
+    @override_settings(SYNC_ANOMALY_QUARANTINE=True)
+    def test_quarantined_rows_are_left_out_of_rollups(self):
+        flag_impression_anomalies(self.source, self.product_ids(), self.day.isoformat())
+        refresh_daily_rollups(self.product_ids(), self.day, self.day)
+
+        rollups = dict(
+            ProductDailyRollup.objects.filter(
+                product__in=self.products, period_start=self.day
+            ).values_list("product__title", "impressions")
+        )
+        self.assertEqual(rollups, {"Steady": 110})
+        self.assertIn("left out of analytics", Notification.objects.get().title)
+
+
+class SourceSyncTests(TestCase):
+    """Tests for the daily impressions stored by the source syncs"""
+
+    def setUp(self):
+        self.project = Project.objects.create(
+            name="Test Project", description="A test project"
+        )
+        self.source = Source.objects.create(
+            project=self.project,
+            platform=Source.PLATFORM_YOUTUBE,
+            account_name="Channel",
+            channel_id="channel",
+            status=Source.STATUS_ACTIVE,
+        )
+        self.product = Product.objects.create(
+            project=self.project, source=self.source, title="Video"
+        )
+        self.today = date.today()
+        yesterday = day_start(self.today - timedelta(days=1))
+        ProductImpressions.objects.create(
+            product=self.product,
+            impressions=100,
+            ecpm=0,
+            period_start=yesterday,
+            period_end=yesterday,
+        )
+
+    @mock.patch(
+        "apps.sources.utils.youtube.fetch_youtube_video_stats",
+        return_value={"rows": [[250]]},
+    )
+    def test_youtube_sync_stores_aware_day_starts(self, fetch_video_stats):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            fetch_youtube_stats(self.source.id)
+
+        impressions = ProductImpressions.objects.get(
+            product=self.product, period_start=day_start(self.today)
+        )
+        self.assertEqual(impressions.impressions, 150)
+        self.assertEqual(impressions.period_end, day_start(self.today))
+        self.assertTrue(
+            ProductDailyRollup.objects.filter(
+                product=self.product, period_start=self.today
+            ).exists()
+        )
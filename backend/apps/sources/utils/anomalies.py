@@ -0,0 +1,161 @@
+"""
+Spike and reset detection over the impressions of a source sync.
+
+Syncs store the daily change of each video's view count, which goes negative
+when a platform resets a count and spikes when one is corrected upwards.
+After a sync, the synced day of every product is compared with the rolling
+median of its previous ANOMALY_HISTORY_DAYS days, in units of the median
+absolute deviation (MAD). The history of all synced products is loaded in a
+single query and scored together as a (products, days) array.
+
+Project owners are notified of anomalies, and with SYNC_ANOMALY_QUARANTINE the
+suspect rows are quarantined: refresh_daily_rollups leaves them out until
+their is_quarantined flag is cleared and the rollups are refreshed.
+"""
+
+import warnings
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Union
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+from apps.notifications.utils import create_notification
+from apps.product.models import Product, ProductImpressions
+from apps.product.services import day_start, to_local_date
+from apps.project.models import ProjectUser
+
+ANOMALY_HISTORY_DAYS = 28
+# Days of history a product needs before its spikes are judged
+ANOMALY_MIN_HISTORY_DAYS = 7
+# Robust z-score above which a day is a spike
+ANOMALY_THRESHOLD = 6.0
+# Scales the MAD to a standard deviation for normally distributed counts
+MAD_SCALE = 1.4826
+# Flat histories have no MAD, deviations are then measured against this
+# share of the median instead
+MIN_RELATIVE_SPREAD = 0.1
+
+
+def load_impression_history(product_ids: List[int], day: date, days: int) -> np.ndarray:
+    """
+    (products, days + 1) array of the daily impressions of the products up to
+    and including `day`, NaN for days without a row.
+    """
+    first_day = day - timedelta(days=days)
+    history = np.full((len(product_ids), days + 1), np.nan)
+    rows = (
+        ProductImpressions.objects.filter(
+            product_id__in=product_ids,
+            period_start__gte=day_start(first_day),
+            period_start__lt=day_start(day + timedelta(days=1)),
+        )
+        .annotate(day=TruncDate("period_start"))
+        .values("product_id", "day")
+        .annotate(impressions_sum=Sum("impressions"))
+        .values_list("product_id", "day", "impressions_sum")
+        .order_by()
+    )
+    product_index = {product_id: index for index, product_id in enumerate(product_ids)}
+    for product_id, row_day, impressions in rows:
+        history[product_index[product_id], (row_day - first_day).days] = (
+            impressions or 0
+        )
+    return history
+
+
+def score_impression_anomalies(history: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Score the last column of a history array against the columns before it.
+    Returns per product the expected (median) count, the robust z-score and
+    whether the last day is anomalous: negative, or a spike.
+    """
+    latest = history[:, -1]
+    previous = history[:, :-1]
+    with warnings.catch_warnings():
+        # Products without any history have all-NaN rows
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(previous, axis=1)
+        mad = np.nanmedian(np.abs(previous - median[:, None]), axis=1)
+    known_days = np.count_nonzero(~np.isnan(previous), axis=1)
+
+    spread = np.fmax(MAD_SCALE * mad, MIN_RELATIVE_SPREAD * np.abs(median))
+    spread = np.fmax(np.nan_to_num(spread), 1.0)
+    score = np.abs(latest - np.nan_to_num(median)) / spread
+
+    anomalous = (latest < 0) | (
+        (known_days >= ANOMALY_MIN_HISTORY_DAYS) & (score > ANOMALY_THRESHOLD)
+    )
+    return {
+        "expected": median,
+        "score": score,
+        "anomalous": anomalous & ~np.isnan(latest),
+    }
+
+
+def detect_impression_anomalies(
+    product_ids: Iterable[int], day: Union[str, date]
+) -> List[Dict[str, Any]]:
+    """The anomalous synced counts of the products on `day`."""
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return []
+    day = to_local_date(day)
+    history = load_impression_history(product_ids, day, ANOMALY_HISTORY_DAYS)
+    scores = score_impression_anomalies(history)
+
+    return [
+        {
+            "product_id": product_ids[index],
+            "impressions": int(history[index, -1]),
+            "expected": None
+            if np.isnan(scores["expected"][index])
+            else float(scores["expected"][index]),
+            "score": round(float(scores["score"][index]), 2),
+        }
+        for index in np.flatnonzero(scores["anomalous"])
+    ]
+
+
+def flag_impression_anomalies(
+    source, product_ids: Iterable[int], day: Union[str, date]
+) -> List[Dict[str, Any]]:
+    """
+    Detect the anomalies of a sync of the source, notify the project owners
+    and quarantine the suspect rows if SYNC_ANOMALY_QUARANTINE is set. Call
+    before refreshing the synced rollups.
+    """
+    anomalies = detect_impression_anomalies(product_ids, day)
+    if not anomalies:
+        return anomalies
+
+    day = to_local_date(day)
+    anomalous_ids = [anomaly["product_id"] for anomaly in anomalies]
+    quarantine = settings.SYNC_ANOMALY_QUARANTINE
+    if quarantine:
+        ProductImpressions.objects.filter(
+            product_id__in=anomalous_ids,
+            period_start__gte=day_start(day),
+            period_start__lt=day_start(day + timedelta(days=1)),
+        ).update(is_quarantined=True)
+
+    titles = list(
+        Product.objects.filter(id__in=anomalous_ids[:3]).values_list("title", flat=True)
+    )
+    if len(anomalous_ids) > len(titles):
+        titles.append(f"{len(anomalous_ids) - len(titles)} more")
+    title = (
+        f"Unusual view counts on {day.isoformat()} in the {source.platform} sync "
+        f"of {source.account_name}: {', '.join(titles)}"
+        f"{' (left out of analytics)' if quarantine else ''}"
+    )[:255]
+    owners = ProjectUser.objects.filter(
+        project_id=source.project_id, role=ProjectUser.PROJECT_USER_ROLE_OWNER
+    ).select_related("user")
+    for owner in owners:
+        create_notification(owner.user, title)
+
+    print(f"Impression anomalies in source {source.id}: {anomalies}", flush=True)
+    return anomalies
@@ -1,7 +1,10 @@
 from datetime import date, timedelta
 from django.utils import timezone
 from apps.sources.models import Source
+from apps.sources.utils.anomalies import flag_impression_anomalies
 from apps.product.models import Product, ProductImpressions
+from apps.analytics.cache import bump_project_data_version
+from apps.product.services import day_start, refresh_daily_rollups
 from apps.sources.utils.instagram_service import InstagramService
 
 
@@ -40,6 +43,7 @@ def fetch_instagram_videos(source_id=None):
 
         try:
             videos = service.fetch_media()
+            products_created = False
             for video in videos:
                 media_type = video.get("media_type", None)
                 if media_type == "VIDEO": # SKIP OTHER MEDIA TYPES 
@@ -57,7 +61,10 @@ def fetch_instagram_videos(source_id=None):
                             project=source.project,
                             source=source,
                         )
+                        products_created = True
 
+            if products_created:
+                bump_project_data_version(source.project_id)
             source.last_fetched_at = timezone.now()
             source.save(update_fields=["last_fetched_at"])
 
@@ -72,8 +79,7 @@ def fetch_instagram_stats(source_id=None):
     if source_id:
         sources = sources.filter(id=source_id)
 
-    start_date = date.today().isoformat()
-    end_date = date.today().isoformat()
+    today = date.today()
 
     for source in sources:
         # Refresh token if expired
@@ -91,6 +97,7 @@ def fetch_instagram_stats(source_id=None):
 
         service = InstagramService(access_token=source.access_token)
         products = Product.objects.filter(source=source)
+        synced_product_ids = []
 
         for product in products:
             try:
@@ -106,8 +113,8 @@ def fetch_instagram_stats(source_id=None):
                 yesterday = date.today() - timedelta(days=1)
                 yesterday_impressions = ProductImpressions.objects.filter(
                     product=product,
-                    period_start=yesterday.isoformat(),
-                    period_end=yesterday.isoformat(),
+                    period_start=day_start(yesterday),
+                    period_end=day_start(yesterday),
                 ).first()
 
                 yesterday_view_count = (
@@ -118,7 +125,9 @@ def fetch_instagram_stats(source_id=None):
                 views = current_view_count - yesterday_view_count
 
                 existing_stats = ProductImpressions.objects.filter(
-                    product=product, period_start=start_date, period_end=end_date
+                    product=product,
+                    period_start=day_start(today),
+                    period_end=day_start(today),
                 ).exists()
 
                 if not existing_stats:
@@ -126,9 +135,13 @@ def fetch_instagram_stats(source_id=None):
                         product=product,
                         impressions=views,
                         ecpm=0,
-                        period_start=start_date,
-                        period_end=end_date,
+                        period_start=day_start(today),
+                        period_end=day_start(today),
                     )
+                    synced_product_ids.append(product.id)
 
             except Exception as e:
                 print(f"Failed to fetch stats for product {product.id}: {e}")
+
+        flag_impression_anomalies(source, synced_product_ids, today)
+        refresh_daily_rollups(synced_product_ids, today, today)
@@ -3,7 +3,9 @@ from datetime import date, timedelta
 from django.utils import timezone
 
 from apps.product.models import Product, ProductImpressions
+from apps.product.services import day_start, refresh_daily_rollups
 from apps.sources.models import Source
+from apps.sources.utils.anomalies import flag_impression_anomalies
 from apps.sources.utils.vimeo_service import VimeoService
 
 
@@ -17,13 +19,13 @@ def fetch_vimeo_videos_and_stats(source_id=None):
             print(f"No access token set for source {source.id}, skipping videos fetch")
             continue
 
-        start_date = date.today().isoformat()
-        end_date = date.today().isoformat()
+        today = date.today()
         service = VimeoService(access_token=source.access_token)
 
         try:
             videos = service.fetch_videos()
             print(videos, flush=True)
+            synced_product_ids = []
             # Process VODs
             for video in videos:
                 product = Product.objects.filter(
@@ -46,8 +48,8 @@ def fetch_vimeo_videos_and_stats(source_id=None):
                 yesterday = date.today() - timedelta(days=1)
                 yesterday_impressions = ProductImpressions.objects.filter(
                     product=product,
-                    period_start=yesterday.isoformat(),
-                    period_end=yesterday.isoformat(),
+                    period_start=day_start(yesterday),
+                    period_end=day_start(yesterday),
                 ).first()
 
                 yesterday_view_count = (
@@ -58,7 +60,9 @@ def fetch_vimeo_videos_and_stats(source_id=None):
                 views = max(0, current_view_count - yesterday_view_count)
 
                 existing_stats = ProductImpressions.objects.filter(
-                    product=product, period_start=start_date, period_end=end_date
+                    product=product,
+                    period_start=day_start(today),
+                    period_end=day_start(today),
                 ).exists()
 
                 if not existing_stats:
@@ -66,9 +70,13 @@ def fetch_vimeo_videos_and_stats(source_id=None):
                         product=product,
                         impressions=views,
                         ecpm=0,
-                        period_start=start_date,
-                        period_end=end_date,
+                        period_start=day_start(today),
+                        period_end=day_start(today),
                     )
+                    synced_product_ids.append(product.id)
+
+            flag_impression_anomalies(source, synced_product_ids, today)
+            refresh_daily_rollups(synced_product_ids, today, today)
 
             source.last_fetched_at = timezone.now()
             source.save(update_fields=["last_fetched_at"])
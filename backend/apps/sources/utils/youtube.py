@@ -4,8 +4,11 @@ import requests
 from django.conf import settings
 from django.utils import timezone
 
+from apps.analytics.cache import bump_project_data_version
 from apps.product.models import Product, ProductImpressions
+from apps.product.services import day_start, refresh_daily_rollups
 from apps.sources.models import Source
+from apps.sources.utils.anomalies import flag_impression_anomalies
 
 
 def request_users_youtube_content(access_token: str, channel_id: str) -> dict:
@@ -105,6 +108,7 @@ def fetch_youtube_videos(source_id=None):
         youtube_videos = request_users_youtube_content(
             access_token=source.access_token, channel_id=source.channel_id
         )
+        products_created = False
         for video in youtube_videos.get("items", []):
             existing_product = Product.objects.filter(
                 title=video["snippet"]["title"],
@@ -121,6 +125,9 @@ def fetch_youtube_videos(source_id=None):
                     project=source.project,
                     source=source,
                 )
+                products_created = True
+        if products_created:
+            bump_project_data_version(source.project_id)
         source.last_fetched_at = timezone.now()
         source.save(update_fields=["last_fetched_at"])
 
@@ -132,8 +139,7 @@ def fetch_youtube_stats(source_id=None):
     if source_id:
         sources = sources.filter(id=source_id)
 
-    start_date = date.today().isoformat()
-    end_date = date.today().isoformat()
+    today = date.today()
 
     for source in sources:
         if source.token_expires_at and timezone.now() > source.token_expires_at:
@@ -146,8 +152,11 @@ def fetch_youtube_stats(source_id=None):
             continue
 
         products = Product.objects.filter(source=source)
+        synced_product_ids = []
         for product in products:
-            stats = fetch_youtube_video_stats(product, source, start_date, end_date)
+            stats = fetch_youtube_video_stats(
+                product, source, today.isoformat(), today.isoformat()
+            )
             print(stats, flush=True)
             rows = stats.get("rows", [])
             if rows:
@@ -161,8 +170,8 @@ def fetch_youtube_stats(source_id=None):
             yesterday = date.today() - timedelta(days=1)
             yesterday_impressions = ProductImpressions.objects.filter(
                 product=product,
-                period_start=yesterday.isoformat(),
-                period_end=yesterday.isoformat(),
+                period_start=day_start(yesterday),
+                period_end=day_start(yesterday),
             ).first()
 
             yesterday_views = (
@@ -174,7 +183,9 @@ def fetch_youtube_stats(source_id=None):
 
             existingProductImpressionsObjectWithSameDateRange = (
                 ProductImpressions.objects.filter(
-                    product=product, period_start=start_date, period_end=end_date
+                    product=product,
+                    period_start=day_start(today),
+                    period_end=day_start(today),
                 )
             )
 
@@ -183,9 +194,13 @@ def fetch_youtube_stats(source_id=None):
                     product=product,
                     impressions=views,
                     ecpm=0,
-                    period_start=start_date,
-                    period_end=end_date,
+                    period_start=day_start(today),
+                    period_end=day_start(today),
                 )
+                synced_product_ids.append(product.id)
+
+        flag_impression_anomalies(source, synced_product_ids, today)
+        refresh_daily_rollups(synced_product_ids, today, today)
 
 
 def fetch_youtube_video_stats(product, source, start_date, end_date):
@@ -0,0 +1,253 @@
+"""
+Query count and database time instrumentation.
+
+track_queries wraps every database connection with an execute wrapper that
+records the statements run in its block: how many, their total time, the
+slowest one and the fingerprints (statements with their parameters and IN lists
+normalized away) seen more than once, which is what an N+1 looks like.
+
+Statements run on other threads on behalf of the tracked block, such as the
+analytics sections of apps/analytics/sections.py, are collected by passing
+active_query_stats() to track_queries in those threads.
+
+QueryStatsMiddleware tracks DRF views and the Celery signal handlers below
+track the source sync tasks. Both aggregate per endpoint or task in the cache,
+which the admin panel reads back with get_query_stats_report. Tracking is
+opt-in through QUERY_STATS_ENABLED: every tracked request reads and rewrites
+one cache key, which is meant for profiling sessions rather than production.
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+QUERY_STATS_CACHE_KEY = "query_stats:endpoints"
+TRACKED_TASK_PREFIXES = ("apps.sources.tasks.",)
+DUPLICATES_KEPT = 5
+
+_tracking = threading.local()
+
+FINGERPRINT_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(sql: str) -> str:
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryStats:
+    """
+    Execute wrapper collecting the statistics of the statements it runs, on
+    any number of threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_sql: Optional[str] = None
+        self.slowest_duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            sql_fingerprint = fingerprint(sql)
+            with self.lock:
+                self.count += 1
+                self.duration += duration
+                self.fingerprints[sql_fingerprint] += 1
+                if self.slowest_sql is None or duration > self.slowest_duration:
+                    self.slowest_sql = sql
+                    self.slowest_duration = duration
+
+    def duplicates(self) -> Dict[str, int]:
+        """Fingerprints run more than once, most repeated first."""
+        return {
+            sql: count for sql, count in self.fingerprints.most_common() if count > 1
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "queries": self.count,
+            "db_time_ms": round(self.duration * 1000, 3),
+            "slowest_sql": self.slowest_sql,
+            "slowest_ms": round(self.slowest_duration * 1000, 3),
+            "duplicates": self.duplicates(),
+        }
+
+
+def active_query_stats() -> List[QueryStats]:
+    """The statistics collecting the statements of the current thread."""
+    return list(getattr(_tracking, "stats", ()))
+
+
+@contextmanager
+def track_queries(stats: Optional[QueryStats] = None) -> Iterator[QueryStats]:
+    """
+    Collect the statements run on any database connection of the current
+    thread in the block, into new statistics or the given ones.
+    """
+    if stats is None:
+        stats = QueryStats()
+    if not hasattr(_tracking, "stats"):
+        _tracking.stats = []
+    _tracking.stats.append(stats)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            yield stats
+    finally:
+        _tracking.stats.remove(stats)
+
+
+def record_query_stats(name: str, stats: QueryStats) -> None:
+    """
+    Add a tracked request or task to the aggregated statistics of its endpoint.
+
+    Concurrent workers may overwrite each other's update, which is acceptable
+    for statistics that are only meant to point at the expensive endpoints.
+    """
+    try:
+        aggregates = cache.get(QUERY_STATS_CACHE_KEY) or {}
+        aggregate = aggregates.setdefault(
+            name,
+            {
+                "calls": 0,
+                "queries": 0,
+                "max_queries": 0,
+                "db_time_ms": 0.0,
+                "max_db_time_ms": 0.0,
+                "slowest_sql": None,
+                "slowest_ms": 0.0,
+                "duplicates": {},
+            },
+        )
+        summary = stats.summary()
+
+        aggregate["calls"] += 1
+        aggregate["queries"] += summary["queries"]
+        aggregate["max_queries"] = max(aggregate["max_queries"], summary["queries"])
+        aggregate["db_time_ms"] += summary["db_time_ms"]
+        aggregate["max_db_time_ms"] = max(
+            aggregate["max_db_time_ms"], summary["db_time_ms"]
+        )
+        if summary["slowest_ms"] > aggregate["slowest_ms"]:
+            aggregate["slowest_sql"] = summary["slowest_sql"]
+            aggregate["slowest_ms"] = summary["slowest_ms"]
+
+        duplicates = Counter(aggregate["duplicates"])
+        for sql, count in summary["duplicates"].items():
+            duplicates[sql] = max(duplicates[sql], count)
+        aggregate["duplicates"] = dict(duplicates.most_common(DUPLICATES_KEPT))
+
+        cache.set(QUERY_STATS_CACHE_KEY, aggregates, settings.QUERY_STATS_TIMEOUT)
+    except Exception as e:
+        # Instrumentation must never break the request it measures
+        print(f"Recording query stats failed: {e}")
+
+
+def get_query_stats_report() -> List[Dict[str, Any]]:
+    """Aggregated statistics per endpoint and task, by total database time."""
+    try:
+        aggregates = cache.get(QUERY_STATS_CACHE_KEY) or {}
+    except Exception as e:
+        print(f"Reading query stats failed: {e}")
+        aggregates = {}
+
+    report = []
+    for name, aggregate in aggregates.items():
+        report.append(
+            {
+                "name": name,
+                **aggregate,
+                "avg_queries": round(aggregate["queries"] / aggregate["calls"], 2),
+                "avg_db_time_ms": round(
+                    aggregate["db_time_ms"] / aggregate["calls"], 3
+                ),
+            }
+        )
+    return sorted(report, key=lambda row: row["db_time_ms"], reverse=True)
+
+
+def reset_query_stats() -> None:
+    try:
+        cache.delete(QUERY_STATS_CACHE_KEY)
+    except Exception as e:
+        print(f"Resetting query stats failed: {e}")
+
+
+class QueryStatsMiddleware:
+    """
+    Track the queries of every DRF view. In DEBUG the request's own numbers
+    are also returned as X-Query-* response headers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_STATS_ENABLED:
+            return self.get_response(request)
+
+        with track_queries() as stats:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        # Both APIView.as_view() and @api_view set `cls` on the view function
+        if match is None or not hasattr(match.func, "cls"):
+            return response
+
+        record_query_stats(f"{request.method} /{match.route}", stats)
+
+        if settings.DEBUG:
+            summary = stats.summary()
+            response["X-Query-Count"] = str(summary["queries"])
+            response["X-Query-Time-Ms"] = str(summary["db_time_ms"])
+            response["X-Query-Slowest-Ms"] = str(summary["slowest_ms"])
+            response["X-Query-Duplicates"] = str(
+                sum(count - 1 for count in summary["duplicates"].values())
+            )
+
+        return response
+
+
+_task_trackers: Dict[str, Tuple[ExitStack, QueryStats]] = {}
+
+
+def start_task_query_stats(task_id=None, task=None, **kwargs) -> None:
+    """celery.signals.task_prerun handler."""
+    if not settings.QUERY_STATS_ENABLED or not task.name.startswith(
+        TRACKED_TASK_PREFIXES
+    ):
+        return
+    stack = ExitStack()
+    _task_trackers[task_id] = (stack, stack.enter_context(track_queries()))
+
+
+def finish_task_query_stats(task_id=None, task=None, **kwargs) -> None:
+    """celery.signals.task_postrun handler."""
+    tracker = _task_trackers.pop(task_id, None)
+    if tracker is None:
+        return
+    stack, stats = tracker
+    stack.close()
+    record_query_stats(f"task {task.name}", stats)
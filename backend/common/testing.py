@@ -0,0 +1,36 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from common.query_stats import QueryStats, track_queries
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin for asserting that code, usually an API endpoint, stays
+    within a budget of database queries.
+
+    Unlike assertNumQueries, the budget is an upper bound and the failure lists
+    the statements that were repeated, which is where an N+1 shows up.
+    """
+
+    @contextmanager
+    def assertQueryBudget(
+        self, budget: int, label: str = "Block"
+    ) -> Iterator[QueryStats]:
+        with track_queries() as stats:
+            yield stats
+
+        if stats.count > budget:
+            message = f"{label} ran {stats.count} queries, over its budget of {budget}."
+            duplicates = stats.duplicates()
+            if duplicates:
+                message += "\nRepeated queries:\n" + "\n".join(
+                    f"  {count}x {sql}" for sql, count in duplicates.items()
+                )
+            self.fail(message)
+
+    def assertEndpointQueryBudget(self, method: str, url: str, budget: int, **kwargs):
+        """Request url with self.client and return the response."""
+        with self.assertQueryBudget(budget, f"{method.upper()} {url}"):
+            response = getattr(self.client, method.lower())(url, **kwargs)
+        return response
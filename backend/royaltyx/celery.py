@@ -1,8 +1,11 @@
 import os
 
 from celery import Celery
+from celery.signals import task_postrun, task_prerun
 from django.conf import settings
 
+from common.query_stats import finish_task_query_stats, start_task_query_stats
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "royaltyx.settings")
 
 app = Celery("royaltyx")
@@ -11,3 +14,6 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 app.autodiscover_tasks()
+
+task_prerun.connect(start_task_query_stats)
+task_postrun.connect(finish_task_query_stats)
@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "common.query_stats.QueryStatsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -70,6 +71,58 @@ CACHES = {
     }
 }
 
+# Cached analytics responses are keyed by the project's data version, so a long
+# timeout never serves stale numbers; it only bounds how long dead keys linger.
+ANALYTICS_CACHE_TIMEOUT = int(os.environ.get("ANALYTICS_CACHE_TIMEOUT", 60 * 60 * 24))
+# How far back `since` requests can get only the changed analytics buckets
+ANALYTICS_DELTA_RETENTION = timedelta(
+    days=int(os.environ.get("ANALYTICS_DELTA_RETENTION_DAYS", 30))
+)
+# Cached project memberships, see apps/project/visibility.py
+PRODUCT_VISIBILITY_CACHE_TIMEOUT = int(
+    os.environ.get("PRODUCT_VISIBILITY_CACHE_TIMEOUT", 60 * 60)
+)
+# Run the independent analytics sections concurrently, each worker holding its
+# own database connection, see apps/analytics/sections.py
+ANALYTICS_PARALLEL_SECTIONS = (
+    os.environ.get("ANALYTICS_PARALLEL_SECTIONS", "False").lower() == "true"
+)
+ANALYTICS_SECTION_WORKERS = int(os.environ.get("ANALYTICS_SECTION_WORKERS", 4))
+
+# Exchange rates are quoted as units of a currency per unit of this currency
+FX_BASE_CURRENCY = os.environ.get("FX_BASE_CURRENCY", "USD")
+
+# Leave synced impression counts flagged as spikes or resets out of the
+# rollups, see apps/sources/utils/anomalies.py
+SYNC_ANOMALY_QUARANTINE = (
+    os.environ.get("SYNC_ANOMALY_QUARANTINE", "False").lower() == "true"
+)
+
+# Rows inserted per bulk insert when importing statements, see
+# apps/data_imports/utils/writers.py
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 2000))
+# On PostgreSQL imports are copied into staging tables instead, this many rows
+# per COPY, see apps/data_imports/utils/writers.py
+IMPORT_USE_COPY = os.environ.get("IMPORT_USE_COPY", "True").lower() == "true"
+IMPORT_COPY_BATCH_SIZE = int(os.environ.get("IMPORT_COPY_BATCH_SIZE", 20000))
+# CSV rows committed together by background import jobs, see
+# apps/data_imports/jobs.py
+IMPORT_JOB_CHUNK_ROWS = int(os.environ.get("IMPORT_JOB_CHUNK_ROWS", 100000))
+# A running job that committed no chunk for this long lost its worker, it has to
+# exceed the time one chunk takes
+IMPORT_JOB_STALE_SECONDS = int(os.environ.get("IMPORT_JOB_STALE_SECONDS", 600))
+# Statements uploaded in parts are kept here until they are assembled, see
+# apps/data_imports/uploads.py
+UPLOAD_PARTS_ROOT = os.environ.get(
+    "UPLOAD_PARTS_ROOT", os.path.join(BASE_DIR, "upload_parts")
+)
+UPLOAD_PART_SIZE = int(os.environ.get("UPLOAD_PART_SIZE", 8 * 1024 * 1024))
+
+# Per-endpoint query counts and database time, see common/query_stats.py. Off
+# unless enabled, as every tracked request reads and writes one cache key
+QUERY_STATS_ENABLED = os.environ.get("QUERY_STATS_ENABLED", "False").lower() == "true"
+QUERY_STATS_TIMEOUT = int(os.environ.get("QUERY_STATS_TIMEOUT", 60 * 60 * 24 * 7))
+
 ROOT_URLCONF = "royaltyx.urls"
 
 TEMPLATES = [